@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cold-start scorer check and benchmark.
+
+cold_start_scores computes the cold-start heuristic as array expressions over
+the catalog's nutrition columns instead of a per-meal Python loop. This
+script checks, on the committed menu JSON, that the scores are bit-for-bit
+the ones the original loop computes and that cold_start_recommendations
+returns the same ranking as the original function (loop + full sort), for
+a grid of calorie budgets, intakes, protein goals and allergen filters;
+then times both on synthetic catalogs.
+
+Usage:
+  python3 bench_cold_start.py
+  python3 bench_cold_start.py --sizes 500,5000 --repeat 5
+"""
+
+import argparse
+import itertools
+
+from bench_filter import DEFAULT_MENU, fixture_catalog, legacy_filter
+from bench_recommend import best_of
+from rl_recommender import cold_start_recommendations, cold_start_scores
+from synthetic_data import sample_state, synthetic_catalog_view, synthetic_meals
+
+
+def legacy_scores(user_state, meals):
+    """The original per-meal scoring loop."""
+    calorie_budget = user_state.get('calorie_budget', 2200)
+    calories_today = user_state.get('calories_today', 0)
+    target_cal = (calorie_budget - calories_today) / 3
+    scores = []
+    for meal in meals:
+        score = 0
+        cal_diff = abs(meal.get('calories', 0) - target_cal)
+        score += max(0, 100 - cal_diff / 10)
+        if user_state.get('high_protein_goal', False):
+            protein_ratio = meal.get('protein', 0) / max(meal.get('calories', 1), 1)
+            if protein_ratio > 0.25:
+                score += 20
+        protein = meal.get('protein', 0)
+        carbs = meal.get('carbs', 0)
+        fat = meal.get('fat', 0)
+        if protein > 0 and carbs > 0 and fat > 0:
+            score += 10
+        scores.append(score)
+    return scores
+
+
+def legacy_cold_start(user_state, available_meals, n=5):
+    """The original cold_start_recommendations ranking: loop scores + full stable sort."""
+    filtered = legacy_filter(available_meals, user_state)
+    scored = list(zip(filtered, legacy_scores(user_state, filtered)))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [meal for meal, _ in scored[:n]]
+
+
+def check_states():
+    budgets = [1200, 2000, 2200, 3000]
+    intakes = [0, 350, 900, 1800, 2600]
+    allergen_sets = [[], ['Milk'], ['wheat', 'soy']]
+    for budget, eaten, high_protein, allergens in itertools.product(budgets, intakes, (False, True), allergen_sets):
+        state = sample_state(0)
+        state.update(calorie_budget=budget, calories_today=eaten, high_protein_goal=high_protein,
+                     allergens=allergens, dietary_restrictions=[])
+        yield state
+
+
+def check_equivalence(catalog, n=10):
+    """Assert identical scores and rankings on every view of the catalog."""
+    views = [catalog.view()] + [catalog.view(hall, period) for hall in catalog.halls
+                                for period in ('breakfast', 'lunch', 'dinner', 'midnight')]
+    n_checked = 0
+    for state in check_states():
+        for view in views:
+            for meals in (view, list(view)):
+                assert cold_start_scores(state, meals).tolist() == legacy_scores(state, meals), state
+            expected = [m['catalog_id'] for m in legacy_cold_start(state, list(view), n)]
+            for meals in (view, list(view)):
+                ranked = [m['catalog_id'] for m in cold_start_recommendations(state, meals, n)]
+                assert ranked == expected, state
+            n_checked += 1
+    return n_checked
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check and time the vectorized cold-start scorer.")
+    p.add_argument("--menu", default=DEFAULT_MENU, help="Scraped menu JSON to check against")
+    p.add_argument("--sizes", default="500,2000,10000", help="Comma-separated synthetic catalog sizes")
+    p.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = p.parse_args()
+
+    catalog = fixture_catalog(args.menu)
+    n_checked = check_equivalence(catalog)
+    print(f"Cold start equivalence OK: {n_checked} (state, view) rankings over {len(catalog)} menu items\n")
+
+    state = sample_state(2)
+    state['high_protein_goal'] = True
+    print(f"{'meals':>7} {'vector ms':>10} {'loop ms':>9} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        view = synthetic_catalog_view(synthetic_meals(size, seed=size))
+        vector = best_of(lambda: cold_start_recommendations(state, view, 5), args.repeat)
+        loop = best_of(lambda: legacy_cold_start(state, view, 5), args.repeat)
+        print(f"{size:>7} {vector * 1000:>10.3f} {loop * 1000:>9.3f} {loop / vector:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
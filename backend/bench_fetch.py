@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Scraper HTTP checks against a local stub server.
+
+Starts an http.server on localhost that serves foodpro-menu-ajax style
+payloads and points scrape_multiple_tids at it through its session /
+api_base hooks, so nothing touches umassdining.com. Checks that:
+
+- the result follows the order of the input tids, although halls finish
+  in a different order (later halls answer faster);
+- a hall whose requests fail is reported in its own entry and the other
+  halls are returned unchanged, sequentially, concurrently and with the
+  batched process-pool parse;
+- repeat fetches send If-None-Match / If-Modified-Since, and a 304 returns
+  the cached payload without a body;
+- a 200 with byte-identical content reuses the parsed menu without running
+  the parser (per parser engine), and changed content is parsed again;
+
+then times sequential against concurrent fetching.
+
+Usage:
+  python3 bench_fetch.py
+  python3 bench_fetch.py --delay 0.2
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import scraping
+from scraping import (fetch_menu_payload, fetch_stats, recursively_parse_html_in_obj, response_cache,
+                      scrape_multiple_tids)
+
+DATE = "11/08/2025"
+
+# Halls served by the stub; FAILING_TID always answers 500
+HALL_TIDS = {"Hampshire": 1, "Berkshire": 2, "Franklin": 3, "Worcester": 4}
+FAILING_TID = 99
+
+LAST_MODIFIED = "Sat, 08 Nov 2025 06:00:00 GMT"
+
+
+def stub_payload(tid, version=0):
+    """A small raw payload for a tid: {period: {category: category_html}}."""
+    def category(title, names):
+        items = "".join(f'<li class="lightbox-nutrition"><a href="#" data-calories="{100 + i}" '
+                        f'data-allergens="Milk">{name}</a></li>' for i, name in enumerate(names))
+        return f'<h2 class="menu_category_name">{title}</h2><ul>{items}</ul>'
+    return {
+        "breakfast": {"Grill": category("Grill", [f"Eggs {tid}", f"Toast {tid}"])},
+        "lunch": {"Soups": category("Soups", [f"Soup {tid}"]), "Salads": category("Salads", [f"Salad {tid}.{version}"])},
+    }
+
+
+class StubMenuServer:
+    """
+    Threaded stub of the menu endpoint. Failing tids answer 500; others wait
+    `delays[tid]` first. With validators, responses carry an ETag (hash of the
+    body) and Last-Modified, and a matching If-None-Match gets a 304.
+    Bump versions[tid] to change a hall's payload.
+    """
+
+    def __init__(self, delays=None, failing=(), validators=False):
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.validators = validators
+        self.versions = {}
+        self.requests = []          # (tid, request headers) in arrival order
+        self.answered = []          # tids in the order their responses were sent
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                tid = int(parse_qs(urlparse(self.path).query)["tid"][0])
+                with stub._lock:
+                    stub.requests.append((tid, dict(self.headers)))
+                time.sleep(stub.delays.get(tid, 0))
+                status, headers, body = stub.respond(tid, self.headers)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.answered.append(tid)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.api_base = f"http://127.0.0.1:{self.server.server_address[1]}/foodpro-menu-ajax"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def respond(self, tid, request_headers):
+        if tid in self.failing:
+            return 500, {}, b"stub failure"
+        body = json.dumps(stub_payload(tid, self.versions.get(tid, 0))).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.validators:
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            headers.update({"ETag": etag, "Last-Modified": LAST_MODIFIED})
+            if request_headers.get("If-None-Match") == etag:
+                return 304, headers, b""
+        return 200, headers, body
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def expected_entry(name, tid, version=0):
+    """What scrape_multiple_tids should return for a healthy hall."""
+    parsed = recursively_parse_html_in_obj(stub_payload(tid, version))
+    return {"tid": tid, "date": DATE, "menu": scraping.filter_menu_by_hall(parsed, name)}
+
+
+def scrape(server, tids, **kwargs):
+    response_cache.clear()
+    with requests.Session() as session:
+        return scrape_multiple_tids(tids, DATE, session=session, api_base=server.api_base, **kwargs)
+
+
+def check_order_and_isolation(delay):
+    delays = {tid: delay * (len(HALL_TIDS) - i) for i, tid in enumerate(HALL_TIDS.values())}
+    tids = dict(HALL_TIDS)
+    tids["Broken"] = FAILING_TID
+    # put the failing hall in the middle so it is surrounded by healthy ones
+    order = ["Hampshire", "Berkshire", "Broken", "Franklin", "Worcester"]
+    tids = {name: tids[name] for name in order}
+
+    with StubMenuServer(delays, failing=[FAILING_TID]) as server:
+        for kwargs in ({"max_workers": 1}, {"max_workers": 4}, {"max_workers": 4, "parse_workers": 2}):
+            result = scrape(server, tids, **kwargs)
+            assert list(result) == order, (kwargs, list(result))
+            for name, tid in tids.items():
+                if tid == FAILING_TID:
+                    assert set(result[name]) == {"tid", "date", "error"}, result[name]
+                    assert "500" in result[name]["error"], result[name]["error"]
+                else:
+                    assert result[name] == expected_entry(name, tid), (kwargs, name)
+
+        # concurrently fetched halls finish last-to-first, yet the result keeps the input order
+        server.answered.clear()
+        result = scrape(server, HALL_TIDS, max_workers=4)
+        assert server.answered == list(reversed(HALL_TIDS.values())), server.answered
+        assert list(result) == list(HALL_TIDS)
+
+
+def counting_parser(calls, parse_html_fragment):
+    """Wrap parse_html_fragment so every fragment the scraper parses is recorded with its engine."""
+    def parse(fragment, verbose=False, engine=None):
+        calls.append(engine)
+        return parse_html_fragment(fragment, verbose=verbose, engine=engine)
+    return parse
+
+
+def check_conditional_requests():
+    with StubMenuServer(validators=True) as server, requests.Session() as session:
+        response_cache.clear()
+        tid = HALL_TIDS["Franklin"]
+        before = fetch_stats()
+        first, digest = fetch_menu_payload(tid, DATE, session=session, api_base=server.api_base)
+        second, second_digest = fetch_menu_payload(tid, DATE, session=session, api_base=server.api_base)
+        stats = fetch_stats()
+
+        (_, plain), (_, conditional) = server.requests
+        assert "If-None-Match" not in plain and "If-Modified-Since" not in plain, plain
+        assert conditional["If-None-Match"].startswith('"'), conditional
+        assert conditional["If-Modified-Since"] == LAST_MODIFIED, conditional
+        assert second == first == stub_payload(tid) and second_digest == digest
+        assert stats["requests"] - before["requests"] == 2
+        assert stats["not_modified"] - before["not_modified"] == 1
+
+        # a changed payload has a new ETag, so the 304 path must not hide it
+        server.versions[tid] = 1
+        third, third_digest = fetch_menu_payload(tid, DATE, session=session, api_base=server.api_base)
+        assert third == stub_payload(tid, 1) and third_digest != digest
+        assert fetch_stats()["not_modified"] - before["not_modified"] == 1
+
+
+def check_parse_skipped():
+    # No validators: every fetch is a full 200, so reuse relies on the body hash alone
+    calls = []
+    original = scraping.parse_html_fragment
+    scraping.parse_html_fragment = counting_parser(calls, original)
+    per_hall = len(stub_payload(0)["breakfast"]) + len(stub_payload(0)["lunch"])
+    try:
+        with StubMenuServer() as server, requests.Session() as session:
+            response_cache.clear()
+            tids = {"Franklin": HALL_TIDS["Franklin"], "Worcester": HALL_TIDS["Worcester"]}
+
+            def run(engine=None):
+                return scrape_multiple_tids(tids, DATE, max_workers=1, session=session,
+                                            api_base=server.api_base, engine=engine)
+
+            before = fetch_stats()
+            first = run()
+            assert len(calls) == 2 * per_hall, calls
+            second = run()
+            assert second == first and len(calls) == 2 * per_hall, "unchanged payload was parsed again"
+            stats = fetch_stats()
+            assert stats["unchanged_payloads"] - before["unchanged_payloads"] == 2
+            assert stats["parse_skipped"] - before["parse_skipped"] == 2
+
+            # the cached result is a copy: callers mutating it do not change the next reuse
+            second["Franklin"]["menu"].clear()
+            assert run() == first and len(calls) == 2 * per_hall
+
+            # the default engine shares its parse with an explicit "html.parser", not with other engines
+            assert run("html.parser") == first and len(calls) == 2 * per_hall
+            run("stream")
+            assert calls[2 * per_hall:] == ["stream"] * 2 * per_hall, calls
+            run("stream")
+            assert len(calls) == 4 * per_hall, calls
+
+            # changed bytes for one hall are parsed again; the other hall is still reused
+            server.versions[tids["Worcester"]] = 1
+            third = run()
+            assert calls[4 * per_hall:] == [None] * per_hall, calls
+            assert third["Franklin"] == first["Franklin"]
+            assert third["Worcester"] == expected_entry("Worcester", tids["Worcester"], version=1)
+    finally:
+        scraping.parse_html_fragment = original
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check and time scrape_multiple_tids against a local stub server.")
+    p.add_argument("--delay", type=float, default=0.1, help="Per-hall stub response delay step (seconds)")
+    args = p.parse_args()
+
+    check_order_and_isolation(args.delay)
+    print("Order and isolation OK: results follow the input tids; a failing hall only fails its own entry")
+    check_conditional_requests()
+    print("Conditional requests OK: If-None-Match / If-Modified-Since sent, 304 served from cache")
+    check_parse_skipped()
+    print("Parse reuse OK: unchanged bodies skip the parser per engine; changed bodies are parsed again\n")
+
+    delays = {tid: args.delay for tid in HALL_TIDS.values()}
+    with StubMenuServer(delays) as server:
+        print(f"{'workers':>8} {'seconds':>8}")
+        for workers in (1, len(HALL_TIDS)):
+            start = time.perf_counter()
+            scrape(server, HALL_TIDS, max_workers=workers)
+            print(f"{workers:>8} {time.perf_counter() - start:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Allergen / dietary filter check and benchmark.
+
+filter_meals filters a CatalogView with a mask built from per-catalog
+substring lookup tables instead of lowercasing and scanning every meal's
+allergens and clean_diet strings. This script checks that, on the committed
+menu JSON, the mask keeps exactly the meals the original per-meal loop keeps
+(and that cold_start_recommendations returns the same meals) for every
+allergen in the menu, substrings of them, mixed case, combinations and the
+vegetarian restriction; then times both paths on synthetic catalogs.
+
+Usage:
+  python3 bench_filter.py
+  python3 bench_filter.py --menu umass_menu_parsed.json --sizes 500,5000 --repeat 5
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+
+from bench_recommend import best_of
+from meal_catalog import MealCatalog
+from rl_recommender import cold_start_recommendations, filter_meals
+from synthetic_data import sample_state, synthetic_catalog_view, synthetic_meals
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MENU = os.path.join(BACKEND_DIR, 'umass_menu_parsed.json')
+
+
+def _flatten(value):
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict) and item.get('name')]
+    if isinstance(value, dict):
+        return [item for nested in value.values() for item in _flatten(nested)]
+    return []
+
+
+def fixture_catalog(path=DEFAULT_MENU) -> MealCatalog:
+    """Every item of a scraped menu file, with categories flattened to item lists."""
+    with open(path) as f:
+        menu = json.load(f)
+    flat = {}
+    for hall, hall_data in menu.items():
+        periods = {}
+        for period, categories in (hall_data.get('menu') or {}).items():
+            if isinstance(categories, dict):
+                periods[period] = {category: _flatten(items) for category, items in categories.items()}
+        flat[hall] = {'menu': periods}
+    return MealCatalog(flat)
+
+
+def legacy_filter(meals, state):
+    """The original per-meal loop from _filter_meals / cold_start_recommendations."""
+    filtered = []
+    allergens = [a.lower() for a in state.get('allergens', [])]
+    dietary_restrictions = [r.lower() for r in state.get('dietary_restrictions', [])]
+    for meal in meals:
+        meal_allergens = meal.get('allergens', '').lower()
+        if any(allergen in meal_allergens for allergen in allergens):
+            continue
+        meal_clean_diet = meal.get('clean_diet', '').lower()
+        if 'vegetarian' in dietary_restrictions and 'vegetarian' not in meal_clean_diet and 'plant' not in meal_clean_diet:
+            continue
+        filtered.append(meal)
+    return filtered
+
+
+def check_states(catalog, n_random=200, seed=0):
+    """Allergen/diet combinations to compare on a catalog."""
+    vocabulary = sorted({a.strip() for m in catalog.meals for a in m['allergens'].split(',') if a.strip()})
+    terms = vocabulary + [a.upper() for a in vocabulary] + [a[:3] for a in vocabulary] + ['nut', 'xyz', ' ', '']
+    rng = random.Random(seed)
+    allergen_sets = [[]] + [[t] for t in terms]
+    allergen_sets += [rng.sample(terms, rng.randint(2, 4)) for _ in range(n_random)]
+    diets = [[], ['Vegetarian'], ['vegetarian', 'Halal'], ['Vegan']]
+    for allergens, diet in itertools.product(allergen_sets, diets):
+        state = sample_state(0)
+        state['allergens'] = allergens
+        state['dietary_restrictions'] = diet
+        yield state
+
+
+def check_equivalence(catalog):
+    """Assert the mask path equals the per-meal loop for every check state."""
+    views = [catalog.view()] + [catalog.view(hall, period) for hall in catalog.halls
+                                for period in ('breakfast', 'lunch', 'dinner', 'midnight')]
+    n_checked = 0
+    for state in check_states(catalog):
+        for view in views:
+            expected = legacy_filter(list(view), state)
+            filtered = filter_meals(view, state)
+            assert [m['catalog_id'] for m in filtered] == [m['catalog_id'] for m in expected], state
+            assert [m['catalog_id'] for m in filtered] == [catalog.ids[r] for r in filtered.rows], state
+            n_checked += 1
+        full = catalog.view()
+        assert cold_start_recommendations(state, full, 10) == cold_start_recommendations(state, list(full), 10), state
+    return n_checked
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check and time the catalog allergen/diet filter.")
+    p.add_argument("--menu", default=DEFAULT_MENU, help="Scraped menu JSON to check against")
+    p.add_argument("--sizes", default="500,2000,10000", help="Comma-separated synthetic catalog sizes")
+    p.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = p.parse_args()
+
+    catalog = fixture_catalog(args.menu)
+    n_checked = check_equivalence(catalog)
+    print(f"Filter equivalence OK: {n_checked} (state, view) pairs over {len(catalog)} menu items\n")
+
+    state = sample_state(1)
+    state['allergens'] = ['Milk', 'tree nuts', 'soy']
+    state['dietary_restrictions'] = ['Vegetarian']
+    print(f"{'meals':>7} {'mask ms':>9} {'loop ms':>9} {'speedup':>8}")
+    for n in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        view = synthetic_catalog_view(synthetic_meals(n, seed=n))
+        filter_meals(view, state)  # build the catalog columns and term tables once
+        mask = best_of(lambda: filter_meals(view, state), args.repeat)
+        loop = best_of(lambda: legacy_filter(view, state), args.repeat)
+        print(f"{n:>7} {mask * 1000:>9.3f} {loop * 1000:>9.3f} {loop / mask:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+MenuMDP solve check and benchmark.
+
+MenuMDP.solve evaluates one action at a time as an outer sum of two
+(calories, protein) / (carbs, fat) offset rows instead of gathering chunks of
+actions through per-state index tables. This script checks that it returns
+exactly the values and policy of the original chunked solver, on the
+committed menu and on synthetic menus, for the default buckets and the
+finer original ones (10 g protein, 20 g carbs, 10 g fat); then times both
+solvers on a 3-meal day with N items per meal.
+
+Usage:
+  python3 bench_mdp.py
+  python3 bench_mdp.py --sizes 1000,3000 --repeat 3
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+import menu_mdp
+from bench_filter import DEFAULT_MENU
+from bench_recommend import best_of
+from menu_mdp import MenuMDP, items_by_period
+
+# Bucket sizes before the macros were coarsened
+FINE_BUCKETS = {'calories': 100, 'protein': 10, 'carbs': 20, 'fat': 10}
+
+# Solve time the default grid must stay under for the largest synthetic day
+TARGET_SECONDS = 1.0
+
+
+def legacy_solve(mdp, chunk=64):
+    """The original solver: per-state pair index tables, chunks of actions, argmax per chunk."""
+    n_cal, n_pro, n_carb, n_fat = mdp.shape
+    levels = np.unravel_index(np.arange(mdp.n_states, dtype=np.int64), mdp.shape)
+    pair_a = (levels[0] * n_pro + levels[1]).astype(np.int32)
+    pair_b = (levels[2] * n_fat + levels[3]).astype(np.int32)
+    grid_a = np.unravel_index(np.arange(n_cal * n_pro), (n_cal, n_pro))
+    grid_b = np.unravel_index(np.arange(n_carb * n_fat), (n_carb, n_fat))
+    stride_cal, stride_pro, stride_carb = n_pro * n_carb * n_fat, n_carb * n_fat, n_fat
+
+    V_next = mdp.terminal_values()
+    values, policy = [], []
+    rows = np.arange(mdp.n_states)
+    for stage in reversed(range(len(mdp.periods))):
+        shifts, representative, step = mdp._action_shifts(stage)
+        table_a = (stride_cal * np.clip(grid_a[0][:, None] - shifts[None, :, 0], 0, n_cal - 1)
+                   + stride_pro * np.clip(grid_a[1][:, None] - shifts[None, :, 1], 0, n_pro - 1)).astype(np.int32)
+        table_b = (stride_carb * np.clip(grid_b[0][:, None] - shifts[None, :, 2], 0, n_carb - 1)
+                   + np.clip(grid_b[1][:, None] - shifts[None, :, 3], 0, n_fat - 1)).astype(np.int32)
+        best = np.full(mdp.n_states, -np.inf)
+        best_action = np.zeros(mdp.n_states, dtype=np.int64)
+        for start in range(0, len(shifts), chunk):
+            stop = min(start + chunk, len(shifts))
+            Q = V_next[table_a[pair_a, start:stop] + table_b[pair_b, start:stop]] + step[start:stop]
+            chosen = Q.argmax(axis=1)
+            q = Q[rows, chosen]
+            better = q > best
+            best[better] = q[better]
+            best_action[better] = representative[start + chosen[better]]
+        values.append(best)
+        policy.append(best_action)
+        V_next = best
+    return values[::-1], policy[::-1]
+
+
+def synthetic_day(n_items, seed=0, periods=('breakfast', 'lunch', 'dinner')):
+    """{period: items} with nutrition spread evenly, so few items share a bucketed shift."""
+    rng = np.random.default_rng(seed)
+    return {period: [{'name': f'{period} item {i}', 'category': 'synthetic',
+                      'calories': float(rng.uniform(0, 1500)), 'protein': float(rng.uniform(0, 80)),
+                      'carbs': float(rng.uniform(0, 200)), 'fat': float(rng.uniform(0, 80))}
+                     for i in range(n_items)]
+            for period in periods}
+
+
+def fixture_days(path=DEFAULT_MENU):
+    with open(path) as f:
+        menu = json.load(f)
+    return [items_by_period(hall_data) for hall_data in menu.values()]
+
+
+def with_buckets(buckets):
+    menu_mdp.BUCKETS.clear()
+    menu_mdp.BUCKETS.update(buckets)
+
+
+def check_equivalence(days):
+    """Assert identical values and policy on every day, for the default and the fine grid."""
+    n_checked = 0
+    for buckets in (dict(menu_mdp.BUCKETS), FINE_BUCKETS):
+        with_buckets(buckets)
+        for day in days:
+            if not day:
+                continue
+            mdp = MenuMDP(day).solve()
+            values, policy = legacy_solve(MenuMDP(day))
+            for stage in range(len(mdp.periods)):
+                assert np.array_equal(mdp.values[stage], values[stage]), (buckets, stage)
+                assert np.array_equal(mdp.policy[stage], policy[stage]), (buckets, stage)
+            n_checked += 1
+    return n_checked
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check and time MenuMDP.solve.")
+    p.add_argument("--menu", default=DEFAULT_MENU, help="Scraped menu JSON to check against")
+    p.add_argument("--sizes", default="300,1000,3000", help="Comma-separated items per meal (3 meals)")
+    p.add_argument("--repeat", type=int, default=1, help="Timing repetitions (best is reported)")
+    args = p.parse_args()
+
+    default_buckets = dict(menu_mdp.BUCKETS)
+    days = fixture_days(args.menu) + [synthetic_day(200, seed=1), synthetic_day(50, seed=2)]
+    n_checked = check_equivalence(days)
+    with_buckets(default_buckets)
+    print(f"Solver equivalence OK: {n_checked} (menu, bucket grid) pairs match the chunked solver\n")
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"{'grid':<8} {'items':>6} {'states':>7} {'actions':>8} {'solve s':>8} {'chunked s':>10}")
+    timings = {}
+    for name, buckets in (("default", default_buckets), ("fine", FINE_BUCKETS)):
+        with_buckets(buckets)
+        for size in sizes:
+            day = synthetic_day(size, seed=size)
+            mdp = MenuMDP(day)
+            actions = sum(len(mdp._action_shifts(stage)[0]) for stage in range(len(mdp.periods)))
+            solve = best_of(lambda: MenuMDP(day).solve(), args.repeat)
+            chunked = best_of(lambda: legacy_solve(MenuMDP(day)), args.repeat)
+            timings[name, size] = solve
+            print(f"{name:<8} {size:>6} {mdp.n_states:>7} {actions:>8} {solve:>8.3f} {chunked:>10.3f}")
+    with_buckets(default_buckets)
+
+    largest = timings["default", max(sizes)]
+    verdict = "OK" if largest < TARGET_SECONDS else "OVER TARGET"
+    print(f"\nDefault grid, {max(sizes)} items per meal: {largest:.3f}s (target < {TARGET_SECONDS:.0f}s) {verdict}")
+
+
+if __name__ == "__main__":
+    main()
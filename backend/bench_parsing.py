@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark and equivalence check for the category HTML parser engines.
+
+The committed umass_menu_parsed.json holds parsed items, not the raw AJAX
+payload, so each category is rendered back into the foodpro markup
+(<h2 class="menu_category_name">, <li class="lightbox-nutrition"><a data-*>).
+Every engine must return exactly what the reference html.parser engine
+returns, and the reference must reproduce the committed items.
+parse_payloads_parallel (the process-pool path of scrape_multiple_tids)
+must return exactly what recursively_parse_html_in_obj returns per payload.
+
+Usage:
+  python3 bench_parsing.py                # check + benchmark all engines
+  python3 bench_parsing.py --repeat 20
+  python3 bench_parsing.py --parse-workers 4
+"""
+
+import argparse
+import json
+import os
+import time
+from html import escape
+
+from scraping import (DEFAULT_OUTFILE, PARSER_ENGINES, parse_category_html, parse_payloads_parallel,
+                      recursively_parse_html_in_obj)
+
+REFERENCE_ENGINE = "html.parser"
+
+# Markup the menu feed does not normally produce, to exercise the fallbacks
+EDGE_CASES = [
+    "<ul><li>Plain item</li><li>  Second &amp; last </li><li> </li></ul>",
+    "<h2>No class title</h2><h2 class='menu_category_name'>Real <b>Title</b></h2><ul><li class='x lightbox-nutrition'>No link <img src='a.png'></li></ul>",
+    "<li class='lightbox-nutrition'><a data-calories='12.7' data-allergens=' Milk '>Outer <span>text</span></a><a data-calories='1'>second</a><img src='v.png' alt='Vegan'><img src='h.png'></li>",
+    "<h2 class='menu_category_name'>  Spaced <!-- note -->  Out </h2><ul><li class='lightbox-nutrition'><a data-dishname='x' data-calories=''>A &lt;b&gt;</a></ul>",
+    "<ul><li class='lightbox-nutrition'><a data-calories='5'>Unclosed link</li><li class='lightbox-nutrition'>Nested <ul><li class='lightbox-nutrition'><a>Inner</a></li></ul></li></ul>",
+]
+
+
+def render_category(title, items):
+    """Render parsed items back into the category markup served by the endpoint."""
+    lines = [f'<h2 class="menu_category_name">{escape(title)}</h2>', "<ul class=\"items\">"]
+    for item in items:
+        attrs = " ".join(f'{k}="{escape(v, quote=True)}"' for k, v in item.get("raw_attrs", {}).items())
+        icons = "".join(f'<img src="{escape(i["src"] or "")}" alt="{escape(i.get("alt", ""))}">'
+                        for i in item.get("icons", []))
+        lines.append(f'  <li class="lightbox-nutrition">\n    <a href="#" {attrs}>{escape(item["name"])}</a>{icons}\n  </li>')
+    lines.append("</ul>")
+    return "\n".join(lines)
+
+
+def load_fragments(json_file):
+    """Return [(fragment_html, expected_items)] for every category in the menu file."""
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    fragments = []
+    for hall_data in data.values():
+        for period in (hall_data.get("menu") or {}).values():
+            for category in period.values():
+                if not isinstance(category, dict):
+                    continue
+                for title, items in category.items():
+                    fragments.append((render_category(title, items), {"title": title, "items": items}))
+    return fragments
+
+
+def load_payloads(json_file):
+    """Rebuild one raw-looking payload per hall: {period: {category: fragment_html}} plus plain fields."""
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    payloads = []
+    for hall_data in data.values():
+        payload = {"date": hall_data.get("date"), "note": "plain text, not HTML"}
+        for period_name, period in (hall_data.get("menu") or {}).items():
+            payload[period_name] = {
+                title: render_category(title, items)
+                for category in period.values() if isinstance(category, dict)
+                for title, items in category.items()
+            }
+        payloads.append(payload)
+    # a payload that is a bare list of fragments, and one with no HTML at all
+    payloads.append(EDGE_CASES + ["not html", 7, None])
+    payloads.append({"menu": {}})
+    return payloads
+
+
+def check_parallel_parse(payloads, workers):
+    """Assert the batched process-pool parse equals recursively_parse_html_in_obj on each payload."""
+    for engine in PARSER_ENGINES:
+        expected = [recursively_parse_html_in_obj(p, engine=engine) for p in payloads]
+        assert parse_payloads_parallel(payloads, workers, engine=engine) == expected, f"{engine}: parallel parse differs"
+        assert parse_payloads_parallel(payloads, 1, engine=engine) == expected, f"{engine}: serial batch differs"
+
+
+def check_equivalence(fragments):
+    """Assert every engine matches the reference engine (and the committed items)."""
+    for html_fragment, expected in fragments:
+        reference = parse_category_html(html_fragment, engine=REFERENCE_ENGINE)
+        assert reference == expected, f"reference parser does not reproduce fixture category {expected['title']!r}"
+    for html_fragment in [f for f, _ in fragments] + EDGE_CASES:
+        reference = parse_category_html(html_fragment, engine=REFERENCE_ENGINE)
+        for engine in PARSER_ENGINES:
+            result = parse_category_html(html_fragment, engine=engine)
+            assert result == reference, f"{engine} differs from {REFERENCE_ENGINE} on:\n{html_fragment[:200]}"
+
+
+def benchmark(fragments, repeat):
+    html_fragments = [f for f, _ in fragments]
+    results = {}
+    for engine in PARSER_ENGINES:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for html_fragment in html_fragments:
+                parse_category_html(html_fragment, engine=engine)
+            best = min(best, time.perf_counter() - start)
+        results[engine] = best
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare parse_category_html engines on the committed menu.")
+    p.add_argument("--menu", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_OUTFILE))
+    p.add_argument("--repeat", type=int, default=5, help="Timing repetitions per engine (best is reported)")
+    p.add_argument("--parse-workers", type=int, default=2, help="Processes for the parse_payloads_parallel check")
+    args = p.parse_args()
+
+    fragments = load_fragments(args.menu)
+    n_items = sum(len(expected["items"]) for _, expected in fragments)
+    check_equivalence(fragments)
+    print(f"Equivalence OK: {len(fragments)} fixture categories ({n_items} items) + {len(EDGE_CASES)} edge cases")
+    payloads = load_payloads(args.menu)
+    check_parallel_parse(payloads, args.parse_workers)
+    print(f"Parallel parse OK: {len(payloads)} payloads on {args.parse_workers} processes match recursively_parse_html_in_obj")
+
+    timings = benchmark(fragments, args.repeat)
+    reference = timings[REFERENCE_ENGINE]
+    print(f"\n{'engine':<12} {'total ms':>10} {'us/item':>10} {'speedup':>8}")
+    for engine, seconds in timings.items():
+        print(f"{engine:<12} {seconds * 1000:>10.1f} {seconds * 1e6 / max(n_items, 1):>10.1f} {reference / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Save/load benchmark for MealRecommenderBandit persistence.
+
+Compares the original format (indented JSON history + pickled estimator)
+with the current one (JSON header + float32 .npy history + zlib-compressed
+protocol-5 pickle of the estimator) for several history lengths, reporting
+bytes per user and save and load times. Also checks that both formats
+round-trip to a model with the same predictions.
+
+Usage:
+  python3 bench_persistence.py
+  python3 bench_persistence.py --sizes 50,500,5000 --model-type linucb
+"""
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from bench_recommend import best_of
+from rl_recommender import MODEL_TYPES, MealRecommenderBandit, _is_fitted
+from synthetic_data import sample_state, synthetic_meals
+
+
+def legacy_save(bandit, filepath):
+    """The original MealRecommenderBandit.save format."""
+    data = {
+        'user_id': bandit.user_id,
+        'epsilon': bandit.epsilon,
+        'meal_history': [(ctx.tolist() if isinstance(ctx, np.ndarray) else ctx, r) for ctx, r in bandit.meal_history],
+        'preferences': bandit.preferences,
+        'is_trained': bandit.is_trained,
+        'model_type': bandit.model_type
+    }
+    if bandit.is_trained and _is_fitted(bandit.model):
+        model_path = filepath.replace('.json', '_model.pkl')
+        with open(model_path, 'wb') as f:
+            pickle.dump(bandit.model, f)
+        data['model_path'] = model_path
+    with open(filepath, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def trained_bandit(n_history, model_type, seed=0):
+    rng = np.random.RandomState(seed)
+    bandit = MealRecommenderBandit(user_id=f"bench_{n_history}", model_type=model_type)
+    meals = synthetic_meals(n_history, seed=seed + 1)
+    for i, meal in enumerate(meals):
+        bandit.update(sample_state(i), meal, float(rng.uniform(-1, 1)), train=False)
+    bandit.train(force=True)
+    return bandit
+
+
+def directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def measure(bandit, save, repeat):
+    """(bytes on disk, save seconds, load seconds, loaded bandit) for one format."""
+    directory = tempfile.mkdtemp(prefix="bench_persistence_")
+    try:
+        filepath = os.path.join(directory, f"{bandit.user_id}_model.json")
+        save_s = best_of(lambda: save(bandit, filepath), repeat)
+        n_bytes = directory_bytes(directory)
+        load_s = best_of(lambda: MealRecommenderBandit.load(filepath, model_type=bandit.model_type), repeat)
+        loaded = MealRecommenderBandit.load(filepath, model_type=bandit.model_type)
+        return n_bytes, save_s, load_s, loaded
+    finally:
+        shutil.rmtree(directory)
+
+
+def check_round_trip(original, loaded, label):
+    assert len(loaded.meal_history) == len(original.meal_history), label
+    assert loaded.is_trained == original.is_trained, label
+    if original.is_trained:
+        X = original.get_context_features_batch(sample_state(7), synthetic_meals(50, seed=7))
+        assert np.allclose(loaded.model.predict(X), original.model.predict(X)), label
+    for (ctx_a, r_a), (ctx_b, r_b) in zip(original.meal_history, loaded.meal_history):
+        assert np.allclose(ctx_a, ctx_b, atol=1e-6) and abs(r_a - r_b) < 1e-6, label
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare original and compact bandit persistence formats.")
+    p.add_argument("--sizes", default="20,200,2000", help="Comma-separated history lengths")
+    p.add_argument("--model-type", default="forest", choices=MODEL_TYPES)
+    p.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    args = p.parse_args()
+
+    print(f"model_type={args.model_type}")
+    print(f"{'history':>8} {'format':>8} {'KB/user':>9} {'save ms':>9} {'load ms':>9}")
+    for n in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        bandit = trained_bandit(n, args.model_type)
+        results = {}
+        for label, save in (("original", legacy_save), ("compact", MealRecommenderBandit.save)):
+            n_bytes, save_s, load_s, loaded = measure(bandit, save, args.repeat)
+            check_round_trip(bandit, loaded, f"{label} n={n}")
+            results[label] = n_bytes
+            print(f"{n:>8} {label:>8} {n_bytes / 1024:>9.1f} {save_s * 1000:>9.2f} {load_s * 1000:>9.2f}")
+        print(f"{'':>8} {'ratio':>8} {results['original'] / results['compact']:>8.1f}x")
+    print("\nRound trip OK: both formats reload with identical predictions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for MealRecommenderBandit.recommend_meals.
+
+Compares the exploit path (one batched model.predict over all candidates)
+with the previous per-candidate predict loop, for catalog sizes 50-5,000,
+and checks that get_context_features_batch matches get_context_features
+row for row, and that top_k_indices ranks exactly like a full stable sort.
+
+Usage:
+  python3 bench_recommend.py
+  python3 bench_recommend.py --sizes 50,500,5000 --repeat 5
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from rl_recommender import MealRecommenderBandit, top_k_indices
+from synthetic_data import sample_state, synthetic_catalog_view, synthetic_meals
+
+
+def trained_bandit(n_feedback=60, seed=0):
+    """A bandit fitted on synthetic feedback, with exploration disabled."""
+    rng = np.random.RandomState(seed)
+    bandit = MealRecommenderBandit(user_id="bench", epsilon=0.0)
+    meals = synthetic_meals(n_feedback, seed=seed + 1)
+    for i, meal in enumerate(meals):
+        bandit.update(sample_state(i), meal, float(rng.uniform(-1, 1)))
+    return bandit
+
+
+def legacy_scores(bandit, state, meals):
+    """The previous exploit path: one predict call per candidate."""
+    scores = []
+    for meal in meals:
+        context = bandit.get_context_features(state, meal)
+        scores.append(bandit.model.predict([context])[0])
+    return np.array(scores)
+
+
+def check_feature_equivalence(bandit, n_states=25):
+    """Assert the batch feature builder equals stacking the per-row builder."""
+    meals = synthetic_meals(400, seed=99)
+    rng = random.Random(99)
+    for i in range(n_states):
+        state = sample_state(i)
+        state['favorite_cuisines'] = rng.sample(['Italian', 'asian', 'lat', ''], rng.randint(0, 2))
+        state['favorite_dining_halls'] = rng.sample(['worcester', 'Frank'], rng.randint(0, 2))
+        state['recent_meals'] = rng.sample(['Tofu', 'grilled chicken 1', 'x'], rng.randint(0, 2))
+        state['allergens'] = rng.sample(['milk', 'SOY', 'nuts'], rng.randint(0, 2))
+        state['dietary_restrictions'] = rng.sample(['Vegetarian', 'halal'], rng.randint(0, 2))
+        view = synthetic_catalog_view(meals)
+        for candidates in (meals, view, view.subset(np.arange(0, len(view), 3))):
+            expected = np.vstack([bandit.get_context_features(state, meal) for meal in candidates])
+            assert np.array_equal(bandit.get_context_features_batch(state, candidates), expected), f"state {i}"
+
+
+def sorted_top_k(scores, k):
+    """The previous selection: stable sort of every candidate, then the first k."""
+    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    return order[:k]
+
+
+def check_top_k(n_trials=300, seed=0):
+    """Assert top_k_indices == full stable sort, including heavy ties."""
+    rng = np.random.RandomState(seed)
+    for trial in range(n_trials):
+        n = rng.randint(0, 400)
+        scores = rng.randint(0, rng.randint(1, 20), size=n).astype(float) if trial % 2 else rng.uniform(-1, 1, n)
+        for k in (0, 1, 5, n // 2, n, n + 3):
+            assert top_k_indices(scores, k).tolist() == sorted_top_k(scores.tolist(), k), (trial, k)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark batched vs per-candidate scoring in recommend_meals.")
+    p.add_argument("--sizes", default="50,200,1000,5000", help="Comma-separated catalog sizes")
+    p.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    p.add_argument("--legacy-max", type=int, default=1000,
+                   help="Skip the per-candidate loop above this size (it is very slow)")
+    args = p.parse_args()
+
+    bandit = trained_bandit()
+    state = sample_state(123)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    check_feature_equivalence(bandit)
+    print("Feature equivalence OK: get_context_features_batch == get_context_features")
+    check_top_k()
+    print("Top-k OK: top_k_indices == stable full sort\n")
+
+    print(f"{'candidates':>10} {'catalog batch ms':>17} {'list batch ms':>14} {'per-row ms':>11}")
+    for n in sizes:
+        meals = synthetic_meals(n, seed=n)
+        view = synthetic_catalog_view(meals)
+        bandit.get_context_features_batch(state, view)  # build the catalog's meal columns once
+        catalog_batch = best_of(lambda: bandit.get_context_features_batch(state, view), args.repeat)
+        list_batch = best_of(lambda: bandit.get_context_features_batch(state, meals), args.repeat)
+        per_row = best_of(lambda: [bandit.get_context_features(state, meal) for meal in meals], args.repeat)
+        print(f"{n:>10} {catalog_batch * 1000:>17.2f} {list_batch * 1000:>14.2f} {per_row * 1000:>11.2f}")
+    print()
+
+    print(f"{'candidates':>10} {'top-5 ms':>9} {'full sort ms':>13}")
+    for n in sizes:
+        scores = np.random.RandomState(n).uniform(-1, 1, n)
+        top_k = best_of(lambda: top_k_indices(scores, 5), args.repeat)
+        full = best_of(lambda: sorted_top_k(scores.tolist(), 5), args.repeat)
+        print(f"{n:>10} {top_k * 1000:>9.3f} {full * 1000:>13.3f}")
+    print()
+
+    print(f"{'candidates':>10} {'batched ms':>11} {'per-item ms':>12} {'speedup':>8}")
+    for n in sizes:
+        meals = synthetic_meals(n, seed=n)
+        batched = best_of(lambda: bandit.recommend_meals(state, meals, 5), args.repeat)
+        if n <= args.legacy_max:
+            filtered = bandit._filter_meals(meals, state)
+            per_item = best_of(lambda: legacy_scores(bandit, state, filtered), 1)
+            print(f"{n:>10} {batched * 1000:>11.1f} {per_item * 1000:>12.1f} {per_item / batched:>7.1f}x")
+        else:
+            print(f"{n:>10} {batched * 1000:>11.1f} {'(skipped)':>12} {'':>8}")
+
+
+if __name__ == "__main__":
+    main()
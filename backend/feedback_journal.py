@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Feedback Journal
+----------------
+Append-only, line-delimited log of RL feedback events.
+
+The feedback endpoint used to read all of user_models/feedback_log.json,
+append one entry and rewrite the file. The journal instead appends one JSON
+line to the current segment (a single write), so the cost per event does not
+depend on how many events already exist.
+
+- Segments (feedback-000001.jsonl, ...) rotate at SEGMENT_MAX_BYTES. A
+  segment left with a torn last line by a crash is never appended to again.
+- Writes reach the OS immediately; fsync is batched on a background thread
+  every FSYNC_INTERVAL seconds (0 = fsync every append).
+- iter_entries() streams events back in order for replay and backfills.
+
+Usage:
+  python3 feedback_journal.py                      # stream all entries as JSON lines
+  python3 feedback_journal.py --user user123
+  python3 feedback_journal.py --stats
+  python3 feedback_journal.py --import-legacy user_models/feedback_log.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JOURNAL_DIR = os.path.join(BACKEND_DIR, 'user_models', 'feedback_journal')
+
+# Start a new segment once the current one reaches this size
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+
+# Seconds between batched fsyncs (0 = fsync on every append)
+FSYNC_INTERVAL = 1.0
+
+_SEGMENT_RE = re.compile(r'^feedback-(\d{6})\.jsonl$')
+
+
+def _ends_with_torn_line(path: str) -> bool:
+    """True if a segment is non-empty and its last byte is not a newline."""
+    with open(path, 'rb') as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
+
+class FeedbackJournal:
+    """
+    Segment-rotated JSONL journal. Safe to share between request threads.
+    """
+
+    def __init__(self, directory: str = DEFAULT_JOURNAL_DIR, segment_max_bytes: int = SEGMENT_MAX_BYTES,
+                 fsync_interval: float = FSYNC_INTERVAL):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._index = 0
+        self._size = 0
+        self._dirty = False
+        self._flusher = None
+        self._stop = threading.Event()
+
+        self.stats_counters = {
+            'appended': 0,
+            'bytes_appended': 0,
+            'fsyncs': 0,
+            'rotations': 0,
+            'skipped_lines': 0,
+            'torn_segments': 0
+        }
+
+    # ---------------- Segments ----------------------------------------
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"feedback-{index:06d}.jsonl")
+
+    def segments(self) -> List[str]:
+        """Segment paths, oldest first."""
+        indexed = []
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_RE.match(name)
+            if match:
+                indexed.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return [path for _, path in sorted(indexed)]
+
+    def _open(self, index: int):
+        # Caller holds self._lock. Unbuffered append: each entry is one write().
+        self._index = index
+        self._file = open(self._segment_path(index), 'ab', buffering=0)
+        self._size = self._file.seek(0, os.SEEK_END)
+
+    def _current(self):
+        if self._file is None:
+            existing = self.segments()
+            if not existing:
+                self._open(1)
+            else:
+                index = int(_SEGMENT_RE.match(os.path.basename(existing[-1])).group(1))
+                if _ends_with_torn_line(existing[-1]):
+                    # A crash mid-append left a line without its newline; appending to it would
+                    # glue the next event onto the torn bytes. Leave it as-is and start a new segment.
+                    self.stats_counters['torn_segments'] += 1
+                    index += 1
+                self._open(index)
+        return self._file
+
+    def _rotate(self):
+        # Caller holds self._lock
+        self._sync_locked()
+        self._file.close()
+        self._open(self._index + 1)
+        self.stats_counters['rotations'] += 1
+
+    # ---------------- Writing -----------------------------------------
+    def append(self, entry: Dict[str, Any]):
+        """Append one event. Constant cost regardless of journal size."""
+        line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            f = self._current()
+            if self._size and self._size + len(line) > self.segment_max_bytes:
+                self._rotate()
+                f = self._file
+            f.write(line)
+            self._size += len(line)
+            self._dirty = True
+            self.stats_counters['appended'] += 1
+            self.stats_counters['bytes_appended'] += len(line)
+            if self.fsync_interval <= 0:
+                self._sync_locked()
+        if self.fsync_interval > 0:
+            self._start_flusher()
+
+    def _sync_locked(self):
+        if self._dirty and self._file is not None:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self.stats_counters['fsyncs'] += 1
+
+    def sync(self):
+        """fsync pending appends now."""
+        with self._lock:
+            self._sync_locked()
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='feedback-journal-fsync', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Feedback journal fsync error: {e}")
+
+    def close(self):
+        """Stop the fsync thread, sync and close the current segment."""
+        self._stop.set()
+        with self._lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
+
+    # ---------------- Reading -----------------------------------------
+    def iter_entries(self, user_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream entries oldest first, one line at a time.
+        A torn final line (a crash mid-append) or an unparseable line is skipped.
+        """
+        for path in self.segments():
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        self.stats_counters['skipped_lines'] += 1
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        self.stats_counters['skipped_lines'] += 1
+                        continue
+                    if user_id is None or entry.get('user_id') == user_id:
+                        yield entry
+
+    def import_legacy(self, legacy_file: str) -> int:
+        """
+        Move entries from the old feedback_log.json array into the journal once.
+        The legacy file is renamed to *.imported afterwards. Returns entries imported.
+        """
+        if not os.path.exists(legacy_file):
+            return 0
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Warning: could not read {legacy_file}: {e}")
+            return 0
+        if not isinstance(entries, list):
+            entries = []
+        for entry in entries:
+            self.append(entry)
+        self.sync()
+        os.replace(legacy_file, f"{legacy_file}.imported")
+        print(f"Imported {len(entries)} feedback entries from {legacy_file}")
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Journal counters for monitoring."""
+        with self._lock:
+            return dict(self.stats_counters,
+                        segment=os.path.basename(self._segment_path(self._index)) if self._file else None,
+                        segment_bytes=self._size if self._file else 0,
+                        unsynced=self._dirty)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Stream or maintain the RL feedback journal.")
+    p.add_argument("--dir", default=DEFAULT_JOURNAL_DIR, help="Journal directory")
+    p.add_argument("--user", help="Only entries for this user_id")
+    p.add_argument("--stats", action="store_true", help="Print segment and entry counts instead of entries")
+    p.add_argument("--import-legacy", metavar="FILE", help="Import a feedback_log.json array into the journal")
+    args = p.parse_args()
+
+    journal = FeedbackJournal(args.dir)
+    if args.import_legacy:
+        journal.import_legacy(args.import_legacy)
+        journal.close()
+        return
+
+    if args.stats:
+        segments = journal.segments()
+        n_entries = sum(1 for _ in journal.iter_entries(args.user))
+        n_bytes = sum(os.path.getsize(path) for path in segments)
+        print(json.dumps({'segments': len(segments), 'entries': n_entries, 'bytes': n_bytes,
+                          'skipped_lines': journal.stats_counters['skipped_lines']}, indent=2))
+        return
+
+    for entry in journal.iter_entries(args.user):
+        sys.stdout.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ Author: Sardar Rahman
 
 import numpy as np
 import random
+import threading
+from functools import lru_cache
 
 # --- Define the environment ---
 
@@ -57,32 +59,148 @@ def reward(remaining, item_calories):
         return -0.05 * new_remaining  # small penalty for under target
 
 
-def transition(remaining, item_calories):
+def transition(remaining, item_calories, target=DAILY_CALORIE_TARGET):
     """Compute next state and reward."""
     new_state = max(0, remaining - item_calories)
     # Snap to nearest 100 to stay in discrete state space
     new_state = int(round(new_state / 100) * 100)
-    new_state = min(max(new_state, 0), DAILY_CALORIE_TARGET)
+    new_state = min(max(new_state, 0), target)
     r = reward(remaining, item_calories)
     return new_state, r
 
 
-def value_iteration():
-    """Compute optimal policy using value iteration."""
-    V = {s: 0 for s in STATES}
-    policy = {}
+# --- Solvers ---
 
-    for _ in range(100):
-        for s in STATES:
-            action_values = {}
-            for a, cal in MENU.items():
-                s_next, r = transition(s, cal)
-                action_values[a] = r + GAMMA * V[s_next]
-            best_action = max(action_values, key=action_values.get)
-            V[s] = action_values[best_action]
-            policy[s] = best_action
+# Stop when no state value changes by more than this between sweeps
+VALUE_TOLERANCE = 1e-9
+MAX_ITERATIONS = 10000
 
-    return V, policy
+# Policy evaluation solves the linear system directly up to this many states,
+# and falls back to iterative evaluation above it
+DIRECT_SOLVE_MAX_STATES = 2000
+
+
+def build_mdp(menu=None, target=DAILY_CALORIE_TARGET):
+    """
+    Tabulate the MDP once as arrays.
+    Returns (states, actions, next_index, rewards) where next_index[s, a] is the
+    index of the state reached from states[s] by eating actions[a], and
+    rewards[s, a] the reward of that step.
+    """
+    menu = MENU if menu is None else menu
+    states = list(range(0, target + 100, 100))
+    actions = list(menu.keys())
+    next_index = np.empty((len(states), len(actions)), dtype=np.int64)
+    rewards = np.empty((len(states), len(actions)), dtype=np.float64)
+    for i, s in enumerate(states):
+        for j, a in enumerate(actions):
+            s_next, r = transition(s, menu[a], target)
+            next_index[i, j] = s_next // 100
+            rewards[i, j] = r
+    return states, actions, next_index, rewards
+
+
+def solve_value_iteration(next_index, rewards, gamma=GAMMA, tol=VALUE_TOLERANCE, max_iter=MAX_ITERATIONS):
+    """
+    Bellman backups over every (state, action) at once until the values stop
+    changing. Returns (V, policy, iterations); ties go to the first action.
+    """
+    V = np.zeros(rewards.shape[0])
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        V_new = (rewards + gamma * V[next_index]).max(axis=1)
+        delta = np.abs(V_new - V).max()
+        V = V_new
+        if delta < tol:
+            break
+    policy = (rewards + gamma * V[next_index]).argmax(axis=1)
+    return V, policy, iterations
+
+
+def evaluate_policy(next_index, rewards, policy, gamma=GAMMA, tol=VALUE_TOLERANCE, max_iter=MAX_ITERATIONS):
+    """Values of a fixed deterministic policy: V = R_pi + gamma * V[next_pi]."""
+    n_states = rewards.shape[0]
+    rows = np.arange(n_states)
+    next_pi = next_index[rows, policy]
+    r_pi = rewards[rows, policy]
+    if n_states <= DIRECT_SOLVE_MAX_STATES:
+        A = np.eye(n_states)
+        np.subtract.at(A, (rows, next_pi), gamma)
+        return np.linalg.solve(A, r_pi)
+    V = np.zeros(n_states)
+    for _ in range(max_iter):
+        V_new = r_pi + gamma * V[next_pi]
+        if np.abs(V_new - V).max() < tol:
+            return V_new
+        V = V_new
+    return V
+
+
+def solve_policy_iteration(next_index, rewards, gamma=GAMMA, max_iter=MAX_ITERATIONS):
+    """
+    Alternate exact policy evaluation and greedy improvement until the policy
+    is stable. Returns (V, policy, iterations); ties go to the first action.
+    """
+    rows = np.arange(rewards.shape[0])
+    policy = np.zeros(rewards.shape[0], dtype=np.int64)
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        V = evaluate_policy(next_index, rewards, policy, gamma)
+        Q = rewards + gamma * V[next_index]
+        improved = Q.argmax(axis=1)
+        # Only switch where the new action is strictly better, so ties cannot cycle
+        better = Q[rows, improved] > Q[rows, policy] + 1e-12
+        if not better.any():
+            break
+        policy = np.where(better, improved, policy)
+    V = evaluate_policy(next_index, rewards, policy, gamma)
+    return V, (rewards + gamma * V[next_index]).argmax(axis=1), iterations
+
+
+SOLVERS = {
+    'value': solve_value_iteration,
+    'policy': solve_policy_iteration
+}
+
+
+def value_iteration(menu=None, target=DAILY_CALORIE_TARGET, gamma=GAMMA, method='value'):
+    """
+    Compute optimal policy using value iteration (or policy iteration with
+    method='policy'). Returns ({state: value}, {state: menu item}).
+    """
+    states, actions, next_index, rewards = build_mdp(menu, target)
+    V, policy, _ = SOLVERS[method](next_index, rewards, gamma)
+    return ({s: float(v) for s, v in zip(states, V)},
+            {s: actions[a] for s, a in zip(states, policy)})
+
+
+# --- Cached policy ---
+
+_policy_lock = threading.Lock()
+
+
+@lru_cache(maxsize=32)
+def _solved_policy(menu_items, target, gamma, method):
+    return value_iteration(dict(menu_items), target, gamma, method)
+
+
+def get_policy(menu=None, target=DAILY_CALORIE_TARGET, gamma=GAMMA, method='value'):
+    """
+    Return (V, policy) for the given MDP parameters, solving it only the first
+    time those parameters are seen. A changed menu or target is a new cache key.
+    The returned dicts are shared between callers: treat them as read-only.
+    """
+    menu = MENU if menu is None else menu
+    # Keep menu order: value_iteration breaks ties by it
+    key = tuple(menu.items())
+    with _policy_lock:
+        return _solved_policy(key, target, gamma, method)
+
+
+def clear_policy_cache():
+    """Forget every cached policy."""
+    with _policy_lock:
+        _solved_policy.cache_clear()
 
 
 # --- Simulation over multiple meals ---
@@ -105,6 +223,75 @@ def simulate_day(policy):
     return total_reward, day_log
 
 
+# --- Batched Monte Carlo simulation ---
+
+# A day "hits" the target when total calories eaten land within this of it
+HIT_TOLERANCE = 100
+
+REWARD_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def simulate_days(policies, n_days=10000, portion_sd=0.0, menu=None, target=DAILY_CALORIE_TARGET, seed=None):
+    """
+    Roll out n_days days per policy in parallel with NumPy.
+
+    policies: {name: policy dict} as returned by value_iteration; states the
+      policy does not cover get a random item, as in simulate_day. An empty
+      dict is the uniformly random policy.
+    portion_sd: standard deviation of the served portion as a fraction of
+      the listed calories (0 = exact portions, which reproduces simulate_day).
+
+    Returns {name: stats} with the mean, std and percentiles of the daily
+    total reward, the mean calories eaten and the fraction of days within
+    HIT_TOLERANCE of the target.
+    """
+    menu = MENU if menu is None else menu
+    rng = np.random.default_rng(seed)
+    items = list(menu.keys())
+    item_calories = np.array([menu[a] for a in items], dtype=np.float64)
+    n_buckets = target // 100 + 1
+
+    results = {}
+    for name, policy in policies.items():
+        # Policy as a lookup table from state bucket to item index (-1 = random)
+        lookup = np.full(n_buckets, -1, dtype=np.int64)
+        for state, action in policy.items():
+            if 0 <= state <= target and state % 100 == 0:
+                lookup[state // 100] = items.index(action)
+
+        remaining = np.full(n_days, float(target))
+        total_reward = np.zeros(n_days)
+        eaten = np.zeros(n_days)
+        for _ in MEALS:
+            bucket = np.clip(np.round(remaining / 100), 0, n_buckets - 1).astype(np.int64)
+            action = lookup[bucket]
+            unset = action < 0
+            if unset.any():
+                action[unset] = rng.integers(len(items), size=int(unset.sum()))
+            calories = item_calories[action]
+            if portion_sd > 0:
+                calories = calories * np.maximum(rng.normal(1.0, portion_sd, n_days), 0.0)
+
+            # Vectorized reward() and transition()
+            new_remaining = remaining - calories
+            total_reward += np.where(new_remaining < 0, -np.abs(new_remaining) * 0.1,
+                                     np.where(new_remaining <= 100, 10.0, -0.05 * new_remaining))
+            remaining = np.clip(np.round(np.maximum(new_remaining, 0) / 100) * 100, 0, target)
+            eaten += calories
+
+        percentiles = np.percentile(total_reward, REWARD_PERCENTILES)
+        stats = {
+            'n_days': n_days,
+            'mean_reward': float(total_reward.mean()),
+            'std_reward': float(total_reward.std()),
+            'mean_calories': float(eaten.mean()),
+            'hit_rate': float((np.abs(eaten - target) <= HIT_TOLERANCE).mean())
+        }
+        stats.update({f'p{q}': float(v) for q, v in zip(REWARD_PERCENTILES, percentiles)})
+        results[name] = stats
+    return results
+
+
 if __name__ == "__main__":
     print("Running value iteration...")
     V, policy = value_iteration()
@@ -118,4 +305,9 @@ if __name__ == "__main__":
         total_reward, log = simulate_day(policy)
         print(f"\nDay {day}: Total reward = {total_reward:.2f}")
         for meal, action, cal, rem, r in log:
-            print(f"  {meal.title()}: {action} ({cal} cal) | Remaining: {rem} | Reward: {r:.2f}")
\ No newline at end of file
+            print(f"  {meal.title()}: {action} ({cal} cal) | Remaining: {rem} | Reward: {r:.2f}")
+
+    print("\n--- Monte Carlo: 10000 days, 15% portion noise ---")
+    for name, stats in simulate_days({"optimal": policy, "random": {}}, portion_sd=0.15, seed=0).items():
+        print(f"{name:>8}: mean {stats['mean_reward']:.2f}, p5 {stats['p5']:.2f}, "
+              f"p95 {stats['p95']:.2f}, hit rate {stats['hit_rate']:.1%}")
\ No newline at end of file
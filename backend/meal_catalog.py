@@ -0,0 +1,265 @@
+"""
+Meal Catalog
+------------
+Pre-normalized view of the menu for the RL recommender.
+
+Converting menu items into meal dicts (raw_attrs stripping, float parsing)
+used to happen for every item on every /api/rl/recommend call. A MealCatalog
+does it once per menu snapshot: it keeps the meal dicts, typed nutrition
+columns, lowercased text fields and stable ids, indexed by hall and meal
+period, so a request only slices precomputed rows.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Meal periods in the order get_available_meals_from_menu appends them
+MEAL_PERIODS = ['breakfast', 'lunch', 'dinner', 'midnight']
+
+
+def menu_item_to_meal_dict(food_item, dining_hall: str) -> dict:
+    """Convert menu item to meal dictionary for RL system."""
+    # Extract nutrition info
+    calories = food_item.get('calories', 0)
+    protein = food_item.get('protein', 0)
+    carbs = food_item.get('carbs', 0)
+    fat = food_item.get('fat', 0)
+
+    # Try to get from raw_attrs if available
+    if 'raw_attrs' in food_item:
+        raw_attrs = food_item['raw_attrs']
+        calories = float(raw_attrs.get('data-calories', calories))
+        protein = float(raw_attrs.get('data-protein', protein).replace('g', '').strip() or 0)
+        carbs = float(raw_attrs.get('data-total-carb', carbs).replace('g', '').strip() or 0)
+        fat = float(raw_attrs.get('data-total-fat', fat).replace('g', '').strip() or 0)
+
+    return {
+        'id': food_item.get('name', '').lower().replace(' ', '_'),
+        'name': food_item.get('name', ''),
+        'calories': calories,
+        'protein': protein,
+        'carbs': carbs,
+        'fat': fat,
+        'location': dining_hall,
+        'category': food_item.get('category', ''),
+        'station': food_item.get('category', ''),
+        'allergens': food_item.get('allergens', ''),
+        'clean_diet': food_item.get('clean_diet', ''),
+        'ingredients': food_item.get('ingredients', ''),
+        'cuisine_type': food_item.get('cuisine_type', ''),
+        'meal_period': food_item.get('mealPeriod', '')
+    }
+
+
+def current_meal_period(time_of_day: Optional[str] = None) -> str:
+    """Return time_of_day if given, otherwise the meal period for the current hour."""
+    if time_of_day:
+        return time_of_day
+    current_hour = datetime.now().hour
+    if current_hour < 11:
+        return 'breakfast'
+    elif current_hour < 15:
+        return 'lunch'
+    elif current_hour < 21:
+        return 'dinner'
+    else:
+        return 'midnight'
+
+
+def get_available_meals_from_menu(menu_data: dict, dining_location: str = None, time_of_day: str = None) -> list:
+    """Extract available meals from menu data."""
+    meals = []
+
+    if not menu_data or 'menu' not in menu_data:
+        return meals
+
+    menu = menu_data['menu']
+    dining_hall = menu_data.get('dining_hall', dining_location or '')
+
+    # Determine meal period
+    meal_period = current_meal_period(time_of_day)
+
+    # Extract meals from menu structure
+    if meal_period in menu:
+        period_data = menu[meal_period]
+        for category, items in period_data.items():
+            if isinstance(items, list):
+                for item in items:
+                    if isinstance(item, dict) and item.get('name'):
+                        meal_dict = menu_item_to_meal_dict(item, dining_hall)
+                        meal_dict['meal_period'] = meal_period
+                        meals.append(meal_dict)
+            elif isinstance(items, dict):
+                # Handle nested structure
+                if 'items' in items:
+                    for item in items['items']:
+                        if isinstance(item, dict) and item.get('name'):
+                            meal_dict = menu_item_to_meal_dict(item, dining_hall)
+                            meal_dict['meal_period'] = meal_period
+                            meals.append(meal_dict)
+
+    # Also check other meal periods if needed
+    for period in MEAL_PERIODS:
+        if period != meal_period and period in menu:
+            period_data = menu[period]
+            for category, items in period_data.items():
+                if isinstance(items, list):
+                    for item in items:
+                        if isinstance(item, dict) and item.get('name'):
+                            meal_dict = menu_item_to_meal_dict(item, dining_hall)
+                            meal_dict['meal_period'] = period
+                            meals.append(meal_dict)
+
+    return meals
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _lower(value) -> str:
+    return value.lower() if isinstance(value, str) else ''
+
+
+class CatalogView(list):
+    """
+    List of meal dicts sliced from a MealCatalog.
+    Behaves like the plain list get_available_meals_from_menu returns, and also
+    carries the catalog and row indices so callers can use the precomputed columns.
+    The meal dicts are shared with the catalog: copy before modifying them.
+    """
+
+    def __init__(self, catalog: 'MealCatalog', rows: np.ndarray):
+        super().__init__(catalog.meals[i] for i in rows)
+        self.catalog = catalog
+        self.rows = rows
+
+    def subset(self, positions) -> 'CatalogView':
+        """View of the meals at the given positions (or boolean mask) of this view."""
+        return CatalogView(self.catalog, self.rows[positions])
+
+
+class MealCatalog:
+    """
+    All meals in a menu snapshot, converted once.
+
+    Columns (aligned with `meals`):
+      calories, protein, carbs, fat          float64 arrays
+      name_lc, category_lc, location_lc,
+      cuisine_lc, allergens_lc, clean_diet_lc lists of lowercased strings
+      ids                                    stable catalog ids (also meal['catalog_id'])
+    """
+
+    def __init__(self, menu_data: Dict[str, Any]):
+        self.halls = []
+        self.meals = []
+        self._memo = {}
+        # (hall, period) -> (rows from every category, rows from list categories only)
+        self._period_rows = {}
+        # hall -> periods a view can start with (MEAL_PERIODS plus any other period on its menu)
+        self._hall_periods = {}
+        self._views = {}
+
+        for hall_name, hall_data in menu_data.items():
+            self.halls.append(hall_name)
+            self._hall_periods[hall_name] = set(MEAL_PERIODS)
+            if not isinstance(hall_data, dict):
+                continue
+            self._add_hall(hall_name, hall_data)
+
+        meals = self.meals
+        self.ids = [m['catalog_id'] for m in meals]
+        self.calories = np.array([_as_float(m['calories']) for m in meals], dtype=np.float64)
+        self.protein = np.array([_as_float(m['protein']) for m in meals], dtype=np.float64)
+        self.carbs = np.array([_as_float(m['carbs']) for m in meals], dtype=np.float64)
+        self.fat = np.array([_as_float(m['fat']) for m in meals], dtype=np.float64)
+        self.name_lc = [_lower(m['name']) for m in meals]
+        self.category_lc = [_lower(m['category']) for m in meals]
+        self.location_lc = [_lower(m['location']) for m in meals]
+        self.cuisine_lc = [_lower(m['cuisine_type']) for m in meals]
+        self.allergens_lc = [_lower(m['allergens']) for m in meals]
+        self.clean_diet_lc = [_lower(m['clean_diet']) for m in meals]
+
+    def __len__(self):
+        return len(self.meals)
+
+    def memo(self, key: Any, build):
+        """Compute a derived per-catalog value (e.g. model feature columns) once."""
+        value = self._memo.get(key)
+        if value is None:
+            value = self._memo.setdefault(key, build(self))
+        return value
+
+    def _add_hall(self, hall_name: str, hall_data: Dict[str, Any]):
+        menu = hall_data.get('menu')
+        if not isinstance(menu, dict):
+            return
+        dining_hall = hall_data.get('dining_hall', hall_name or '')
+        for period, period_data in menu.items():
+            if not isinstance(period_data, dict):
+                continue
+            all_rows, list_rows = [], []
+            for category, items in period_data.items():
+                from_list = isinstance(items, list)
+                if not from_list:
+                    # Nested {"items": [...]} categories only count for the requested period
+                    items = items.get('items', []) if isinstance(items, dict) else []
+                for position, item in enumerate(items):
+                    if not (isinstance(item, dict) and item.get('name')):
+                        continue
+                    meal = menu_item_to_meal_dict(item, dining_hall)
+                    meal['meal_period'] = period
+                    meal['catalog_id'] = self._stable_id(hall_name, period, category, position, meal['name'])
+                    row = len(self.meals)
+                    self.meals.append(meal)
+                    all_rows.append(row)
+                    if from_list:
+                        list_rows.append(row)
+            self._period_rows[(hall_name, period)] = (all_rows, list_rows)
+            self._hall_periods[hall_name].add(period)
+
+    @staticmethod
+    def _stable_id(hall: str, period: str, category: str, position: int, name: str) -> str:
+        key = f"{hall}|{period}|{category}|{position}|{name}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+    def rows_for(self, hall: str, time_of_day: Optional[str] = None) -> np.ndarray:
+        """
+        Row indices for one hall, in the same order get_available_meals_from_menu
+        returns meals: the requested period first, then the other periods.
+        """
+        if hall not in self._hall_periods:
+            return np.zeros(0, dtype=np.int64)
+        meal_period = current_meal_period(time_of_day)
+        if meal_period not in self._hall_periods[hall]:
+            # Any period the hall does not serve selects the same rows: key them
+            # together so request-supplied strings cannot grow the cache
+            meal_period = None
+        key = (hall, meal_period)
+        rows = self._views.get(key)
+        if rows is None:
+            selected = list(self._period_rows.get((hall, meal_period), ([], []))[0])
+            for period in MEAL_PERIODS:
+                if period != meal_period:
+                    selected.extend(self._period_rows.get((hall, period), ([], []))[1])
+            rows = np.array(selected, dtype=np.int64)
+            self._views[key] = rows
+        return rows
+
+    def view(self, hall: Optional[str] = None, time_of_day: Optional[str] = None) -> CatalogView:
+        """Meals for one hall, or every hall in menu order when hall is None."""
+        if hall is not None:
+            return CatalogView(self, self.rows_for(hall, time_of_day))
+        rows = [self.rows_for(hall_name, time_of_day) for hall_name in self.halls]
+        return CatalogView(self, np.concatenate(rows) if rows else np.array([], dtype=np.int64))
+
+
+def get_meal_catalog(snapshot) -> MealCatalog:
+    """Return the catalog for a menu snapshot, building it on first use."""
+    return snapshot.memo(('meal_catalog',), lambda: MealCatalog(snapshot.data))
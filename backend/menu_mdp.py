@@ -0,0 +1,246 @@
+"""
+menu_mdp.py
+-----------
+Finite-horizon MDP over a dining hall's real menu.
+
+learning.py plans over a fixed 10-item MENU and remaining calories only.
+Here the actions at each meal are the items the hall actually serves in
+that meal period (plus skipping the meal), and the state is the remaining
+calories, protein, carbs and fat, each in buckets, together with the meal
+index. The plan is solved by backward induction from the end of the day.
+
+Transitions are deterministic and separable per nutrient, so they are never
+stored as a dense state x state matrix: each pair of nutrients keeps a small
+(actions x pair levels) table of next-state offsets, and an action's next
+states are the outer sum of its two rows. Items whose bucketed nutrition is
+identical share one action.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from learning import DAILY_CALORIE_TARGET
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat')
+
+# Daily targets and bucket sizes per nutrient. Solve time grows with
+# states x distinct bucketed items, so the macros are coarser than calories
+# (a 3-meal day with 3000 items per meal solves in well under a second)
+DEFAULT_TARGETS = {'calories': DAILY_CALORIE_TARGET, 'protein': 100, 'carbs': 200, 'fat': 70}
+BUCKETS = {'calories': 100, 'protein': 15, 'carbs': 30, 'fat': 15}
+
+# End-of-day penalty weight per nutrient, on the distance from target as a fraction of it
+WEIGHTS = {'calories': 10.0, 'protein': 5.0, 'carbs': 2.5, 'fat': 2.5}
+
+# Overshoot is tracked up to this fraction of the target and penalized this much harder
+OVERSHOOT_FRACTION = 0.25
+OVERSHOOT_WEIGHT = 2.0
+
+# Bonus for finishing within one bucket of the calorie target (as in learning.reward)
+IDEAL_BONUS = 10.0
+
+# Reward for skipping a meal, so an item is preferred when it is just as good
+SKIP_REWARD = -0.5
+
+# Meal periods in the order they happen during the day
+DAY_ORDER = ['breakfast', 'brunch', 'lunch', 'dinner', 'late night', 'midnight']
+
+RAW_KEYS = {'calories': 'data-calories', 'protein': 'data-protein',
+            'carbs': 'data-total-carb', 'fat': 'data-total-fat'}
+
+SKIP_ITEM = {'name': 'skip', 'category': '', 'calories': 0.0, 'protein': 0.0, 'carbs': 0.0, 'fat': 0.0}
+
+
+def _nutrient(item: Dict[str, Any], name: str) -> float:
+    raw = (item.get('raw_attrs') or {}).get(RAW_KEYS[name])
+    value = raw if raw not in (None, '') else item.get(name, 0)
+    try:
+        return float(str(value).replace('g', '').strip() or 0)
+    except ValueError:
+        return 0.0
+
+
+def _iter_items(value: Any) -> Iterator[Dict[str, Any]]:
+    # Categories are lists of items, {"items": [...]}, or {title: [items]}
+    if isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict) and item.get('name'):
+                yield item
+    elif isinstance(value, dict):
+        if 'items' in value:
+            yield from _iter_items(value['items'])
+        else:
+            for nested in value.values():
+                yield from _iter_items(nested)
+
+
+def items_by_period(hall_data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    {meal period: [item]} for one hall's menu entry, periods in day order.
+    Items are reduced to name, category and the four nutrients; repeated
+    names within a period are kept once.
+    """
+    menu = hall_data.get('menu') if isinstance(hall_data, dict) else None
+    if not isinstance(menu, dict):
+        return {}
+
+    periods = [p for p in DAY_ORDER if p in menu] + [p for p in menu if p not in DAY_ORDER]
+    result = {}
+    for period in periods:
+        seen = set()
+        items = []
+        period_data = menu[period]
+        if not isinstance(period_data, dict):
+            continue
+        for category, category_data in period_data.items():
+            for item in _iter_items(category_data):
+                if item['name'] in seen:
+                    continue
+                seen.add(item['name'])
+                entry = {'name': item['name'], 'category': item.get('category', category)}
+                for name in NUTRIENTS:
+                    entry[name] = _nutrient(item, name)
+                items.append(entry)
+        if items:
+            result[period] = items
+    return result
+
+
+class MenuMDP:
+    """
+    Meals are stages; actions at a stage are skip + that period's items.
+    State: remaining (calories, protein, carbs, fat) levels at the start of a meal.
+    """
+
+    def __init__(self, menu_items: Dict[str, List[Dict[str, Any]]], targets: Optional[Dict[str, float]] = None):
+        self.targets = dict(DEFAULT_TARGETS, **(targets or {}))
+        self.periods = list(menu_items.keys())
+        self.actions = [[SKIP_ITEM] + list(menu_items[p]) for p in self.periods]
+
+        # Level i of nutrient d means (i - overshoot_levels[d]) * bucket remaining
+        self.overshoot_levels = {d: int(np.ceil(OVERSHOOT_FRACTION * self.targets[d] / BUCKETS[d])) for d in NUTRIENTS}
+        self.shape = tuple(self.overshoot_levels[d] + int(round(self.targets[d] / BUCKETS[d])) + 1 for d in NUTRIENTS)
+        self.n_states = int(np.prod(self.shape))
+
+        self.values = []   # per stage: (n_states,) expected value from that meal on
+        self.policy = []   # per stage: (n_states,) index into self.actions[stage]
+        self.solved = False
+
+    def _level_values(self, d: str) -> np.ndarray:
+        n = self.shape[NUTRIENTS.index(d)]
+        return (np.arange(n) - self.overshoot_levels[d]) * BUCKETS[d]
+
+    def terminal_values(self) -> np.ndarray:
+        """End-of-day reward for every state."""
+        total = np.zeros(self.shape)
+        for axis, d in enumerate(NUTRIENTS):
+            fraction = self._level_values(d) / self.targets[d]
+            penalty = WEIGHTS[d] * np.where(fraction < 0, -OVERSHOOT_WEIGHT * fraction, fraction)
+            view = [1] * len(NUTRIENTS)
+            view[axis] = -1
+            total -= penalty.reshape(view)
+        calories = self._level_values('calories').reshape(-1, 1, 1, 1)
+        total = total + np.where((calories >= 0) & (calories <= BUCKETS['calories']), IDEAL_BONUS, 0.0)
+        return total.ravel()
+
+    def _action_shifts(self, stage: int):
+        """
+        Bucketed nutrition per action, deduplicated.
+        Returns (unique shift rows, representative action index per row,
+        step reward per row); the representative is the first action
+        with that shift, so ties go to the earlier item.
+        """
+        items = self.actions[stage]
+        shifts = np.array([[int(round(item[d] / BUCKETS[d])) for d in NUTRIENTS] for item in items], dtype=np.int64)
+        _, first = np.unique(shifts, axis=0, return_index=True)
+        first = np.sort(first)
+        step = np.where(first == 0, SKIP_REWARD, 0.0)
+        return shifts[first], first, step
+
+    def solve(self) -> 'MenuMDP':
+        """Backward induction over the meals of the day."""
+        n_cal, n_pro, n_carb, n_fat = self.shape
+        # States are (calories, protein) x (carbs, fat): flat index = pair_a * n_b + pair_b
+        n_a, n_b = n_cal * n_pro, n_carb * n_fat
+        grid_a = np.unravel_index(np.arange(n_a), (n_cal, n_pro))
+        grid_b = np.unravel_index(np.arange(n_b), (n_carb, n_fat))
+
+        V_next = self.terminal_values()
+        values, policy = [], []
+        for stage in reversed(range(len(self.periods))):
+            shifts, representative, step = self._action_shifts(stage)
+            # Next-state offset of each pair of nutrients, one contiguous row per action
+            table_a = n_b * (n_pro * np.clip(grid_a[0][None, :] - shifts[:, 0, None], 0, n_cal - 1)
+                             + np.clip(grid_a[1][None, :] - shifts[:, 1, None], 0, n_pro - 1))
+            table_b = (n_fat * np.clip(grid_b[0][None, :] - shifts[:, 2, None], 0, n_carb - 1)
+                       + np.clip(grid_b[1][None, :] - shifts[:, 3, None], 0, n_fat - 1))
+
+            best = np.full((n_a, n_b), -np.inf)
+            best_action = np.zeros((n_a, n_b), dtype=np.int64)
+            for action in range(len(shifts)):
+                q = V_next[table_a[action][:, None] + table_b[action][None, :]]
+                q += step[action]
+                # Strictly better only, so ties keep the earlier item
+                better = q > best
+                np.copyto(best, q, where=better)
+                best_action[better] = representative[action]
+            values.append(best.ravel())
+            policy.append(best_action.ravel())
+            V_next = values[-1]
+
+        self.values = values[::-1]
+        self.policy = policy[::-1]
+        self.solved = True
+        return self
+
+    # ---------------- Queries -----------------------------------------
+    def state_index(self, remaining: Dict[str, float]) -> int:
+        """Flat state for remaining amounts (missing nutrients default to the full target)."""
+        index = []
+        for axis, d in enumerate(NUTRIENTS):
+            amount = remaining.get(d)
+            amount = self.targets[d] if amount is None else amount
+            if not np.isfinite(amount):
+                raise ValueError(f"remaining {d} must be finite, got {amount!r}")
+            level = int(round(amount / BUCKETS[d])) + self.overshoot_levels[d]
+            index.append(min(max(level, 0), self.shape[axis] - 1))
+        return int(np.ravel_multi_index(index, self.shape))
+
+    def stage_for(self, meal: Optional[str]) -> int:
+        if meal:
+            meal = meal.lower()
+            if meal in self.periods:
+                return self.periods.index(meal)
+            if meal in DAY_ORDER:
+                # First served period at or after the requested one
+                position = DAY_ORDER.index(meal)
+                for stage, period in enumerate(self.periods):
+                    if period in DAY_ORDER and DAY_ORDER.index(period) >= position:
+                        return stage
+        return 0
+
+    def recommend(self, remaining: Dict[str, float], meal: Optional[str] = None) -> Dict[str, Any]:
+        """Best item for this meal, plus the planned items for the rest of the day."""
+        if not self.solved:
+            self.solve()
+        stage = self.stage_for(meal)
+        state = self.state_index(remaining)
+        expected = float(self.values[stage][state])
+
+        amounts = {d: (self.targets[d] if remaining.get(d) is None else float(remaining[d])) for d in NUTRIENTS}
+        plan = []
+        for t in range(stage, len(self.periods)):
+            item = self.actions[t][int(self.policy[t][state])]
+            plan.append(dict(item, meal=self.periods[t]))
+            for d in NUTRIENTS:
+                amounts[d] -= item[d]
+            state = self.state_index(amounts)
+        return {'plan': plan, 'expected_value': expected, 'remaining_after_plan': amounts}
+
+
+def get_menu_mdp(snapshot, hall: str, targets: Optional[Dict[str, float]] = None) -> MenuMDP:
+    """Solved MDP for a hall, built once per menu snapshot and set of targets."""
+    targets = dict(DEFAULT_TARGETS, **(targets or {}))
+    key = ('menu_mdp', hall, tuple(targets[d] for d in NUTRIENTS))
+    return snapshot.memo(key, lambda: MenuMDP(items_by_period(snapshot.filtered_hall(hall)), targets).solve())
@@ -0,0 +1,215 @@
+"""
+Menu Refresh Scheduler
+----------------------
+Keeps the menu snapshot current without scraping inside the request path.
+
+- Refreshes run on a small background thread pool.
+- Concurrent refreshes of the same (hall, date) collapse into one in-flight job.
+- Tomorrow's menus are pre-fetched in the evening and promoted at the date rollover.
+- While a refresh runs (or after it fails) requests keep getting the last good snapshot.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from menu_store import MenuSnapshotStore
+from scraping import DEFAULT_HALLS, mmddyyyy_from_date, scrape_multiple_tids
+
+# Hour of day (local time) after which tomorrow's menus are pre-fetched
+PREFETCH_HOUR = 20
+
+# Seconds between scheduler passes
+POLL_INTERVAL = 300
+
+# Seconds to wait before retrying a (hall, date) whose refresh failed
+RETRY_AFTER = 120
+
+
+class MenuRefresher:
+    """
+    Single-flight, background menu refresher for one MenuSnapshotStore.
+    """
+
+    def __init__(self, store: MenuSnapshotStore, halls: Dict[str, int] = None,
+                 scrape: Callable[..., Dict[str, Any]] = scrape_multiple_tids,
+                 max_workers: int = 2, prefetch_hour: int = PREFETCH_HOUR,
+                 poll_interval: float = POLL_INTERVAL, retry_after: float = RETRY_AFTER):
+        self.store = store
+        self.halls = halls if halls is not None else DEFAULT_HALLS
+        self.scrape = scrape
+        self.prefetch_hour = prefetch_hour
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='menu-refresh')
+        self._lock = threading.Lock()
+        self._inflight = {}      # (hall, date) -> Future
+        self._prefetched = {}    # (hall, date) -> scraped hall entry, not yet installed
+        self._failed_at = {}     # (hall, date) -> time.monotonic() of the last failure
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.stats_counters = {
+            'refreshes_started': 0,
+            'refreshes_collapsed': 0,
+            'refresh_failures': 0,
+            'prefetch_promotions': 0
+        }
+
+    # ---------------- Request-path API --------------------------------
+    def refresh(self, hall: str, date_mmddyyyy: str) -> Future:
+        """
+        Start (or join) the refresh job for a hall and date.
+        Returns a Future resolving to True if fresh data is available.
+        """
+        key = (hall, date_mmddyyyy)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats_counters['refreshes_collapsed'] += 1
+                return future
+
+            failed_at = self._failed_at.get(key)
+            if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+                # Back off instead of hammering a failing endpoint on every request
+                future = Future()
+                future.set_result(False)
+                return future
+
+            self.stats_counters['refreshes_started'] += 1
+            future = self._executor.submit(self._run_job, hall, date_mmddyyyy)
+            self._inflight[key] = future
+            return future
+
+    def ensure_fresh(self, hall: str, wait: Optional[float] = None) -> bool:
+        """
+        Return True if the hall's menu in the snapshot is for today.
+        Otherwise start a background refresh and, if `wait` is given,
+        block up to that many seconds for it to finish.
+        """
+        today = mmddyyyy_from_date(datetime.now())
+        if self.store.get().hall_date(hall) == today:
+            return True
+
+        future = self.refresh(hall, today)
+        if wait is None:
+            return False
+        try:
+            return bool(future.result(timeout=wait))
+        except Exception:
+            return False
+
+    # ---------------- Jobs ------------------------------------------
+    def _run_job(self, hall: str, date_mmddyyyy: str) -> bool:
+        try:
+            return self._refresh_hall(hall, date_mmddyyyy)
+        finally:
+            with self._lock:
+                self._inflight.pop((hall, date_mmddyyyy), None)
+
+    def _refresh_hall(self, hall: str, date_mmddyyyy: str) -> bool:
+        key = (hall, date_mmddyyyy)
+        today = mmddyyyy_from_date(datetime.now())
+
+        # A job that just finished may already have installed this date
+        if date_mmddyyyy == today and self.store.get().hall_date(hall) == today:
+            return True
+
+        with self._lock:
+            entry = self._prefetched.pop(key, None) if date_mmddyyyy == today else None
+        if entry is not None:
+            self.store.update({hall: entry})
+            self.stats_counters['prefetch_promotions'] += 1
+            print(f"Promoted pre-fetched menu for {hall} ({date_mmddyyyy})")
+            return True
+
+        try:
+            scraped = self.scrape({hall: self.halls[hall]}, date_mmddyyyy, verbose=False)
+            entry = scraped.get(hall)
+            if not isinstance(entry, dict) or 'error' in entry:
+                raise RuntimeError(entry.get('error') if isinstance(entry, dict) else 'no data returned')
+        except Exception as e:
+            with self._lock:
+                self._failed_at[key] = time.monotonic()
+            self.stats_counters['refresh_failures'] += 1
+            print(f"Error scraping menu for {hall} ({date_mmddyyyy}): {e}")
+            return False
+
+        with self._lock:
+            self._failed_at.pop(key, None)
+
+        if date_mmddyyyy == mmddyyyy_from_date(datetime.now()):
+            self.store.update({hall: entry})
+            print(f"Successfully updated menu for {hall}")
+        else:
+            with self._lock:
+                self._prefetched[key] = entry
+            print(f"Pre-fetched menu for {hall} ({date_mmddyyyy})")
+        return True
+
+    # ---------------- Scheduler --------------------------------------
+    def run_once(self, now: Optional[datetime] = None):
+        """One scheduler pass: refresh stale halls and pre-fetch tomorrow in the evening."""
+        now = now or datetime.now()
+        today = mmddyyyy_from_date(now)
+        tomorrow = mmddyyyy_from_date(now + timedelta(days=1))
+        snapshot = self.store.get()
+
+        with self._lock:
+            # Drop pre-fetched entries whose date has passed
+            for key in [k for k in self._prefetched if k[1] not in (today, tomorrow)]:
+                del self._prefetched[key]
+
+        for hall in self.halls:
+            if snapshot.hall_date(hall) != today:
+                self.refresh(hall, today)
+            if now.hour >= self.prefetch_hour:
+                with self._lock:
+                    have_tomorrow = (hall, tomorrow) in self._prefetched
+                if not have_tomorrow:
+                    self.refresh(hall, tomorrow)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Menu refresh scheduler error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Start the background scheduler thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='menu-refresh-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread; in-flight jobs are allowed to finish."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Refresh counters for monitoring."""
+        with self._lock:
+            return dict(self.stats_counters,
+                        inflight=sorted(f"{hall}@{date}" for hall, date in self._inflight),
+                        prefetched=sorted(f"{hall}@{date}" for hall, date in self._prefetched))
+
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+def get_menu_refresher(store: MenuSnapshotStore) -> MenuRefresher:
+    """Return the process-wide refresher for a snapshot store."""
+    with _refreshers_lock:
+        refresher = _refreshers.get(store.json_file)
+        if refresher is None:
+            refresher = MenuRefresher(store)
+            _refreshers[store.json_file] = refresher
+        return refresher
@@ -0,0 +1,192 @@
+"""
+Menu Snapshot Store
+-------------------
+Process-wide, in-memory cache of the parsed menu JSON (umass_menu_parsed.json).
+
+The menu routes used to json.load the whole file (twice) on every request.
+A MenuSnapshotStore keeps the last loaded version in memory and only re-reads
+the file when its mtime changes or the calendar date rolls over.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from scraping import filter_menu_by_hall, mmddyyyy_from_date
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MENU_FILE = os.path.join(BACKEND_DIR, 'umass_menu_parsed.json')
+
+
+class MenuSnapshot:
+    """
+    One loaded version of the menu file.
+    Treat `data` as read-only: it is shared by every request served from this snapshot.
+    """
+
+    def __init__(self, data: Dict[str, Any], mtime: Optional[float], loaded_on: str, version: int):
+        self.data = data
+        self.mtime = mtime
+        self.loaded_on = loaded_on  # MM/DD/YYYY the snapshot was loaded on
+        self.version = version
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+    def memo(self, key: Any, build: Callable[[], Any]) -> Any:
+        """Compute a derived value once per snapshot (filtered menus, encoded responses, ...)."""
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        value = build()
+        with self._memo_lock:
+            return self._memo.setdefault(key, value)
+
+    def hall_date(self, hall_name: str) -> Optional[str]:
+        """Return the menu date stored for a dining hall, or None if missing."""
+        hall_data = self.data.get(hall_name, {})
+        return hall_data.get("date") if isinstance(hall_data, dict) else None
+
+    def filtered_hall(self, hall_name: str) -> Any:
+        """Hall data with its menu restricted to categories that belong to that hall."""
+        return self.memo(('filtered', hall_name), lambda: _filter_hall(self.data.get(hall_name, {}), hall_name))
+
+    def filtered_all(self) -> Dict[str, Any]:
+        """All halls, each filtered like filtered_hall()."""
+        return self.memo(('filtered_all',), lambda: {
+            hall_name: self.filtered_hall(hall_name) for hall_name in self.data.keys()
+        })
+
+
+def _filter_hall(hall_data: Any, hall_name: str) -> Any:
+    # Copy so the raw snapshot data stays untouched
+    if isinstance(hall_data, dict) and "menu" in hall_data:
+        hall_data = dict(hall_data)
+        hall_data["menu"] = filter_menu_by_hall(hall_data["menu"], hall_name, verbose=False)
+    return hall_data
+
+
+class MenuSnapshotStore:
+    """
+    Serves menu snapshots from memory.
+    The snapshot is reloaded when the file's mtime changes or the date rolls over.
+    """
+
+    def __init__(self, json_file: str = DEFAULT_MENU_FILE):
+        self.json_file = json_file
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.json_file).st_mtime
+        except OSError:
+            return None
+
+    def _is_current(self, snapshot: Optional[MenuSnapshot], mtime: Optional[float], today: str) -> bool:
+        return snapshot is not None and snapshot.mtime == mtime and snapshot.loaded_on == today
+
+    def get(self) -> MenuSnapshot:
+        """Return the current snapshot, reloading it from disk only if it was invalidated."""
+        today = mmddyyyy_from_date(datetime.now())
+        mtime = self._file_mtime()
+        snapshot = self._snapshot
+        if self._is_current(snapshot, mtime, today):
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            snapshot = self._snapshot
+            if self._is_current(snapshot, mtime, today):
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            snapshot = self._load(mtime, today)
+            self._snapshot = snapshot
+            return snapshot
+
+    def _load(self, mtime: Optional[float], today: str) -> MenuSnapshot:
+        data = {}
+        if mtime is not None:
+            try:
+                with open(self.json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Error reading {self.json_file}: {e}")
+                data = {}
+        self._version += 1
+        return MenuSnapshot(data, mtime, today, self._version)
+
+    def replace(self, data: Dict[str, Any]) -> MenuSnapshot:
+        """
+        Write new menu data to disk and install it as the current snapshot
+        without reading the file back.
+        """
+        with self._lock:
+            return self._install(data)
+
+    def update(self, hall_updates: Dict[str, Any]) -> MenuSnapshot:
+        """
+        Merge per-hall entries into the current data and install the result.
+        The read-modify-write happens under the store lock, so concurrent
+        refreshes of different halls cannot drop each other's updates.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            mtime = self._file_mtime()
+            if snapshot is None or snapshot.mtime != mtime:
+                snapshot = self._load(mtime, mmddyyyy_from_date(datetime.now()))
+            data = dict(snapshot.data)
+            data.update(hall_updates)
+            return self._install(data)
+
+    def _install(self, data: Dict[str, Any]) -> MenuSnapshot:
+        # Caller holds self._lock
+        tmp_file = f"{self.json_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.json_file)
+        self._version += 1
+        snapshot = MenuSnapshot(data, self._file_mtime(), mmddyyyy_from_date(datetime.now()), self._version)
+        self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        """Drop the in-memory snapshot; the next get() reloads from disk."""
+        with self._lock:
+            self._snapshot = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring."""
+        snapshot = self._snapshot
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'version': snapshot.version if snapshot else None,
+            'loaded_on': snapshot.loaded_on if snapshot else None,
+            'mtime': snapshot.mtime if snapshot else None
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_menu_store(json_file: str = DEFAULT_MENU_FILE) -> MenuSnapshotStore:
+    """Return the process-wide store for a menu file (one store per absolute path)."""
+    if not os.path.isabs(json_file):
+        json_file = os.path.join(BACKEND_DIR, json_file)
+    with _stores_lock:
+        store = _stores.get(json_file)
+        if store is None:
+            store = MenuSnapshotStore(json_file)
+            _stores[json_file] = store
+        return store
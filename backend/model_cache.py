@@ -0,0 +1,186 @@
+"""
+RL Model Cache
+--------------
+Bounded in-memory LRU of MealRecommenderBandit instances.
+
+The RL endpoints used to load (and then save) the user's model from disk on
+every call. With the cache:
+- hot users are served from memory; only a miss reads from disk
+- models are saved only after they change (mark_dirty), by a background
+  write-behind flusher, never on the request path
+- evicted models that still have unsaved changes stay reachable until the
+  flusher writes them
+
+Readers use cached models without locking. Writers (the trainer) hold
+lock_for(user_id) while they mutate a model; the flusher holds the same lock
+while it saves, so a save never captures a half-applied update.
+"""
+
+import collections
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict
+
+# Maximum models kept in memory
+DEFAULT_CACHE_SIZE = 1000
+
+# Seconds between write-behind flushes of dirty models
+FLUSH_INTERVAL = 5.0
+
+# Number of striped per-user locks
+LOCK_STRIPES = 64
+
+
+class ModelCache:
+    """
+    LRU cache of user models with dirty tracking and write-behind saves.
+    """
+
+    def __init__(self, load_model: Callable[[str], Any], save_model: Callable[[Any], None],
+                 max_models: int = DEFAULT_CACHE_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.load_model = load_model
+        self.save_model = save_model
+        self.max_models = max(1, max_models)
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._models = collections.OrderedDict()   # user_id -> bandit, least recently used first
+        self._dirty = set()                        # user_ids with unsaved changes
+        self._evicted_dirty = {}                   # user_id -> bandit evicted before it was saved
+        self._user_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        self._flusher = None
+        self._stop = threading.Event()
+
+        self.stats_counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'saves': 0,
+            'save_failures': 0
+        }
+        self._last_flush_ms = None
+
+    def lock_for(self, user_id: str) -> threading.RLock:
+        """Lock to hold while mutating or saving this user's model."""
+        return self._user_locks[zlib.crc32(user_id.encode('utf-8')) % LOCK_STRIPES]
+
+    # ---------------- Request-path API --------------------------------
+    def get(self, user_id: str):
+        """Return the user's model, loading it from disk only on a miss."""
+        with self._lock:
+            bandit = self._models.get(user_id)
+            if bandit is not None:
+                self._models.move_to_end(user_id)
+                self.stats_counters['hits'] += 1
+                return bandit
+            bandit = self._evicted_dirty.get(user_id)
+            if bandit is not None:
+                self.stats_counters['hits'] += 1
+                self._admit(user_id, bandit)
+                return bandit
+
+        # Load outside the cache lock; the user lock keeps concurrent misses
+        # for the same user from loading it twice
+        with self.lock_for(user_id):
+            with self._lock:
+                bandit = self._models.get(user_id)
+                if bandit is not None:
+                    self.stats_counters['hits'] += 1
+                    return bandit
+                # Evicted with unsaved changes after the check above: the copy on
+                # disk is stale, so take the in-memory model back
+                bandit = self._evicted_dirty.get(user_id)
+                if bandit is not None:
+                    self.stats_counters['hits'] += 1
+                    self._admit(user_id, bandit)
+                    return bandit
+            bandit = self.load_model(user_id)
+            with self._lock:
+                self.stats_counters['misses'] += 1
+                self._admit(user_id, bandit)
+            return bandit
+
+    def mark_dirty(self, bandit):
+        """Record that a model changed; the flusher saves it later."""
+        self.start()
+        with self._lock:
+            self._admit(bandit.user_id, bandit)
+            self._dirty.add(bandit.user_id)
+
+    def _admit(self, user_id: str, bandit):
+        # Caller holds self._lock
+        self._models[user_id] = bandit
+        self._models.move_to_end(user_id)
+        self._evicted_dirty.pop(user_id, None)
+        while len(self._models) > self.max_models:
+            evicted_id, evicted = self._models.popitem(last=False)
+            self.stats_counters['evictions'] += 1
+            if evicted_id in self._dirty:
+                self._evicted_dirty[evicted_id] = evicted
+
+    # ---------------- Write-behind -----------------------------------
+    def flush(self) -> int:
+        """Save every dirty model now; returns the number saved."""
+        started = time.monotonic()
+        with self._lock:
+            pending = list(self._dirty)
+
+        saved = 0
+        for user_id in pending:
+            with self.lock_for(user_id):
+                with self._lock:
+                    if user_id not in self._dirty:
+                        continue
+                    bandit = self._models.get(user_id) or self._evicted_dirty.get(user_id)
+                    self._dirty.discard(user_id)
+                try:
+                    self.save_model(bandit)
+                    saved += 1
+                except Exception as e:
+                    print(f"Error saving model for user {user_id}: {e}")
+                    with self._lock:
+                        self._dirty.add(user_id)
+                        self.stats_counters['save_failures'] += 1
+                    continue
+                with self._lock:
+                    self.stats_counters['saves'] += 1
+                    if user_id not in self._dirty:
+                        self._evicted_dirty.pop(user_id, None)
+
+        if pending:
+            self._last_flush_ms = round((time.monotonic() - started) * 1000, 2)
+        return saved
+
+    def start(self):
+        """Start the background flusher thread (idempotent)."""
+        if self._flusher is not None or self.flush_interval <= 0:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='rl-model-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Model cache flush error: {e}")
+
+    def close(self):
+        """Stop the flusher and save anything still dirty."""
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring."""
+        with self._lock:
+            total = self.stats_counters['hits'] + self.stats_counters['misses']
+            return dict(self.stats_counters,
+                        size=len(self._models),
+                        max_models=self.max_models,
+                        hit_rate=self.stats_counters['hits'] / total if total else 0.0,
+                        dirty=len(self._dirty),
+                        evicted_unsaved=len(self._evicted_dirty),
+                        last_flush_ms=self._last_flush_ms)
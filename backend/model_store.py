@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+RL Model Store
+--------------
+Pluggable storage for per-user MealRecommenderBandit records.
+
+Backends (chosen with a spec string, e.g. RL_MODEL_STORE=sharded:user_models):
+  flat:<dir>       {user_id}_model.json (+ history/model files) in one directory,
+                   the original layout
+  sharded:<dir>    the same files under a two-level hashed fanout
+                   (<dir>/ab/cd/...), so no directory grows past a few hundred
+                   entries with tens of thousands of users
+  sqlite:<file>    one row per user in an embedded SQLite database (WAL mode)
+
+Every save is atomic: file backends write-then-rename, SQLite commits one
+row per transaction. All backends can stream every record without
+unpickling models, which is what backups and migrations use.
+
+Usage:
+  python3 model_store.py count   --store sharded:user_models
+  python3 model_store.py migrate --from flat:user_models --to sqlite:user_models/models.sqlite3
+"""
+
+import abc
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from rl_recommender import MealRecommenderBandit, model_file_paths, read_model_files, write_model_files
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_SPEC = f"flat:{os.path.join(BACKEND_DIR, 'user_models')}"
+
+MODEL_SUFFIX = '_model.json'
+
+# (header, float32 history matrix, compressed model bytes or None)
+Record = Tuple[Dict, Optional[np.ndarray], Optional[bytes]]
+
+
+class ModelStore(abc.ABC):
+    """
+    Base class: record-level get/put plus bandit helpers built on them.
+    Subclasses implement get_record, put_record, delete, user_ids; a backend
+    missing any of them fails when it is instantiated.
+    """
+
+    @abc.abstractmethod
+    def get_record(self, user_id: str) -> Optional[Record]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def put_record(self, user_id: str, record: Record):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, user_id: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def user_ids(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    # ---------------- Bandits ----------------------------------------
+    def load(self, user_id: str, model_type: Optional[str] = None) -> Optional[MealRecommenderBandit]:
+        """The user's bandit, or None if the store has no record for them."""
+        record = self.get_record(user_id)
+        if record is None:
+            return None
+        return MealRecommenderBandit.from_record(*record, model_type=model_type)
+
+    def save(self, bandit: MealRecommenderBandit):
+        self.put_record(bandit.user_id, bandit.to_record())
+
+    def load_many(self, user_ids: Iterable[str]) -> Dict[str, MealRecommenderBandit]:
+        """Bandits for every user_id that has a record."""
+        bandits = {}
+        for user_id, record in self.get_records(user_ids):
+            bandits[user_id] = MealRecommenderBandit.from_record(*record)
+        return bandits
+
+    def get_records(self, user_ids: Iterable[str]) -> Iterator[Tuple[str, Record]]:
+        for user_id in user_ids:
+            record = self.get_record(user_id)
+            if record is not None:
+                yield user_id, record
+
+    def iter_records(self) -> Iterator[Tuple[str, Record]]:
+        """Stream (user_id, record) for every user, without unpickling models."""
+        return self.get_records(self.user_ids())
+
+    def iter_models(self) -> Iterator[MealRecommenderBandit]:
+        for _, record in self.iter_records():
+            yield MealRecommenderBandit.from_record(*record)
+
+    def close(self):
+        pass
+
+
+class FlatModelStore(ModelStore):
+    """The original layout: every user's files directly in one directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, user_id: str) -> str:
+        return os.path.join(self.directory, f"{user_id}{MODEL_SUFFIX}")
+
+    def get_record(self, user_id: str) -> Optional[Record]:
+        path = self.path_for(user_id)
+        if not os.path.exists(path):
+            return None
+        return read_model_files(path)
+
+    def put_record(self, user_id: str, record: Record):
+        path = self.path_for(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_model_files(path, *record)
+
+    def delete(self, user_id: str):
+        for name in model_file_paths(self.path_for(user_id)):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+    def _user_from_name(self, name: str) -> str:
+        return name[:-len(MODEL_SUFFIX)]
+
+    def user_ids(self) -> Iterator[str]:
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(MODEL_SUFFIX):
+                    yield self._user_from_name(entry.name)
+
+
+class ShardedModelStore(FlatModelStore):
+    """
+    Files under <dir>/<h[0:2]>/<h[2:4]>/ where h = sha1(user_id).
+    File names are the percent-encoded user_id, so any id is a safe name.
+    """
+
+    def path_for(self, user_id: str) -> str:
+        digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:4], f"{quote(user_id, safe='')}{MODEL_SUFFIX}")
+
+    def _user_from_name(self, name: str) -> str:
+        return unquote(name[:-len(MODEL_SUFFIX)])
+
+    def user_ids(self) -> Iterator[str]:
+        for first in sorted(os.listdir(self.directory)):
+            first_dir = os.path.join(self.directory, first)
+            if len(first) != 2 or not os.path.isdir(first_dir):
+                continue
+            for second in sorted(os.listdir(first_dir)):
+                shard = os.path.join(first_dir, second)
+                if not os.path.isdir(shard):
+                    continue
+                with os.scandir(shard) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(MODEL_SUFFIX):
+                            yield self._user_from_name(entry.name)
+
+
+class SQLiteModelStore(ModelStore):
+    """One row per user: header JSON, history .npy bytes, compressed model bytes."""
+
+    # Rows fetched per query by get_records / iter_records
+    BATCH_SIZE = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS models ("
+                " user_id TEXT PRIMARY KEY,"
+                " header TEXT NOT NULL,"
+                " history BLOB,"
+                " model BLOB,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers run alongside the writer
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode_history(history: Optional[np.ndarray]) -> Optional[bytes]:
+        if history is None:
+            return None
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(history, dtype=np.float32))
+        return buffer.getvalue()
+
+    @staticmethod
+    def _decode(row) -> Record:
+        header, history, model = row
+        history = np.load(io.BytesIO(history)) if history else None
+        return json.loads(header), history, model
+
+    def get_record(self, user_id: str) -> Optional[Record]:
+        row = self._connect().execute(
+            "SELECT header, history, model FROM models WHERE user_id = ?", (user_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def put_record(self, user_id: str, record: Record):
+        header, history, model_blob = record
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO models (user_id, header, history, model, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, json.dumps(header), self._encode_history(history), model_blob, time.time()))
+
+    def put_records(self, records: Iterable[Tuple[str, Record]], batch_size: int = BATCH_SIZE) -> int:
+        """Bulk insert, committing every batch_size rows."""
+        conn = self._connect()
+        count = 0
+        batch = []
+        for user_id, (header, history, model_blob) in records:
+            batch.append((user_id, json.dumps(header), self._encode_history(history), model_blob, time.time()))
+            if len(batch) >= batch_size:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?, ?)", batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?, ?)", batch)
+            count += len(batch)
+        return count
+
+    def delete(self, user_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM models WHERE user_id = ?", (user_id,))
+
+    def user_ids(self) -> Iterator[str]:
+        for (user_id,) in self._connect().execute("SELECT user_id FROM models ORDER BY user_id"):
+            yield user_id
+
+    def get_records(self, user_ids: Iterable[str]) -> Iterator[Tuple[str, Record]]:
+        user_ids = list(user_ids)
+        conn = self._connect()
+        for start in range(0, len(user_ids), self.BATCH_SIZE):
+            chunk = user_ids[start:start + self.BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT user_id, header, history, model FROM models WHERE user_id IN ({placeholders})", chunk)
+            for user_id, *row in rows:
+                yield user_id, self._decode(row)
+
+    def iter_records(self) -> Iterator[Tuple[str, Record]]:
+        # Keyset pagination keeps memory flat for any number of users
+        conn = self._connect()
+        last = ''
+        while True:
+            rows = conn.execute(
+                "SELECT user_id, header, history, model FROM models WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                (last, self.BATCH_SIZE)).fetchall()
+            if not rows:
+                return
+            for user_id, *row in rows:
+                yield user_id, self._decode(row)
+            last = rows[-1][0]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+STORE_BACKENDS = {
+    'flat': FlatModelStore,
+    'sharded': ShardedModelStore,
+    'sqlite': SQLiteModelStore
+}
+
+
+def open_model_store(spec: str = DEFAULT_STORE_SPEC) -> ModelStore:
+    """Open a store from '<backend>:<path>' (a bare path means flat)."""
+    backend, sep, path = spec.partition(':')
+    if not sep:
+        backend, path = 'flat', spec
+    if backend not in STORE_BACKENDS:
+        raise ValueError(f"Unknown model store backend {backend!r}; expected one of {sorted(STORE_BACKENDS)}")
+    if not os.path.isabs(path):
+        path = os.path.join(BACKEND_DIR, path)
+    return STORE_BACKENDS[backend](path)
+
+
+def migrate(source: ModelStore, target: ModelStore, verbose: bool = True) -> int:
+    """Copy every record from source to target, streaming; returns records copied."""
+    records = source.iter_records()
+    if isinstance(target, SQLiteModelStore):
+        count = target.put_records(records)
+    else:
+        count = 0
+        for user_id, record in records:
+            target.put_record(user_id, record)
+            count += 1
+            if verbose and count % 1000 == 0:
+                print(f"  {count} users copied...")
+    return count
+
+
+def main():
+    p = argparse.ArgumentParser(description="Inspect or migrate RL user model stores.")
+    sub = p.add_subparsers(dest="command", required=True)
+    count_cmd = sub.add_parser("count", help="Count users in a store")
+    count_cmd.add_argument("--store", default=DEFAULT_STORE_SPEC)
+    migrate_cmd = sub.add_parser("migrate", help="Copy every user from one store to another")
+    migrate_cmd.add_argument("--from", dest="source", default=DEFAULT_STORE_SPEC)
+    migrate_cmd.add_argument("--to", dest="target", required=True)
+    args = p.parse_args()
+
+    if args.command == "count":
+        store = open_model_store(args.store)
+        print(sum(1 for _ in store.user_ids()))
+        return
+
+    source = open_model_store(args.source)
+    target = open_model_store(args.target)
+    start = time.perf_counter()
+    count = migrate(source, target)
+    print(f"Migrated {count} users from {args.source} to {args.target} in {time.perf_counter() - start:.1f}s")
+    source.close()
+    target.close()
+
+
+if __name__ == "__main__":
+    main()
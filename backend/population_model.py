@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+RL Population Model
+-------------------
+Shared reward model for RL_MODEL_TYPE=hierarchical.
+
+Instead of a private forest per user, one population estimator is trained
+periodically on (a sample of) every user's saved history, and each user
+keeps only a small ridge head fitted to the residual r - population(x):
+
+  predicted reward = population(x) + head_u(x) (+ LinUCB bonus of the head)
+
+- The head is an OnlineRidgeModel (a few KB), so per-user memory and model
+  files no longer grow with a forest per user.
+- A new user is served by the population model from the first request.
+- Heads remember which population version their residuals were fitted
+  against; after a retrain the bandit refits its head from history on the
+  next train().
+
+The estimator lives in one process-wide PopulationModel (get_population_model)
+that is retrained in place, saved to POPULATION_MODEL_PATH and reloaded by
+other processes when the file changes.
+
+Usage:
+  python3 population_model.py train --store flat:user_models
+  python3 population_model.py stats
+"""
+
+import argparse
+import json
+import os
+import pickle
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from rl_recommender import (LINUCB_ALPHA, MODEL_COMPRESS, N_CONTEXT_FEATURES, SKLEARN_AVAILABLE,
+                            OnlineRidgeModel)
+
+if SKLEARN_AVAILABLE:
+    from sklearn.ensemble import RandomForestRegressor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+POPULATION_MODEL_PATH = os.environ.get(
+    'RL_POPULATION_MODEL', os.path.join(BACKEND_DIR, 'user_models', 'population_model.pkl.z'))
+
+# Rows sampled across all users for one population fit
+POPULATION_MAX_ROWS = int(os.environ.get('RL_POPULATION_MAX_ROWS', '50000'))
+
+# Seconds between background retrains in the server (0 = never; e.g. when a cron job runs `train`)
+POPULATION_RETRAIN_INTERVAL = float(os.environ.get('RL_POPULATION_RETRAIN_SECONDS', '3600'))
+
+# Seconds between checks for a population model saved by another process
+POPULATION_RELOAD_INTERVAL = 60.0
+
+# Ridge penalty of the per-user head: higher keeps users closer to the population
+HEAD_RIDGE = 5.0
+
+
+def _new_estimator():
+    if SKLEARN_AVAILABLE:
+        return RandomForestRegressor(
+            n_estimators=50,
+            max_depth=10,
+            min_samples_leaf=5,
+            random_state=42,
+            n_jobs=-1
+        )
+    return OnlineRidgeModel(alpha=0.0)
+
+
+class PopulationModel:
+    """
+    Holder of the shared estimator. Retraining swaps the estimator and bumps
+    version; heads keep a reference to the holder, not to the estimator.
+    """
+
+    def __init__(self, path: str = POPULATION_MODEL_PATH):
+        self.path = path
+        self.estimator = None
+        self.version = 0.0      # time the estimator was trained (0 = none yet)
+        self.n_rows = 0
+        self.n_users = 0
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats_counters = {
+            'fits': 0,
+            'reloads': 0,
+            'fit_failures': 0
+        }
+        self._last_fit_ms = None
+
+    def reset(self):
+        """Forget the estimator (offline replays start from an empty population)."""
+        with self._lock:
+            self.estimator = None
+            self.version = 0.0
+            self.n_rows = 0
+            self.n_users = 0
+
+    def is_fitted(self) -> bool:
+        return self.estimator is not None
+
+    def predict(self, X) -> np.ndarray:
+        """Population reward estimate (zeros until the first fit)."""
+        estimator = self.estimator
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if estimator is None:
+            return np.zeros(X.shape[0])
+        return np.asarray(estimator.predict(X), dtype=np.float64)
+
+    # ---------------- Training ----------------------------------------
+    def fit_histories(self, histories: Iterable[np.ndarray], max_rows: int = POPULATION_MAX_ROWS,
+                      seed: int = 0) -> int:
+        """
+        Fit on history matrices (features + reward, as MealRecommenderBandit.
+        history_matrix), keeping a uniform sample of at most max_rows rows
+        so memory stays bounded however many users there are.
+        Returns the number of rows fitted.
+        """
+        rng = np.random.default_rng(seed)
+        sample = np.empty((max_rows, N_CONTEXT_FEATURES + 1), dtype=np.float32)
+        seen = 0
+        n_users = 0
+        for history in histories:
+            if history is None or not len(history):
+                continue
+            n_users += 1
+            history = np.asarray(history, dtype=np.float32)
+            free = max(0, min(max_rows - seen, len(history)))
+            sample[seen:seen + free] = history[:free]
+            rest = history[free:]
+            if len(rest):
+                # Algorithm R over rows: row i replaces a random slot with probability max_rows / (i + 1)
+                slots = rng.integers(0, np.arange(seen + free, seen + len(history)) + 1)
+                keep = slots < max_rows
+                sample[slots[keep]] = rest[keep]
+            seen += len(history)
+
+        n_rows = min(seen, max_rows)
+        if not n_rows:
+            return 0
+        started = time.monotonic()
+        estimator = _new_estimator()
+        estimator.fit(sample[:n_rows, :-1].astype(np.float64), sample[:n_rows, -1].astype(np.float64))
+        with self._lock:
+            self.estimator = estimator
+            self.version = time.time()
+            self.n_rows = n_rows
+            self.n_users = n_users
+            self.stats_counters['fits'] += 1
+            self._last_fit_ms = round((time.monotonic() - started) * 1000, 2)
+        return n_rows
+
+    def fit_from_store(self, store, max_rows: int = POPULATION_MAX_ROWS, seed: int = 0) -> int:
+        """Fit on every user's saved history in a ModelStore (models are not unpickled)."""
+        return self.fit_histories((record[1] for _, record in store.iter_records()), max_rows, seed)
+
+    # ---------------- Persistence -------------------------------------
+    def save(self, path: Optional[str] = None):
+        """Write the estimator atomically (zlib-compressed protocol-5 pickle)."""
+        path = path or self.path
+        if self.estimator is None:
+            return
+        payload = {'version': self.version, 'n_rows': self.n_rows, 'n_users': self.n_users,
+                   'estimator': self.estimator}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(zlib.compress(pickle.dumps(payload, protocol=5), MODEL_COMPRESS))
+        os.replace(f"{path}.tmp", path)
+        self._loaded_mtime = os.path.getmtime(path)
+
+    def reload_if_changed(self) -> bool:
+        """Load the saved estimator if the file is newer than what is in memory."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._loaded_mtime:
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                payload = pickle.loads(zlib.decompress(f.read()))
+        except Exception as e:
+            print(f"Error loading population model: {e}")
+            return False
+        with self._lock:
+            self._loaded_mtime = mtime
+            if payload['version'] <= self.version:
+                return False
+            self.estimator = payload['estimator']
+            self.version = payload['version']
+            self.n_rows = payload.get('n_rows', 0)
+            self.n_users = payload.get('n_users', 0)
+            self.stats_counters['reloads'] += 1
+        return True
+
+    # ---------------- Periodic retraining -----------------------------
+    def start(self, store, interval: float = POPULATION_RETRAIN_INTERVAL):
+        """
+        Load the saved estimator, then keep it current in the background:
+        pick up files saved by other processes, and retrain from the store
+        every interval seconds (if interval > 0). The first retrain runs as
+        soon as the thread starts unless the loaded estimator is younger
+        than interval.
+        """
+        self.reload_if_changed()
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, args=(store, interval),
+                                        name='rl-population', daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self, store, interval: float):
+        # Count the loaded estimator's age (none loaded = overdue), so a fresh server fits right away
+        age = time.time() - self.version if self.version else float('inf')
+        last_fit = time.monotonic() - age
+        while True:
+            if interval > 0 and time.monotonic() - last_fit >= interval:
+                last_fit = time.monotonic()
+                try:
+                    if self.fit_from_store(store):
+                        self.save()
+                except Exception as e:
+                    self.stats_counters['fit_failures'] += 1
+                    print(f"Population model retrain error: {e}")
+            if self._stop.wait(POPULATION_RELOAD_INTERVAL):
+                return
+            self.reload_if_changed()
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats_counters,
+                        fitted=self.estimator is not None,
+                        version=self.version,
+                        n_rows=self.n_rows,
+                        n_users=self.n_users,
+                        last_fit_ms=self._last_fit_ms)
+
+
+class ResidualHeadModel(OnlineRidgeModel):
+    """
+    Per-user ridge head on top of the population model. Only the head is
+    pickled with the user's bandit; the population reference is re-attached
+    to the process-wide model on load.
+    """
+
+    def __init__(self, population: Optional[PopulationModel] = None, alpha: float = LINUCB_ALPHA,
+                 ridge: float = HEAD_RIDGE):
+        self.population = population or get_population_model()
+        self.population_version = self.population.version
+        super().__init__(alpha=alpha, ridge=ridge)
+
+    def has_prior(self) -> bool:
+        return self.population.is_fitted()
+
+    def is_stale(self) -> bool:
+        return self.population_version != self.population.version
+
+    def partial_fit_many(self, X, y):
+        # One population predict for all new rows (a forest predict per row costs ~ a batch of hundreds)
+        return super().partial_fit_many(X, np.asarray(y, dtype=np.float64) - self.population.predict(X))
+
+    def fit(self, X, y, sample_weight=None):
+        self.population_version = self.population.version
+        return super().fit(X, np.asarray(y, dtype=np.float64) - self.population.predict(X), sample_weight)
+
+    def predict(self, X) -> np.ndarray:
+        return self.population.predict(X) + super().predict(X)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('population', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.population = get_population_model()
+
+
+_population = None
+_population_lock = threading.Lock()
+
+
+def get_population_model() -> PopulationModel:
+    """Return the process-wide population model, loading the saved one on first use."""
+    global _population
+    with _population_lock:
+        if _population is None:
+            _population = PopulationModel()
+            _population.reload_if_changed()
+        return _population
+
+
+def main():
+    from model_store import DEFAULT_STORE_SPEC, open_model_store
+
+    p = argparse.ArgumentParser(description="Train or inspect the shared RL population model.")
+    sub = p.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="Fit the population model on every user in a store and save it")
+    train_cmd.add_argument("--store", default=DEFAULT_STORE_SPEC)
+    train_cmd.add_argument("--max-rows", type=int, default=POPULATION_MAX_ROWS)
+    train_cmd.add_argument("--out", default=POPULATION_MODEL_PATH)
+    sub.add_parser("stats", help="Show the saved population model")
+    args = p.parse_args()
+
+    population = get_population_model()
+    if args.command == "stats":
+        print(json.dumps(population.stats(), indent=2))
+        return
+
+    store = open_model_store(args.store)
+    start = time.perf_counter()
+    n_rows = population.fit_from_store(store, args.max_rows)
+    store.close()
+    if not n_rows:
+        print("No history to train on")
+        return
+    population.save(args.out)
+    print(f"Fitted on {n_rows} rows from {population.n_users} users in {time.perf_counter() - start:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,32 @@
 RL Recommender System
 ---------------------
 Contextual multi-armed bandit for personalized meal recommendations.
-Uses Random Forest regression to predict meal satisfaction based on user context.
+Predicts meal satisfaction from user context with one of three models, chosen
+per deployment with RL_MODEL_TYPE:
+  forest        Random Forest regression, refit on the full history (every RL_RETRAIN_EVERY feedbacks)
+  linucb        online ridge regression with a LinUCB confidence bonus, constant-time updates
+  hierarchical  shared population model (population_model.py) plus a per-user
+                linucb head on its residuals
+
+The stored feedback history can be bounded with RL_HISTORY_MODE (window or
+reservoir, RL_HISTORY_SIZE samples) and weighted toward recent feedback with
+RL_HISTORY_DECAY. The forest is refit on the retained history only; linucb
+has already folded every sample into its statistics and uses the retained
+history only when it is refit from scratch.
 """
 
 import numpy as np
+import glob
 import json
 import os
 from datetime import datetime
 from collections import defaultdict
 from typing import Dict, List, Optional, Tuple
 import pickle
+import random
+import zlib
+
+from meal_catalog import CatalogView
 
 try:
     from sklearn.ensemble import RandomForestRegressor
@@ -34,30 +50,322 @@ else:
             pass
 
 
+# Length of the vector built by MealRecommenderBandit.get_context_features
+N_CONTEXT_FEATURES = 21
+
+# Feedbacks needed before the model replaces random exploration
+MIN_TRAINING_SAMPLES = 5
+
+# Cold-start heuristic (see cold_start_scores): points for an exact calorie
+# match, calories per point lost, and bonuses for protein-rich and balanced meals
+COLD_START_WEIGHTS = {
+    'calorie_match': 100.0,
+    'calorie_scale': 10.0,
+    'high_protein': 20.0,
+    'protein_ratio': 0.25,
+    'balanced_macros': 10.0
+}
+
+# Allergen terms whose per-catalog match tables are cached (terms are user input, so bounded)
+FILTER_TERM_CACHE_SIZE = 256
+
+# On-disk format written by MealRecommenderBandit.save (files without a
+# format_version are the original all-JSON history + pickle format)
+MODEL_FORMAT_VERSION = 2
+MODEL_COMPRESS = 3  # zlib level for the pickled estimator
+
+# ---------------- Model selection ----------------------------------------
+MODEL_TYPES = ('forest', 'linucb', 'hierarchical')
+DEFAULT_MODEL_TYPE = os.environ.get('RL_MODEL_TYPE', 'forest').strip().lower()
+if DEFAULT_MODEL_TYPE not in MODEL_TYPES:
+    print(f"Warning: unknown RL_MODEL_TYPE {DEFAULT_MODEL_TYPE!r}, using 'forest'.")
+    DEFAULT_MODEL_TYPE = 'forest'
+
+# Forest only: refit once this many new feedbacks have accumulated
+DEFAULT_RETRAIN_EVERY = max(1, int(os.environ.get('RL_RETRAIN_EVERY', '1')))
+
+# LinUCB and hierarchical heads: weight of the confidence bonus and the ridge penalty
+LINUCB_ALPHA = float(os.environ.get('RL_LINUCB_ALPHA', '0.25'))
+LINUCB_RIDGE = 1.0
+
+# ---------------- History retention --------------------------------------
+# all        keep every feedback (original behavior)
+# window     keep the most recent RL_HISTORY_SIZE feedbacks
+# reservoir  keep a uniform sample of RL_HISTORY_SIZE over all feedbacks ever seen
+HISTORY_MODES = ('all', 'window', 'reservoir')
+DEFAULT_HISTORY_MODE = os.environ.get('RL_HISTORY_MODE', 'all').strip().lower()
+if DEFAULT_HISTORY_MODE not in HISTORY_MODES:
+    print(f"Warning: unknown RL_HISTORY_MODE {DEFAULT_HISTORY_MODE!r}, using 'all'.")
+    DEFAULT_HISTORY_MODE = 'all'
+DEFAULT_HISTORY_SIZE = max(MIN_TRAINING_SAMPLES, int(os.environ.get('RL_HISTORY_SIZE', '500')))
+
+# Sample weight multiplier per newer feedback when refitting (1.0 = equal weights)
+DEFAULT_HISTORY_DECAY = float(os.environ.get('RL_HISTORY_DECAY', '1.0'))
+
+
+class OnlineRidgeModel:
+    """
+    Ridge regression updated one sample at a time (LinUCB-style).
+
+    Keeps A^-1 = (ridge * I + X^T X)^-1 and b = X^T y over the features plus a
+    bias term. partial_fit is a Sherman-Morrison rank-one update of A^-1, so a
+    feedback costs O(d^2) no matter how long the history is. predict returns
+    the ridge estimate plus alpha times its confidence width.
+    """
+
+    def __init__(self, n_features: int = N_CONTEXT_FEATURES, alpha: float = LINUCB_ALPHA,
+                 ridge: float = LINUCB_RIDGE):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.ridge = ridge
+        self.reset()
+
+    def reset(self):
+        d = self.n_features + 1
+        self.A_inv = np.eye(d) / self.ridge
+        self.b = np.zeros(d)
+        self.coef_ = np.zeros(d)
+        self.n_samples = 0
+
+    @staticmethod
+    def _with_bias(X) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        return np.hstack([X, np.ones((X.shape[0], 1))])
+
+    def partial_fit(self, x, y: float):
+        """Add one (features, reward) sample."""
+        return self.partial_fit_many(np.atleast_2d(x), [y])
+
+    def partial_fit_many(self, X, y):
+        """Add samples in order: one rank-one update per row, coefficients solved once."""
+        Xb = self._with_bias(X)
+        y = np.asarray(y, dtype=np.float64)
+        for x in Xb:
+            A_inv_x = self.A_inv @ x
+            self.A_inv -= np.outer(A_inv_x, A_inv_x) / (1.0 + x @ A_inv_x)
+        self.b += Xb.T @ y
+        self.coef_ = self.A_inv @ self.b
+        self.n_samples += Xb.shape[0]
+        return self
+
+    def fit(self, X, y, sample_weight=None):
+        """Fit from scratch on a full history."""
+        self.reset()
+        Xb = self._with_bias(X)
+        y = np.asarray(y, dtype=np.float64)
+        Xw = Xb if sample_weight is None else Xb * np.asarray(sample_weight, dtype=np.float64)[:, None]
+        A = self.ridge * np.eye(Xb.shape[1]) + Xw.T @ Xb
+        self.A_inv = np.linalg.inv(A)
+        self.b = Xw.T @ y
+        self.coef_ = self.A_inv @ self.b
+        self.n_samples = Xb.shape[0]
+        return self
+
+    def has_prior(self) -> bool:
+        """True if the model predicts something useful before any samples."""
+        return False
+
+    def is_stale(self) -> bool:
+        """True if the model must be refit from history before further updates."""
+        return False
+
+    def predict(self, X) -> np.ndarray:
+        Xb = self._with_bias(X)
+        scores = Xb @ self.coef_
+        if self.alpha:
+            width = np.einsum('ij,jk,ik->i', Xb, self.A_inv, Xb)
+            scores = scores + self.alpha * np.sqrt(np.maximum(width, 0.0))
+        return scores
+
+
+def _is_fitted(model) -> bool:
+    if model is None:
+        return False
+    if isinstance(model, OnlineRidgeModel):
+        return model.n_samples > 0 or model.has_prior()
+    try:
+        check_is_fitted(model)
+        return True
+    except Exception:
+        return False
+
+
+def _text_column(values: List[str]):
+    """Dictionary-encode lowercased strings: (unique values, code per row)."""
+    if not values:
+        return [], np.zeros(0, dtype=np.int64)
+    uniques, codes = np.unique(np.array(values, dtype=object).astype(str), return_inverse=True)
+    return uniques.tolist(), codes
+
+
+def _text_match(column, rows, predicate) -> np.ndarray:
+    """Evaluate a string predicate once per distinct value and broadcast it to the rows."""
+    uniques, codes = column
+    lookup = np.fromiter((1.0 if predicate(v) else 0.0 for v in uniques), dtype=np.float64, count=len(uniques))
+    return lookup[codes if rows is None else codes[rows]]
+
+
+def _build_meal_columns(calories, protein, carbs, fat, names, stations, cuisines, locations,
+                        allergens, clean_diets) -> Dict:
+    """Meal-side feature columns shared by every state (see get_context_features)."""
+    calories = np.asarray(calories, dtype=np.float64)
+    protein = np.asarray(protein, dtype=np.float64)
+
+    def flag(values, test):
+        return np.fromiter((1.0 if test(v) else 0.0 for v in values), dtype=np.float64, count=len(values))
+
+    return {
+        'calories': calories,
+        'protein': protein,
+        'carbs': np.asarray(carbs, dtype=np.float64),
+        'fat': np.asarray(fat, dtype=np.float64),
+        'is_grill': flag(stations, lambda s: 'grill' in s),
+        'is_international': flag(stations, lambda s: 'international' in s or 'world' in s),
+        'is_comfort': flag(stations, lambda s: 'comfort' in s or 'home' in s),
+        'is_salad': flag(list(zip(stations, names)), lambda sn: 'salad' in sn[0] or 'salad' in sn[1]),
+        'is_vegetarian': flag(clean_diets, lambda d: 'vegetarian' in d or 'plant' in d),
+        'high_protein': (protein / np.maximum(calories, 1) > 0.25).astype(np.float64),
+        'name': _text_column(names),
+        'cuisine': _text_column(cuisines),
+        'location': _text_column(locations),
+        'allergens': _text_column(allergens),
+    }
+
+
+def _allowed_mask(meals: CatalogView, state: Dict) -> np.ndarray:
+    """
+    Boolean mask over a CatalogView: True where the meal contains none of the
+    user's allergens (substring match, case-insensitive) and, for vegetarians,
+    is vegetarian or plant based. Each allergen term is tested once per
+    distinct allergens string in the catalog and the result is cached, so a
+    request only ORs small lookup tables and gathers them by row.
+    """
+    columns, rows = _meal_columns(meals)
+    term_tables = meals.catalog.memo('allergen_term_tables', lambda catalog: {})
+    uniques, codes = columns['allergens']
+
+    blocked = np.zeros(len(uniques), dtype=bool)
+    for term in {a.lower() for a in state.get('allergens', [])}:
+        table = term_tables.get(term)
+        if table is None:
+            table = np.fromiter((term in value for value in uniques), dtype=bool, count=len(uniques))
+            if len(term_tables) < FILTER_TERM_CACHE_SIZE:
+                term_tables[term] = table
+        blocked |= table
+
+    allowed = ~blocked[codes[rows]]
+    if 'vegetarian' in [r.lower() for r in state.get('dietary_restrictions', [])]:
+        allowed &= columns['is_vegetarian'][rows] > 0
+    return allowed
+
+
+def filter_meals(meals: List[Dict], state: Dict) -> List[Dict]:
+    """
+    Drop meals containing the user's allergens, and non-vegetarian meals for
+    vegetarians. A CatalogView is filtered with one mask over the catalog's
+    precomputed columns and stays a CatalogView; a plain list is scanned.
+    """
+    if isinstance(meals, CatalogView):
+        return meals.subset(np.flatnonzero(_allowed_mask(meals, state)))
+
+    filtered = []
+    allergens = [a.lower() for a in state.get('allergens', [])]
+    dietary_restrictions = [r.lower() for r in state.get('dietary_restrictions', [])]
+
+    for meal in meals:
+        # Check allergens
+        meal_allergens = meal.get('allergens', '').lower()
+        if any(allergen in meal_allergens for allergen in allergens):
+            continue  # Skip meals with user's allergens
+
+        # Check dietary restrictions
+        meal_clean_diet = meal.get('clean_diet', '').lower()
+        if 'vegetarian' in dietary_restrictions and 'vegetarian' not in meal_clean_diet and 'plant' not in meal_clean_diet:
+            continue
+
+        filtered.append(meal)
+    return filtered
+
+
+def top_k_indices(scores, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, highest first, with ties in input order
+    (the order a stable sort with reverse=True gives). Only the k winners
+    are sorted: a partition finds the k-th largest score first.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        threshold = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def _catalog_meal_columns(catalog) -> Dict:
+    return _build_meal_columns(catalog.calories, catalog.protein, catalog.carbs, catalog.fat,
+                               catalog.name_lc, catalog.category_lc, catalog.cuisine_lc,
+                               catalog.location_lc, catalog.allergens_lc, catalog.clean_diet_lc)
+
+
+def _meal_columns(meals: List[Dict]):
+    """
+    Return (columns, rows). For a CatalogView the columns cover the whole
+    catalog (built once and cached on it) and rows selects the view's meals;
+    for a plain list they are built for the list and rows is None.
+    """
+    if isinstance(meals, CatalogView):
+        return meals.catalog.memo('bandit_meal_columns', _catalog_meal_columns), meals.rows
+    return _build_meal_columns(
+        [m.get('calories', 0) for m in meals],
+        [m.get('protein', 0) for m in meals],
+        [m.get('carbs', 0) for m in meals],
+        [m.get('fat', 0) for m in meals],
+        [m.get('name', '').lower() for m in meals],
+        [m.get('category', '').lower() for m in meals],
+        [m.get('cuisine_type', '').lower() for m in meals],
+        [m.get('location', '').lower() for m in meals],
+        [m.get('allergens', '').lower() for m in meals],
+        [m.get('clean_diet', '').lower() for m in meals],
+    ), None
+
+
 class MealRecommenderBandit:
     """
     Contextual bandit for meal recommendations.
     Uses epsilon-greedy exploration with regression model.
     """
     
-    def __init__(self, user_id: str, epsilon: float = 0.15, learning_rate: float = 0.01):
+    def __init__(self, user_id: str, epsilon: float = 0.15, learning_rate: float = 0.01,
+                 model_type: Optional[str] = None, retrain_every: Optional[int] = None,
+                 history_mode: Optional[str] = None, history_size: Optional[int] = None,
+                 history_decay: Optional[float] = None):
         self.user_id = user_id
         self.epsilon = epsilon  # exploration rate
         self.epsilon_min = 0.05
         self.epsilon_decay = 0.995
         self.learning_rate = learning_rate
-        
-        if SKLEARN_AVAILABLE:
-            self.model = RandomForestRegressor(
-                n_estimators=50,
-                max_depth=10,
-                random_state=42,
-                n_jobs=-1
-            )
-        else:
-            self.model = None
+
+        self.model_type = model_type or DEFAULT_MODEL_TYPE
+        if self.model_type not in MODEL_TYPES:
+            raise ValueError(f"Unknown model_type {self.model_type!r}; expected one of {MODEL_TYPES}")
+        self.retrain_every = max(1, retrain_every or DEFAULT_RETRAIN_EVERY)
+        self.history_mode = history_mode or DEFAULT_HISTORY_MODE
+        if self.history_mode not in HISTORY_MODES:
+            raise ValueError(f"Unknown history_mode {self.history_mode!r}; expected one of {HISTORY_MODES}")
+        self.history_size = max(MIN_TRAINING_SAMPLES, history_size or DEFAULT_HISTORY_SIZE)
+        self.history_decay = DEFAULT_HISTORY_DECAY if history_decay is None else history_decay
+        self.model = self._new_model()
         
         self.meal_history = []  # List of (context_features, reward) tuples
+        self.trained_samples = 0  # len(meal_history) already folded into the model
+        self.samples_seen = 0  # feedbacks ever recorded, including ones retention dropped
         self.is_trained = False
         self.preferences = {
             'favorite_cuisines': [],
@@ -159,6 +467,72 @@ class MealRecommenderBandit:
         
         return features
     
+    def get_context_features_batch(self, state: Dict, meals: List[Dict]) -> np.ndarray:
+        """
+        Feature matrix (len(meals) x 21) for one state and many meals.
+        Row i equals get_context_features(state, meals[i]). Meal-side columns
+        are precomputed once per meal catalog (or once per call for a plain
+        list); state-side columns are broadcast.
+        """
+        n = len(meals)
+        features = np.empty((n, N_CONTEXT_FEATURES))
+        if n == 0:
+            return features
+        columns, rows = _meal_columns(meals)
+
+        def take(column):
+            return column if rows is None else column[rows]
+
+        # State features: same expressions as get_context_features
+        time_of_day_map = {'breakfast': 0, 'lunch': 1, 'dinner': 2, 'midnight': 3}
+        time_encoded = time_of_day_map.get(state.get('time_of_day', 'lunch'), 1)
+        day_of_week = state.get('day_of_week', 0)  # 0-6
+        
+        calories_today = state.get('calories_today', 0)
+        calorie_budget = state.get('calorie_budget', 2200)
+        calorie_budget_remaining = max(0, calorie_budget - calories_today) / calorie_budget
+        
+        macros_today = state.get('macros_today', {})
+        protein_remaining = max(0, state.get('protein_goal', 100) - macros_today.get('protein', 0)) / 100
+        carbs_remaining = max(0, state.get('carbs_goal', 200) - macros_today.get('carbs', 0)) / 200
+        fat_remaining = max(0, state.get('fat_goal', 70) - macros_today.get('fat', 0)) / 70
+        
+        favorite_cuisines = [c.lower() for c in state.get('favorite_cuisines', [])]
+        favorite_dining_halls = [h.lower() for h in state.get('favorite_dining_halls', [])]
+        recent_meals = [r.lower() for r in state.get('recent_meals', [])]
+        allergens = [a.lower() for a in state.get('allergens', [])]
+        user_vegetarian = 1.0 if 'vegetarian' in [r.lower() for r in state.get('dietary_restrictions', [])] else 0.0
+        ideal_meal_calories = calorie_budget_remaining * calorie_budget / 3  # assume 3 meals
+
+        calories = take(columns['calories'])
+
+        features[:, 0] = time_encoded / 3.0
+        features[:, 1] = day_of_week / 6.0
+        features[:, 2] = calorie_budget_remaining
+        features[:, 3] = protein_remaining
+        features[:, 4] = carbs_remaining
+        features[:, 5] = fat_remaining
+        features[:, 6] = calories / 1000
+        features[:, 7] = take(columns['protein']) / 50
+        features[:, 8] = take(columns['carbs']) / 100
+        features[:, 9] = take(columns['fat']) / 35
+        features[:, 10] = _text_match(columns['cuisine'], rows,
+                                      lambda v: any(c in v for c in favorite_cuisines)) if favorite_cuisines else 0.0
+        features[:, 11] = _text_match(columns['location'], rows,
+                                      lambda v: any(h in v for h in favorite_dining_halls)) if favorite_dining_halls else 0.0
+        features[:, 12] = _text_match(columns['name'], rows,
+                                      lambda v: any(r in v or v in r for r in recent_meals)) if recent_meals else 0.0
+        features[:, 13] = take(columns['is_grill'])
+        features[:, 14] = take(columns['is_international'])
+        features[:, 15] = take(columns['is_comfort'])
+        features[:, 16] = take(columns['is_salad'])
+        features[:, 17] = _text_match(columns['allergens'], rows,
+                                      lambda v: any(a in v for a in allergens)) if allergens else 0.0
+        features[:, 18] = (take(columns['is_vegetarian']) == user_vegetarian).astype(np.float64)
+        features[:, 19] = np.abs(calories - ideal_meal_calories) / 1000
+        features[:, 20] = take(columns['high_protein'])
+        return features
+    
     def recommend_meals(self, state: Dict, available_meals: List[Dict], n_recommendations: int = 5) -> List[Dict]:
         """
         Recommend top N meals using epsilon-greedy strategy.
@@ -175,13 +549,12 @@ class MealRecommenderBandit:
         try:
             # Exploration: random recommendations
             # Ensure model flag reflects actual fittedness
-            if SKLEARN_AVAILABLE and self.model and self.is_trained:
-                try:
-                    # verify model is actually fitted
-                    check_is_fitted(self.model)
-                except Exception:
-                    # model isn't actually fitted — force exploration
-                    self.is_trained = False
+            if self.is_trained and not _is_fitted(self.model):
+                # model isn't actually fitted — force exploration
+                self.is_trained = False
+            elif not self.is_trained and isinstance(self.model, OnlineRidgeModel) and self.model.has_prior():
+                # New hierarchical users start from the population model
+                self.is_trained = True
 
             if not self.is_trained or np.random.random() < self.epsilon:
                 selected = np.random.choice(
@@ -189,26 +562,24 @@ class MealRecommenderBandit:
                     size=min(n_recommendations, len(filtered_meals)),
                     replace=False
                 )
-                recommendations = [filtered_meals[i] for i in selected]
+                # Copy: the meal dicts may be shared with a cached meal catalog
+                recommendations = [filtered_meals[i].copy() for i in selected]
             else:
-                # Exploitation: use model to predict rewards
-                predictions = []
-                for meal in filtered_meals:
-                    context = self.get_context_features(state, meal)
-                    try:
-                        predicted_reward = self.model.predict([context])[0]
-                    except Exception:
-                        predicted_reward = 0.0
+                # Exploitation: score every candidate with one batched predict
+                X = self.get_context_features_batch(state, filtered_meals)
+                try:
+                    predicted_rewards = self.model.predict(X)
+                except Exception:
+                    predicted_rewards = np.zeros(len(filtered_meals))
 
-                    # Add meal object with predicted reward
-                    meal_with_score = meal.copy()
+                # Only the top n candidates become response dicts
+                recommendations = []
+                for i in top_k_indices(predicted_rewards, n_recommendations):
+                    predicted_reward = predicted_rewards[i]
+                    meal_with_score = filtered_meals[i].copy()
                     meal_with_score['predicted_reward'] = float(predicted_reward)
                     meal_with_score['confidence_score'] = min(0.99, max(0.1, (predicted_reward + 1) / 2))  # normalize to 0-1
-                    predictions.append(meal_with_score)
-
-                # Sort by predicted reward
-                predictions.sort(key=lambda x: x.get('predicted_reward', 0), reverse=True)
-                recommendations = predictions[:n_recommendations]
+                    recommendations.append(meal_with_score)
         except Exception as e:
             # Defensive fallback: if anything goes wrong with the model (AttributeError from sklearn, etc.)
             # fall back to random exploration so the API remains responsive.
@@ -218,10 +589,10 @@ class MealRecommenderBandit:
                     size=min(n_recommendations, len(filtered_meals)),
                     replace=False
                 )
-                recommendations = [filtered_meals[i] for i in selected]
+                recommendations = [filtered_meals[i].copy() for i in selected]
             except Exception:
                 # As a last resort, return up to n_recommendations first items
-                recommendations = filtered_meals[:n_recommendations]
+                recommendations = [meal.copy() for meal in filtered_meals[:n_recommendations]]
             # Exploitation: use model to predict rewards
             predictions = []
             pass
@@ -237,24 +608,7 @@ class MealRecommenderBandit:
     
     def _filter_meals(self, meals: List[Dict], state: Dict) -> List[Dict]:
         """Filter meals based on dietary restrictions and allergens."""
-        filtered = []
-        allergens = [a.lower() for a in state.get('allergens', [])]
-        dietary_restrictions = [r.lower() for r in state.get('dietary_restrictions', [])]
-        
-        for meal in meals:
-            # Check allergens
-            meal_allergens = meal.get('allergens', '').lower()
-            if any(allergen in meal_allergens for allergen in allergens):
-                continue  # Skip meals with user's allergens
-            
-            # Check dietary restrictions
-            meal_clean_diet = meal.get('clean_diet', '').lower()
-            if 'vegetarian' in dietary_restrictions and 'vegetarian' not in meal_clean_diet and 'plant' not in meal_clean_diet:
-                continue
-            
-            filtered.append(meal)
-        
-        return filtered
+        return filter_meals(meals, state)
     
     def _generate_reasoning(self, state: Dict, meal: Dict) -> str:
         """Generate human-readable reasoning for recommendation."""
@@ -296,12 +650,15 @@ class MealRecommenderBandit:
         
         return ", ".join(reasons[:3])
     
-    def update(self, state: Dict, meal: Dict, reward: float):
+    def update(self, state: Dict, meal: Dict, reward: float, train: bool = True):
         """
         Update model with new feedback.
+        With train=False the sample is only recorded; call train() later to
+        fold several pending samples into the model at once.
         """
         context = self.get_context_features(state, meal)
         self.meal_history.append((context, reward))
+        self.samples_seen += 1
         
         # Update preferences based on positive feedback
         if reward > 0.3:
@@ -321,49 +678,132 @@ class MealRecommenderBandit:
             if location and location not in self.preferences['favorite_dining_halls']:
                 self.preferences['favorite_dining_halls'].append(location)
         
-        # Retrain model periodically
-        if len(self.meal_history) >= 5:  # minimum data needed
-            try:
-                X = np.array([h[0] for h in self.meal_history])
-                y = np.array([h[1] for h in self.meal_history])
-                
-                if SKLEARN_AVAILABLE and self.model:
-                    # Fit the model and verify it's actually trained before flipping the flag
-                    try:
-                        self.model.fit(X, y)
-                        try:
-                            check_is_fitted(self.model)
-                            self.is_trained = True
-                        except Exception:
-                            # If the model still isn't fitted (rare), keep flag False
-                            self.is_trained = False
-                    except Exception as fit_err:
-                        # If fitting raises an AttributeError or other sklearn-related error,
-                        # recreate the model so we don't keep a broken estimator around.
-                        print(f"Error training model: {fit_err}")
-                        try:
-                            # attempt to recreate a fresh estimator
-                            self.model = RandomForestRegressor(
-                                n_estimators=50,
-                                max_depth=10,
-                                random_state=42,
-                                n_jobs=-1
-                            )
-                        except Exception:
-                            # If recreation fails, null it out to force cold-start behavior
-                            self.model = None
-                        self.is_trained = False
-            except Exception as e:
-                print(f"Error training model: {e}")
+        if train:
+            self.train()
         
         # Update statistics
-        self.preferences['meals_logged'] = len(self.meal_history)
+        self.preferences['meals_logged'] = self.samples_seen
         if meal.get('calories'):
             # Update average calories
             all_calories = [m.get('calories', 0) for _, m, _ in [(None, meal, reward)] if m.get('calories')]
             if all_calories:
                 self.preferences['typical_meal_calories'] = np.mean(all_calories)
     
+    def _new_model(self):
+        if self.model_type == 'linucb':
+            return OnlineRidgeModel()
+        if self.model_type == 'hierarchical':
+            from population_model import ResidualHeadModel
+            return ResidualHeadModel()
+        if SKLEARN_AVAILABLE:
+            return RandomForestRegressor(
+                n_estimators=50,
+                max_depth=10,
+                random_state=42,
+                n_jobs=-1
+            )
+        return None
+
+    def pending_samples(self) -> int:
+        """Feedbacks recorded but not yet folded into the model."""
+        return len(self.meal_history) - self.trained_samples
+
+    def train(self, force: bool = False):
+        """
+        Fold pending feedback into the model.
+        linucb / hierarchical: one rank-one update per pending sample (a
+        hierarchical head is first refit from history if the population model
+        changed since it was fitted, and scores all pending samples with the
+        population model in one batch).
+        forest: refit on the full history once retrain_every samples are pending
+        (or the model has never been fitted, or force=True).
+        Afterwards the history retention policy drops surplus trained samples.
+        """
+        if force:
+            self.refit()
+        elif isinstance(self.model, OnlineRidgeModel):
+            if self.model.is_stale() and self.trained_samples:
+                self.refit()
+            pending = self.meal_history[self.trained_samples:]
+            if pending:
+                self.model.partial_fit_many(np.array([context for context, _ in pending], dtype=np.float64),
+                                            [reward for _, reward in pending])
+            self.trained_samples = len(self.meal_history)
+            self.is_trained = self.samples_seen >= MIN_TRAINING_SAMPLES or self.model.has_prior()
+        elif len(self.meal_history) >= MIN_TRAINING_SAMPLES and (
+                not self.is_trained or self.pending_samples() >= self.retrain_every):
+            self.refit()
+        self._apply_retention()
+
+    def _apply_retention(self):
+        """
+        Bound meal_history to history_size samples (window or reservoir mode).
+        Only samples already folded into the model are dropped, so pending
+        samples always reach the next train().
+        """
+        trained = self.trained_samples
+        if self.history_mode == 'all' or trained <= self.history_size:
+            return
+        pending = self.meal_history[trained:]
+        if self.history_mode == 'window':
+            kept = self.meal_history[trained - self.history_size:trained]
+        else:
+            # Algorithm R, applied lazily: samples past the reservoir replace a
+            # random slot with probability history_size / (their stream index + 1)
+            kept = self.meal_history[:self.history_size]
+            first = self.samples_seen - len(self.meal_history) + self.history_size
+            rng = random.Random(zlib.crc32(self.user_id.encode('utf-8')) + self.samples_seen)
+            for offset, sample in enumerate(self.meal_history[self.history_size:trained]):
+                slot = rng.randint(0, first + offset)
+                if slot < self.history_size:
+                    kept[slot] = sample
+        self.meal_history = kept + pending
+        self.trained_samples = len(kept)
+
+    def sample_weights(self) -> Optional[np.ndarray]:
+        """Refit weights: history_decay ** age, newest sample = 1 (None when not decaying)."""
+        if self.history_decay >= 1.0 or not self.meal_history:
+            return None
+        ages = np.arange(len(self.meal_history) - 1, -1, -1, dtype=np.float64)
+        return np.power(self.history_decay, ages)
+
+    def refit(self):
+        """Retrain the model from scratch on the full history."""
+        if len(self.meal_history) < MIN_TRAINING_SAMPLES:  # minimum data needed
+            return
+        try:
+            X = np.array([h[0] for h in self.meal_history])
+            y = np.array([h[1] for h in self.meal_history])
+            
+            if self.model is not None:
+                # Fit the model and verify it's actually trained before flipping the flag
+                try:
+                    # Fit a fresh estimator and swap it in, so concurrent
+                    # recommend calls keep using the old one until it is ready
+                    model = self._new_model()
+                    weights = self.sample_weights()
+                    if weights is None:
+                        model.fit(X, y)
+                    else:
+                        model.fit(X, y, sample_weight=weights)
+                    self.model = model
+                    self.trained_samples = len(self.meal_history)
+                    # If the model still isn't fitted (rare), keep flag False
+                    self.is_trained = _is_fitted(self.model)
+                except Exception as fit_err:
+                    # If fitting raises an AttributeError or other sklearn-related error,
+                    # recreate the model so we don't keep a broken estimator around.
+                    print(f"Error training model: {fit_err}")
+                    try:
+                        # attempt to recreate a fresh estimator
+                        self.model = self._new_model()
+                    except Exception:
+                        # If recreation fails, null it out to force cold-start behavior
+                        self.model = None
+                    self.is_trained = False
+        except Exception as e:
+            print(f"Error training model: {e}")
+
     def decay_epsilon(self):
         """Reduce exploration over time."""
         self.epsilon = max(self.epsilon_min, self.epsilon * self.epsilon_decay)
@@ -381,73 +821,220 @@ class MealRecommenderBandit:
             'exploration_rate': self.epsilon
         }
     
-    def save(self, filepath: str):
-        """Save model to disk."""
-        data = {
+    def history_matrix(self) -> np.ndarray:
+        """meal_history as one float32 array: the context features, then the reward."""
+        matrix = np.empty((len(self.meal_history), N_CONTEXT_FEATURES + 1), dtype=np.float32)
+        if self.meal_history:
+            matrix[:, :-1] = [context for context, _ in self.meal_history]
+            matrix[:, -1] = [reward for _, reward in self.meal_history]
+        return matrix
+
+    def to_record(self) -> Tuple[Dict, np.ndarray, Optional[bytes]]:
+        """
+        The saved form of the bandit, independent of where it is stored:
+        (JSON-serializable header, float32 history matrix, compressed model
+        bytes or None if there is no fitted model).
+        """
+        header = {
+            'format_version': MODEL_FORMAT_VERSION,
             'user_id': self.user_id,
             'epsilon': self.epsilon,
-            'meal_history': [(ctx.tolist() if isinstance(ctx, np.ndarray) else ctx, r) for ctx, r in self.meal_history],
             'preferences': self.preferences,
-            'is_trained': self.is_trained
+            'is_trained': self.is_trained,
+            'model_type': self.model_type,
+            'trained_samples': self.trained_samples,
+            'samples_seen': self.samples_seen,
+            'n_history': len(self.meal_history),
+            'n_features': N_CONTEXT_FEATURES
         }
-        
-        # Save model if available
-        if SKLEARN_AVAILABLE and self.model and self.is_trained:
-            # double-check the estimator is fitted before saving
+        model_blob = None
+        if self.is_trained and _is_fitted(self.model):
             try:
-                check_is_fitted(self.model)
-                model_path = filepath.replace('.json', '_model.pkl')
-                with open(model_path, 'wb') as f:
-                    pickle.dump(self.model, f)
-                data['model_path'] = model_path
-            except Exception:
-                # Do not write a model_path if the model isn't actually fitted
-                data.pop('model_path', None)
-        
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
-    
-    @classmethod
-    def load(cls, filepath: str):
-        """Load model from disk."""
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        
-        user_id = data['user_id']
-        epsilon = data.get('epsilon', 0.15)
+                model_blob = zlib.compress(pickle.dumps(self.model, protocol=5), MODEL_COMPRESS)
+            except Exception as e:
+                print(f"Error saving model: {e}")
+        return header, self.history_matrix(), model_blob
 
-        bandit = cls(user_id, epsilon=epsilon)
-        bandit.epsilon = data.get('epsilon', 0.15)
-        bandit.preferences = data.get('preferences', bandit.preferences)
-        bandit.is_trained = data.get('is_trained', False)
+    @classmethod
+    def from_record(cls, header: Dict, history: Optional[np.ndarray], model_blob: Optional[bytes] = None,
+                    model_type: Optional[str] = None):
+        """
+        Rebuild a bandit from to_record() output.
+        If the deployment's model type (or `model_type`) differs from the saved
+        one, a fresh model of the new type is trained on the saved history.
+        """
+        bandit = cls(header['user_id'], epsilon=header.get('epsilon', 0.15), model_type=model_type)
+        bandit.preferences = header.get('preferences', bandit.preferences)
+        bandit.is_trained = False
 
-        # Restore meal history
-        meal_history = data.get('meal_history', [])
-        bandit.meal_history = [(np.array(ctx), r) for ctx, r in meal_history]
+        # Restore meal history (memory-mapped rows stay views into the file)
+        if history is not None and len(history):
+            contexts = history[:, :-1] if isinstance(history, np.memmap) else history[:, :-1].astype(np.float64)
+            bandit.meal_history = list(zip(contexts, history[:, -1].tolist()))
+        bandit.samples_seen = max(header.get('samples_seen', 0), len(bandit.meal_history))
 
         # Load model if available and ensure it's actually fitted
-        if SKLEARN_AVAILABLE and data.get('model_path') and os.path.exists(data['model_path']):
+        if model_blob and header.get('model_type', 'forest') == bandit.model_type:
             try:
-                with open(data['model_path'], 'rb') as f:
-                    bandit.model = pickle.load(f)
-                try:
-                    check_is_fitted(bandit.model)
+                compressed = header.get('format_version', 1) >= 2
+                model = pickle.loads(zlib.decompress(model_blob) if compressed else model_blob)
+                if _is_fitted(model):
+                    bandit.model = model
                     bandit.is_trained = True
-                except Exception:
-                    # Loaded model is not fitted — treat as untrained
-                    bandit.is_trained = False
-                    # Recreate a fresh model instance so future training is clean
-                    bandit.model = RandomForestRegressor(
-                        n_estimators=50,
-                        max_depth=10,
-                        random_state=42,
-                        n_jobs=-1
-                    )
+                    bandit.trained_samples = header.get('trained_samples', len(bandit.meal_history))
+                # Otherwise keep the fresh model instance so future training is clean
             except Exception as e:
                 print(f"Error loading model: {e}")
 
+        if not bandit.is_trained:
+            # Model type changed, or the saved estimator was unusable
+            bandit.train(force=True)
+        else:
+            # The retention settings may be tighter than when it was saved
+            bandit._apply_retention()
+
         return bandit
 
+    def save(self, filepath: str):
+        """
+        Save model to disk.
+        filepath holds a small versioned JSON header. Next to it go
+        <name>_history.<version>.npy (float32 history matrix, memory-mappable)
+        and <name>_model.<version>.pkl.z (zlib-compressed protocol-5 pickle of
+        the estimator). The data files are new on every save and the header is
+        replaced last, so it only ever names complete files of one save.
+        """
+        write_model_files(filepath, *self.to_record())
+    
+    @classmethod
+    def load(cls, filepath: str, model_type: Optional[str] = None, mmap: bool = False):
+        """
+        Load model from disk (current or original format).
+        With mmap=True the history rows are views into a memory-mapped .npy
+        instead of being read into memory (useful for batch jobs over many users).
+        """
+        return cls.from_record(*read_model_files(filepath, mmap=mmap), model_type=model_type)
+
+
+# ---------------- Model files ---------------------------------------------
+# Attempts at reading a record whose data files a concurrent save just replaced
+READ_ATTEMPTS = 3
+
+
+def _model_base(filepath: str) -> str:
+    return filepath[:-len('.json')] if filepath.endswith('.json') else filepath
+
+
+def _referenced_files(filepath: str) -> List[str]:
+    """Data files named by the header currently at filepath (none if it is missing or unreadable)."""
+    try:
+        with open(filepath, 'r') as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return []
+    directory = os.path.dirname(filepath)
+    paths = [os.path.join(directory, header[key]) for key in ('history_file', 'model_file') if header.get(key)]
+    if header.get('model_path'):
+        paths.append(header['model_path'])
+    return paths
+
+
+def model_file_paths(filepath: str) -> List[str]:
+    """
+    Every file of a bandit record that exists on disk: the header, the data
+    files it names, and data files of other versions (e.g. left by a save
+    that crashed before its header was written).
+    """
+    base = glob.escape(_model_base(filepath))
+    version = '[0-9a-f]' * 12
+    paths = [filepath] + _referenced_files(filepath)
+    paths += glob.glob(f"{base}_history.{version}.npy") + glob.glob(f"{base}_model.{version}.pkl.z")
+    paths += [f"{_model_base(filepath)}{suffix}" for suffix in ('_history.npy', '_model.pkl.z', '_model.pkl')]
+    return [path for path in dict.fromkeys(paths) if os.path.exists(path)]
+
+
+def write_model_files(filepath: str, header: Dict, history: np.ndarray, model_blob: Optional[bytes]):
+    """
+    Write a bandit record as <name>.json + <name>_history.<version>.npy +
+    <name>_model.<version>.pkl.z. The data files get new names on every save
+    and the header names them, so replacing the header is the one commit
+    point: readers see either the old record or the new one, never a mix.
+    The previous version's files are removed afterwards.
+    """
+    base = _model_base(filepath)
+    header = {k: v for k, v in header.items() if k not in ('history_file', 'model_file', 'model_path')}
+    previous = _referenced_files(filepath)
+    version = os.urandom(6).hex()
+
+    history_path = f"{base}_history.{version}.npy"
+    with open(history_path, 'wb') as f:
+        np.save(f, history)
+    header['history_file'] = os.path.basename(history_path)
+    written = {history_path}
+
+    if model_blob is not None:
+        model_path = f"{base}_model.{version}.pkl.z"
+        with open(model_path, 'wb') as f:
+            f.write(model_blob)
+        header['model_file'] = os.path.basename(model_path)
+        written.add(model_path)
+
+    # Write-then-rename so readers never see a partially written header
+    with open(f"{filepath}.tmp", 'w') as f:
+        json.dump(header, f)
+    os.replace(f"{filepath}.tmp", filepath)
+
+    # Superseded files: the last version, or the original format's pickle
+    for path in previous:
+        if path not in written:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def read_model_files(filepath: str, mmap: bool = False) -> Tuple[Dict, Optional[np.ndarray], Optional[bytes]]:
+    """
+    Read a bandit record written by write_model_files, or by the original save format.
+    If a concurrent save removed the data files the header named, the new header is read.
+    """
+    for attempt in range(READ_ATTEMPTS):
+        try:
+            return _read_model_files(filepath, mmap)
+        except FileNotFoundError:
+            if attempt == READ_ATTEMPTS - 1 or not os.path.exists(filepath):
+                raise
+
+
+def _read_model_files(filepath: str, mmap: bool) -> Tuple[Dict, Optional[np.ndarray], Optional[bytes]]:
+    with open(filepath, 'r') as f:
+        header = json.load(f)
+    directory = os.path.dirname(filepath)
+
+    model_blob = None
+    if header.get('format_version', 1) >= 2:
+        history = None
+        if header.get('n_history') and header.get('history_file'):
+            history = np.load(os.path.join(directory, header['history_file']), mmap_mode='r' if mmap else None)
+        if header.get('model_file'):
+            with open(os.path.join(directory, header['model_file']), 'rb') as f:
+                model_blob = f.read()
+    else:
+        # Original format: history inline as JSON lists, plain pickled estimator
+        history = np.array([list(ctx) + [r] for ctx, r in header.pop('meal_history', [])], dtype=np.float64)
+        model_path = header.pop('model_path', None)
+        if model_path and os.path.exists(model_path):
+            with open(model_path, 'rb') as f:
+                model_blob = f.read()
+
+    if header.get('format_version', 1) < MODEL_FORMAT_VERSION:
+        # Normalize so the record can be written by any store as-is
+        header.update(format_version=MODEL_FORMAT_VERSION, n_history=len(history), n_features=N_CONTEXT_FEATURES)
+        header.setdefault('trained_samples', len(history) if header.get('is_trained') else 0)
+        if model_blob is not None:
+            model_blob = zlib.compress(model_blob, MODEL_COMPRESS)
+    return header, history, model_blob
+
 
 def calculate_reward(feedback: Dict, state: Dict, meal: Dict) -> float:
     """
@@ -513,66 +1100,56 @@ def calculate_reward(feedback: Dict, state: Dict, meal: Dict) -> float:
     return np.clip(reward, -1.0, 1.0)
 
 
-def cold_start_recommendations(user_state: Dict, available_meals: List[Dict], n: int = 5) -> List[Dict]:
+def _nutrition_columns(meals: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(calories, protein, carbs, fat) arrays: catalog columns for a CatalogView, built for a list."""
+    if isinstance(meals, CatalogView):
+        catalog, rows = meals.catalog, meals.rows
+        return catalog.calories[rows], catalog.protein[rows], catalog.carbs[rows], catalog.fat[rows]
+    return tuple(np.array([m.get(key, 0) for m in meals], dtype=np.float64)
+                 for key in ('calories', 'protein', 'carbs', 'fat'))
+
+
+def cold_start_scores(user_state: Dict, meals: List[Dict], weights: Optional[Dict] = None) -> np.ndarray:
+    """
+    Heuristic score per meal (higher is better), as array expressions:
+      calorie match    calorie_match - |calories - target| / calorie_scale, floored at 0,
+                       target = a third of the remaining calorie budget
+      high protein     + high_protein if the user has a high protein goal and
+                       protein / calories > protein_ratio
+      balanced macros  + balanced_macros if protein, carbs and fat are all > 0
+    weights overrides any of COLD_START_WEIGHTS.
+    """
+    w = dict(COLD_START_WEIGHTS, **(weights or {}))
+    calories, protein, carbs, fat = _nutrition_columns(meals)
+
+    calorie_budget = user_state.get('calorie_budget', 2200)
+    calories_today = user_state.get('calories_today', 0)
+    target_cal = (calorie_budget - calories_today) / 3
+
+    scores = np.maximum(0, w['calorie_match'] - np.abs(calories - target_cal) / w['calorie_scale'])
+    if user_state.get('high_protein_goal', False):
+        scores = scores + np.where(protein / np.maximum(calories, 1) > w['protein_ratio'], w['high_protein'], 0)
+    scores = scores + np.where((protein > 0) & (carbs > 0) & (fat > 0), w['balanced_macros'], 0)
+    return scores
+
+
+def cold_start_recommendations(user_state: Dict, available_meals: List[Dict], n: int = 5,
+                               weights: Optional[Dict] = None) -> List[Dict]:
     """
     Recommendations for users with no history.
-    Use simple heuristics until we have data.
+    Use simple heuristics until we have data (see cold_start_scores).
     """
     if not available_meals:
         return []
     
     # Filter by dietary restrictions
-    filtered = []
-    allergens = [a.lower() for a in user_state.get('allergens', [])]
-    dietary_restrictions = [r.lower() for r in user_state.get('dietary_restrictions', [])]
-    
-    for meal in available_meals:
-        # Check allergens
-        meal_allergens = meal.get('allergens', '').lower()
-        if any(allergen in meal_allergens for allergen in allergens):
-            continue
-        
-        # Check dietary restrictions
-        meal_clean_diet = meal.get('clean_diet', '').lower()
-        if 'vegetarian' in dietary_restrictions and 'vegetarian' not in meal_clean_diet and 'plant' not in meal_clean_diet:
-            continue
-        
-        filtered.append(meal)
+    filtered = filter_meals(available_meals, user_state)
     
     if not filtered:
         return []
     
-    # Score meals
-    calorie_budget = user_state.get('calorie_budget', 2200)
-    calories_today = user_state.get('calories_today', 0)
-    target_cal = (calorie_budget - calories_today) / 3
-    
-    scored = []
-    for meal in filtered:
-        score = 0
-        
-        # Match calorie target
-        cal_diff = abs(meal.get('calories', 0) - target_cal)
-        score += max(0, 100 - cal_diff / 10)
-        
-        # High protein bonus if user wants it
-        if user_state.get('high_protein_goal', False):
-            protein_ratio = meal.get('protein', 0) / max(meal.get('calories', 1), 1)
-            if protein_ratio > 0.25:
-                score += 20
-        
-        # Variety bonus (different stations)
-        # Popularity bonus (balanced nutrition)
-        protein = meal.get('protein', 0)
-        carbs = meal.get('carbs', 0)
-        fat = meal.get('fat', 0)
-        if protein > 0 and carbs > 0 and fat > 0:
-            score += 10
-        
-        scored.append((meal, score))
-    
-    scored.sort(key=lambda x: x[1], reverse=True)
-    recommendations = [meal.copy() for meal, _ in scored[:n]]
+    scores = cold_start_scores(user_state, filtered, weights)
+    recommendations = [filtered[i].copy() for i in top_k_indices(scores, n)]
     
     # Add metadata
     for i, rec in enumerate(recommendations):
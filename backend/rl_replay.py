@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+RL Replay Harness
+-----------------
+Offline evaluation of MealRecommenderBandit on a logged feedback stream.
+
+Every event (user_state, meal, feedback) is replayed in order through the
+user's bandit, the same way the live service handles it:
+
+  1. the bandit scores the event's candidate meals (recommend_meals is timed
+     as "recommend" latency)
+  2. off-policy estimates are accumulated for the bandit's current
+     epsilon-greedy policy against the logging policy:
+       IPS    r * pi(a|x) / p(a|x)
+       SNIPS  self-normalized IPS
+       DM     sum_a pi(a|x) * q(x, a)               (q = the bandit's own reward model;
+                                                    optimistic for linucb, which adds its bonus)
+       DR     DM + pi(a|x) / p(a|x) * (r - q(x, a))
+  3. the reward from calculate_reward is fed back with update() +
+     decay_epsilon() + train() (timed as "update" latency)
+
+so each event is scored by a model that has not seen it yet (progressive
+validation). IPS and DR are also reported for each user's first
+EARLY_EVENTS events alone, where a cold model matters most. The report also
+has events/s and bytes per user, in memory and as saved by to_record().
+
+For --model-type hierarchical the population model starts empty and is
+refit on every replayed user's history each --population-every events,
+as the server's periodic retrain would.
+
+Events come from a synthetic generator (users with hidden tastes, a uniform
+random logging policy over a slate of candidates) or a FeedbackJournal
+directory. Journal entries that carry 'candidates' and 'propensity' (the
+synthetic generator can write them with --write-journal) are replayed
+exactly; for entries recorded by the server, which log neither, the
+candidates are every distinct meal in the journal and logging is assumed
+uniform over them.
+
+Usage:
+  python3 rl_replay.py                                   # synthetic log
+  python3 rl_replay.py --users 50 --events 40 --model-type linucb
+  python3 rl_replay.py --journal user_models/feedback_journal
+  python3 rl_replay.py --write-journal /tmp/replay_journal   # save the synthetic log
+  python3 rl_replay.py --history-mode window --history-size 50
+  python3 rl_replay.py --compare-history --events 200        # every retention policy on one log
+"""
+
+import argparse
+import json
+import pickle
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from feedback_journal import FeedbackJournal
+from population_model import get_population_model
+from rl_recommender import (DEFAULT_MODEL_TYPE, HISTORY_MODES, MODEL_TYPES, MealRecommenderBandit, _is_fitted,
+                            calculate_reward)
+from synthetic_data import CUISINES, sample_state, synthetic_meals
+
+# Candidate meals the logging policy chooses from per synthetic event
+DEFAULT_SLATE_SIZE = 20
+
+# Recommendations requested per event when timing recommend_meals
+DEFAULT_K = 5
+
+# A user's first this-many events count as "early" in the report
+EARLY_EVENTS = 10
+
+# Hierarchical replays refit the population model every this many events
+DEFAULT_POPULATION_EVERY = 200
+
+STATIONS = ('grill', 'world', 'comfort', 'salad', 'pasta', 'deli')
+
+# (label, history_mode, history_decay) runs for --compare-history
+HISTORY_COMPARISON = (
+    ('all', 'all', 1.0),
+    ('window', 'window', 1.0),
+    ('reservoir', 'reservoir', 1.0),
+    ('all+decay', 'all', 0.98),
+    ('window+decay', 'window', 0.98)
+)
+
+
+# ---------------- Event sources ------------------------------------------
+def _synthetic_user(rng: random.Random, index: int) -> Dict[str, Any]:
+    """Hidden taste of one simulated user."""
+    return {
+        'user_id': f"replay_user_{index}",
+        'cuisine': rng.choice([c for c in CUISINES if c]),
+        'station': rng.choice(STATIONS),
+        'meal_calories': rng.uniform(300, 900),
+        'high_protein_goal': rng.random() < 0.3
+    }
+
+
+def _synthetic_feedback(rng: random.Random, user: Dict, meal: Dict) -> Dict[str, Any]:
+    """Feedback from the user's hidden utility for a meal (plus noise)."""
+    utility = (0.8 * (meal.get('cuisine_type') == user['cuisine'])
+               + 0.6 * (user['station'] in meal.get('category', '').lower())
+               - abs(meal.get('calories', 0) - user['meal_calories']) / 500
+               + rng.gauss(0, 0.3))
+    ate_meal = utility > -0.3
+    liked = True if utility > 0.6 else (False if utility < -0.6 else None)
+    rating = int(min(5, max(1, round(3 + 2 * utility)))) if ate_meal else 0
+    return {'ate_meal': ate_meal, 'liked': liked, 'rating': rating}
+
+
+def synthetic_events(n_users: int = 20, events_per_user: int = 30, n_meals: int = 300,
+                     slate_size: int = DEFAULT_SLATE_SIZE, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Journal-shaped events from simulated users, interleaved across users in
+    time order. The logging policy picks uniformly from a random slate of
+    candidates (after allergen filtering), so each event records its
+    'candidates' and the logged meal's 'propensity'.
+    """
+    rng = random.Random(seed)
+    catalog = synthetic_meals(n_meals, seed=seed)
+    screen = MealRecommenderBandit('replay_filter', model_type='linucb')
+    users = [_synthetic_user(rng, i) for i in range(n_users)]
+
+    events = []
+    for step in range(events_per_user):
+        for user in users:
+            state = sample_state(rng.randrange(1 << 30))
+            state['favorite_cuisines'] = [user['cuisine']]
+            state['high_protein_goal'] = user['high_protein_goal']
+            slate = screen._filter_meals(rng.sample(catalog, min(slate_size, len(catalog))), state)
+            if not slate:
+                continue
+            meal = rng.choice(slate)
+            events.append({
+                'timestamp': step,
+                'user_id': user['user_id'],
+                'meal': meal,
+                'user_state': state,
+                'feedback': _synthetic_feedback(rng, user, meal),
+                'candidates': slate,
+                'propensity': 1.0 / len(slate)
+            })
+    return events
+
+
+def journal_events(directory: str, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Events from a FeedbackJournal. Entries without candidates get every
+    distinct meal in the journal, with uniform logging propensity.
+    """
+    journal = FeedbackJournal(directory)
+    try:
+        events = [e for e in journal.iter_entries(user_id) if e.get('meal') and 'feedback' in e]
+    finally:
+        journal.close()
+
+    pool = {}
+    for event in events:
+        pool.setdefault(event['meal'].get('name', ''), event['meal'])
+    pool = list(pool.values())
+    for event in events:
+        if not event.get('candidates'):
+            event['candidates'] = pool
+            event['propensity'] = 1.0 / len(pool)
+    return events
+
+
+# ---------------- Replay -------------------------------------------------
+def _latency_ms(seconds: List[float]) -> Dict[str, Optional[float]]:
+    if not seconds:
+        return {'p50': None, 'p99': None, 'max': None}
+    p50, p99 = np.percentile(seconds, [50, 99]) * 1000
+    return {'p50': round(float(p50), 3), 'p99': round(float(p99), 3), 'max': round(max(seconds) * 1000, 3)}
+
+
+def _estimate(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {'value': None, 'stderr': None}
+    values = np.asarray(values)
+    stderr = values.std(ddof=1) / np.sqrt(len(values)) if len(values) > 1 else 0.0
+    return {'value': round(float(values.mean()), 4), 'stderr': round(float(stderr), 4)}
+
+
+def _bytes_per_user(bandits: Iterable[MealRecommenderBandit]) -> Dict[str, Optional[float]]:
+    in_memory, saved, history_rows = [], [], []
+    for bandit in bandits:
+        in_memory.append(len(pickle.dumps(bandit, protocol=5)))
+        header, history, model_blob = bandit.to_record()
+        saved.append(len(json.dumps(header)) + history.nbytes + len(model_blob or b''))
+        history_rows.append(len(bandit.meal_history))
+    if not saved:
+        return {'in_memory_mean': None, 'saved_mean': None, 'saved_max': None, 'history_rows_mean': None}
+    return {'in_memory_mean': round(float(np.mean(in_memory))), 'saved_mean': round(float(np.mean(saved))),
+            'saved_max': int(max(saved)), 'history_rows_mean': round(float(np.mean(history_rows)), 1)}
+
+
+def replay(events: Iterable[Dict[str, Any]], make_bandit: Optional[Callable[[str], MealRecommenderBandit]] = None,
+           k: int = DEFAULT_K, seed: int = 0, population_every: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Replay events in order and return the evaluation report.
+    make_bandit(user_id) builds a new user's bandit (default: the deployment's).
+    population_every: refit the shared population model (used by hierarchical
+    bandits) on all replayed histories every this many events.
+    """
+    make_bandit = make_bandit or (lambda user_id: MealRecommenderBandit(user_id))
+    np.random.seed(seed)
+    population = get_population_model() if population_every else None
+    if population is not None:
+        population.reset()
+
+    bandits = {}
+    recommend_s, update_s = [], []
+    logged, ips, dm, dr, weights = [], [], [], [], []
+    early_ips, early_dr = [], []
+    matches = 0
+    started = time.perf_counter()
+
+    for n, event in enumerate(events):
+        if population is not None and n and n % population_every == 0:
+            population.fit_histories(b.history_matrix() for b in bandits.values())
+
+        user_id = event.get('user_id', 'default_user')
+        state = event.get('user_state') or {}
+        meal = event['meal']
+        bandit = bandits.get(user_id)
+        if bandit is None:
+            bandit = bandits[user_id] = make_bandit(user_id)
+        reward = float(calculate_reward(event['feedback'], state, meal))
+
+        candidates = event['candidates']
+        t0 = time.perf_counter()
+        bandit.recommend_meals(state, candidates, k)
+        recommend_s.append(time.perf_counter() - t0)
+
+        # The evaluated policy: epsilon-greedy on the bandit's predicted reward
+        allowed = bandit._filter_meals(list(candidates), state)
+        if allowed:
+            q = np.zeros(len(allowed))
+            trained = bandit.is_trained and _is_fitted(bandit.model)
+            if trained:
+                q = np.asarray(bandit.model.predict(bandit.get_context_features_batch(state, allowed)), dtype=float)
+            explore = bandit.epsilon if trained else 1.0
+            pi = np.full(len(allowed), explore / len(allowed))
+            best = int(np.argmax(q))
+            pi[best] += 1.0 - explore
+
+            names = [m.get('name') for m in allowed]
+            position = names.index(meal.get('name')) if meal.get('name') in names else None
+            pi_logged = pi[position] if position is not None else 0.0
+            q_logged = q[position] if position is not None else 0.0
+            matches += position == best
+
+            weight = pi_logged / event['propensity']
+            direct = float(pi @ q)
+            logged.append(reward)
+            weights.append(weight)
+            ips.append(weight * reward)
+            dm.append(direct)
+            dr.append(direct + weight * (reward - q_logged))
+            if bandit.samples_seen < EARLY_EVENTS:
+                early_ips.append(ips[-1])
+                early_dr.append(dr[-1])
+
+        t0 = time.perf_counter()
+        bandit.update(state, meal, reward, train=False)
+        bandit.decay_epsilon()
+        bandit.train()
+        update_s.append(time.perf_counter() - t0)
+
+    elapsed = time.perf_counter() - started
+    n_events = len(update_s)
+    snips = float(np.sum(ips) / np.sum(weights)) if weights and np.sum(weights) > 0 else None
+    return {
+        'events': n_events,
+        'users': len(bandits),
+        'model_type': next(iter(bandits.values())).model_type if bandits else None,
+        'seconds': round(elapsed, 3),
+        'events_per_s': round(n_events / elapsed, 1) if elapsed > 0 else None,
+        'recommend_ms': _latency_ms(recommend_s),
+        'update_ms': _latency_ms(update_s),
+        'bytes_per_user': _bytes_per_user(bandits.values()),
+        'estimates': {
+            'logged': _estimate(logged),
+            'ips': _estimate(ips),
+            'snips': {'value': round(snips, 4) if snips is not None else None},
+            'dm': _estimate(dm),
+            'dr': _estimate(dr),
+            'early_ips': _estimate(early_ips),
+            'early_dr': _estimate(early_dr),
+            'greedy_match_rate': round(matches / len(logged), 4) if logged else None
+        }
+    }
+
+
+def print_report(report: Dict[str, Any], label: str = ''):
+    title = f"{label}: " if label else ''
+    print(f"{title}{report['events']} events, {report['users']} users, model_type={report['model_type']}")
+    print(f"  throughput  {report['events_per_s']} events/s ({report['seconds']} s)")
+    for name in ('recommend_ms', 'update_ms'):
+        lat = report[name]
+        print(f"  {name:<11} p50 {lat['p50']}  p99 {lat['p99']}  max {lat['max']}")
+    mem = report['bytes_per_user']
+    print(f"  bytes/user  in memory {mem['in_memory_mean']}  saved {mem['saved_mean']} "
+          f"(max {mem['saved_max']}, {mem['history_rows_mean']} history rows)")
+    est = report['estimates']
+    for name in ('logged', 'ips', 'dm', 'dr', 'early_ips', 'early_dr'):
+        print(f"  {name:<11} {est[name]['value']} +/- {est[name]['stderr']}")
+    print(f"  {'snips':<11} {est['snips']['value']}")
+    print(f"  greedy picks the logged meal {est['greedy_match_rate']}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Replay logged feedback through the bandit and evaluate it offline.")
+    p.add_argument("--journal", help="FeedbackJournal directory to replay (default: a synthetic log)")
+    p.add_argument("--user", help="Only replay this user's events from the journal")
+    p.add_argument("--users", type=int, default=20, help="Synthetic users")
+    p.add_argument("--events", type=int, default=30, help="Synthetic events per user")
+    p.add_argument("--meals", type=int, default=300, help="Synthetic catalog size")
+    p.add_argument("--slate", type=int, default=DEFAULT_SLATE_SIZE, help="Synthetic candidates per event")
+    p.add_argument("--model-type", choices=MODEL_TYPES, help="Bandit model (default: RL_MODEL_TYPE)")
+    p.add_argument("--retrain-every", type=int, help="Forest refit interval (default: RL_RETRAIN_EVERY)")
+    p.add_argument("--history-mode", choices=HISTORY_MODES, help="History retention (default: RL_HISTORY_MODE)")
+    p.add_argument("--history-size", type=int, help="Retained samples per user (default: RL_HISTORY_SIZE)")
+    p.add_argument("--history-decay", type=float, help="Refit weight decay per feedback (default: RL_HISTORY_DECAY)")
+    p.add_argument("--compare-history", action="store_true",
+                   help="Replay the log once per retention policy and print a comparison table")
+    p.add_argument("--population-every", type=int, default=DEFAULT_POPULATION_EVERY,
+                   help="Hierarchical only: refit the population model every N events")
+    p.add_argument("--k", type=int, default=DEFAULT_K, help="Recommendations per recommend call")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--write-journal", metavar="DIR", help="Append the synthetic events to a journal and exit")
+    p.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = p.parse_args()
+
+    if args.journal:
+        events = journal_events(args.journal, args.user)
+    else:
+        events = synthetic_events(args.users, args.events, args.meals, args.slate, args.seed)
+
+    if args.write_journal:
+        journal = FeedbackJournal(args.write_journal)
+        for event in events:
+            journal.append(event)
+        journal.close()
+        print(f"Wrote {len(events)} events to {args.write_journal}")
+        return
+
+    # Resolve the model type as the bandit would, so the RL_MODEL_TYPE default
+    # gets its population refits too
+    model_type = args.model_type or DEFAULT_MODEL_TYPE
+    population_every = args.population_every if model_type == 'hierarchical' else None
+
+    def make_bandit(history_mode=args.history_mode, history_decay=args.history_decay):
+        return lambda user_id: MealRecommenderBandit(
+            user_id, model_type=model_type, retrain_every=args.retrain_every,
+            history_mode=history_mode, history_size=args.history_size, history_decay=history_decay)
+
+    if args.compare_history:
+        print(f"{'retention':>13} {'rows':>6} {'saved KB':>9} {'update p50':>11} {'update p99':>11} "
+              f"{'events/s':>9} {'IPS':>8} {'DR':>8}")
+        for label, mode, decay in HISTORY_COMPARISON:
+            report = replay(events, make_bandit(mode, decay), k=args.k, seed=args.seed,
+                            population_every=population_every)
+            mem, est = report['bytes_per_user'], report['estimates']
+            print(f"{label:>13} {mem['history_rows_mean']:>6} {mem['saved_mean'] / 1024:>9.1f} "
+                  f"{report['update_ms']['p50']:>11} {report['update_ms']['p99']:>11} {report['events_per_s']:>9} "
+                  f"{est['ips']['value']:>8} {est['dr']['value']:>8}")
+        return
+
+    report = replay(events, make_bandit(), k=args.k, seed=args.seed, population_every=population_every)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.journal or 'synthetic')
+
+
+if __name__ == "__main__":
+    main()
@@ -17,14 +17,23 @@ Usage examples:
 """
 
 import argparse
+import copy
+import hashlib
 import json
+import random
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict
+from functools import partial
+from typing import Any, Dict, Optional
+from html.parser import HTMLParser
 from urllib.parse import urlencode
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
 # --- CONFIG ----------------------------------------------------------
 API_BASE = "https://umassdining.com/foodpro-menu-ajax"
@@ -32,6 +41,22 @@ HEADERS = {
     "User-Agent": "umass-menu-scraper/1.0 (+https://umass.edu)"
 }
 DEFAULT_OUTFILE = "umass_menu_parsed.json"
+REQUEST_TIMEOUT = 10
+
+# concurrent fetching: max halls fetched at once, and retry backoff (seconds)
+MAX_FETCH_WORKERS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# HTML parser used for category fragments:
+#   "html.parser" - BeautifulSoup with the stdlib parser (reference behaviour)
+#   "lxml"        - BeautifulSoup with the lxml parser
+#   "stream"      - single-pass extractor for the <h2>/<li>/<a data-*> markup only
+PARSER_ENGINES = ("html.parser", "lxml", "stream")
+DEFAULT_PARSER_ENGINE = "html.parser"
+
+# number of (tid, date) responses kept for conditional requests and parse reuse
+RESPONSE_CACHE_SIZE = 32
 
 # common mapping: name -> tid (adjust if you know different ids)
 DEFAULT_HALLS = {
@@ -46,7 +71,7 @@ def verify_hall_mapping(verbose: bool = False):
     """Check each tid in DEFAULT_HALLS and log the detected hall name from the API HTML."""
     for hall, tid in DEFAULT_HALLS.items():
         try:
-            resp = requests.get(f"{API_BASE}?tid={tid}", headers=HEADERS, timeout=10)
+            resp = get_session().get(f"{API_BASE}?tid={tid}", headers=HEADERS, timeout=REQUEST_TIMEOUT)
             if "Worcester" in resp.text:
                 actual = "Worcester"
             elif "Franklin" in resp.text:
@@ -112,37 +137,157 @@ def date_from_arg(date_str: str | None) -> str:
     return mmddyyyy_from_date(dt)
 
 
-def fetch_raw_menu_for_tid(tid: int, date_mmddyyyy: str, retries: int = 2, verbose: bool = False) -> Any:
-    """Call the foodpro-menu-ajax endpoint for a given tid and date. Return parsed JSON (or raw text on failure)."""
-    params = {"tid": tid, "date": date_mmddyyyy}
-    url = f"{API_BASE}?{urlencode(params)}"
+# ---------------- HTTP helpers ---------------------------------------
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session used by the scraper (created on first use)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=MAX_FETCH_WORKERS, pool_maxsize=MAX_FETCH_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**(attempt-1)))."""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class ResponseCache:
+    """
+    Small LRU of recent menu responses, keyed by URL.
+    Each entry keeps the validators (ETag / Last-Modified) for conditional
+    requests, a content hash of the body, the decoded payload, and the parsed
+    result per (hall, parser engine) so an unchanged payload is never parsed twice.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "unchanged_payloads": 0, "parse_skipped": 0}
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def menu_url(tid: int, date_mmddyyyy: str, api_base: str = API_BASE) -> str:
+    """Build the foodpro-menu-ajax URL for a tid and date."""
+    return f"{api_base}?{urlencode({'tid': tid, 'date': date_mmddyyyy})}"
+
+
+def fetch_menu_payload(tid: int, date_mmddyyyy: str, retries: int = 2, verbose: bool = False,
+                       session: Optional[requests.Session] = None, api_base: str = API_BASE):
+    """
+    Fetch the menu for a tid and date, reusing the previous response when possible.
+    Sends If-None-Match / If-Modified-Since when the last response carried an ETag
+    or Last-Modified header; a 304 returns the cached payload without a download.
+    Returns (payload, digest) where digest is the SHA-256 of the response body.
+    """
+    url = menu_url(tid, date_mmddyyyy, api_base)
+    session = session or get_session()
     attempt = 0
     while attempt <= retries:
         attempt += 1
+        cached = response_cache.get(url)
+        headers = dict(HEADERS)
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
         try:
             if verbose:
                 print(f"[fetch] GET {url} (attempt {attempt})")
-            resp = requests.get(url, headers=HEADERS, timeout=10)
-            resp.raise_for_status()
-            # The endpoint usually returns JSON; try to parse it.
-            try:
-                return resp.json()
-            except ValueError:
-                # If JSON decode fails maybe it's a string containing HTML or something unexpected
+            response_cache.count("requests")
+            resp = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            if resp.status_code == 304 and cached is not None:
+                response_cache.count("not_modified")
                 if verbose:
-                    print("[fetch] Response not JSON; returning raw text")
-                return resp.text
+                    print("[fetch] 304 Not Modified; using cached payload")
+                return cached["payload"], cached["digest"]
+            resp.raise_for_status()
+
+            digest = hashlib.sha256(resp.content).hexdigest()
+            if cached is not None and cached["digest"] == digest:
+                # Same bytes as last time: keep the decoded payload and parsed results
+                response_cache.count("unchanged_payloads")
+                payload = cached["payload"]
+                parsed = cached["parsed"]
+            else:
+                # The endpoint usually returns JSON; try to parse it.
+                try:
+                    payload = resp.json()
+                except ValueError:
+                    # If JSON decode fails maybe it's a string containing HTML or something unexpected
+                    if verbose:
+                        print("[fetch] Response not JSON; returning raw text")
+                    payload = resp.text
+                parsed = {}
+            response_cache.put(url, {
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "digest": digest,
+                "payload": payload,
+                "parsed": parsed,
+            })
+            return payload, digest
         except Exception as e:
             if attempt > retries:
                 if verbose:
                     print(f"[fetch] failed after {attempt} attempts: {e}")
                 raise
             else:
+                delay = backoff_delay(attempt)
                 if verbose:
-                    print(f"[fetch] request failed (attempt {attempt}): {e} — retrying in 1s")
-                time.sleep(1)
+                    print(f"[fetch] request failed (attempt {attempt}): {e} — retrying in {delay:.2f}s")
+                time.sleep(delay)
     # Shouldn't get here
-    return None
+    return None, None
+
+
+def fetch_raw_menu_for_tid(tid: int, date_mmddyyyy: str, retries: int = 2, verbose: bool = False,
+                           session: Optional[requests.Session] = None, api_base: str = API_BASE) -> Any:
+    """Call the foodpro-menu-ajax endpoint for a given tid and date. Return parsed JSON (or raw text on failure)."""
+    payload, _ = fetch_menu_payload(tid, date_mmddyyyy, retries=retries, verbose=verbose,
+                                    session=session, api_base=api_base)
+    return payload
+
+
+def fetch_stats() -> Dict[str, int]:
+    """Counters for the scraper's HTTP layer."""
+    with response_cache._lock:
+        return dict(response_cache.stats)
 
 
 # ---------------- Parsing helpers ------------------------------------
@@ -155,13 +300,48 @@ def safe_int(value):
         return None
 
 
-def parse_category_html(category_html: str, verbose: bool = False) -> Dict[str, Any]:
+def dish_from_attrs(name: str, attrs: Dict[str, str]) -> Dict[str, Any]:
+    """Build the dish dict for a menu item from its link text and data-* attributes."""
+    return {
+        "name": name,
+        # common data-* attributes:
+        "dish_name_attr": attrs.get("data-dish-name") or attrs.get("data-dishname") or None,
+        "allergens": (attrs.get("data-allergens") or "").strip(),
+        "ingredients": (attrs.get("data-ingredient-list") or "").strip(),
+        "clean_diet": (attrs.get("data-clean-diet-str") or "").strip(),
+        "serving_size": (attrs.get("data-serving-size") or "").strip(),
+        "calories": safe_int(attrs.get("data-calories")),
+        "healthfulness": (attrs.get("data-healthfulness") or "").strip(),
+        "carbon": (attrs.get("data-carbon-list") or "").strip(),
+        "recipe_webcode": (attrs.get("data-recipe-webcode") or "").strip(),
+        "raw_attrs": attrs,
+    }
+
+
+def parse_category_html(category_html: str, verbose: bool = False, engine: Optional[str] = None) -> Dict[str, Any]:
     """
     Parse an HTML fragment for a single category and return:
       { "title": <category title or None>, "items": [ {dish dict}, ... ] }
     Expects markup with <h2 class='menu_category_name'> ... </h2> and <li class="lightbox-nutrition">...
+
+    engine selects the parser (see PARSER_ENGINES); defaults to DEFAULT_PARSER_ENGINE.
     """
-    soup = BeautifulSoup(category_html, "html.parser")
+    engine = engine or DEFAULT_PARSER_ENGINE
+    if engine == "stream":
+        title, items = _stream_parse_category_html(category_html)
+    elif engine in ("html.parser", "lxml"):
+        title, items = _soup_parse_category_html(category_html, engine)
+    else:
+        raise ValueError(f"Unknown parser engine: {engine}. Must be one of: {list(PARSER_ENGINES)}")
+
+    if verbose:
+        print(f"[parse] category title={title!r}, items_found={len(items)}")
+
+    return {"title": title, "items": items}
+
+
+def _soup_parse_category_html(category_html: str, features: str):
+    soup = BeautifulSoup(category_html, features)
 
     title_tag = soup.find("h2", class_="menu_category_name") or soup.find("h2")
     title = title_tag.get_text(strip=True) if title_tag else None
@@ -171,20 +351,7 @@ def parse_category_html(category_html: str, verbose: bool = False) -> Dict[str,
         a = li.find("a")
         if a:
             attrs = {k: v for k, v in a.attrs.items() if k.startswith("data-")}
-            dish = {
-                "name": a.get_text(strip=True),
-                # common data-* attributes:
-                "dish_name_attr": attrs.get("data-dish-name") or attrs.get("data-dishname") or None,
-                "allergens": (attrs.get("data-allergens") or "").strip(),
-                "ingredients": (attrs.get("data-ingredient-list") or "").strip(),
-                "clean_diet": (attrs.get("data-clean-diet-str") or "").strip(),
-                "serving_size": (attrs.get("data-serving-size") or "").strip(),
-                "calories": safe_int(attrs.get("data-calories")),
-                "healthfulness": (attrs.get("data-healthfulness") or "").strip(),
-                "carbon": (attrs.get("data-carbon-list") or "").strip(),
-                "recipe_webcode": (attrs.get("data-recipe-webcode") or "").strip(),
-                "raw_attrs": attrs,
-            }
+            dish = dish_from_attrs(a.get_text(strip=True), attrs)
         else:
             # fallback: take plain text inside li
             dish = {"name": li.get_text(" ", strip=True)}
@@ -205,13 +372,152 @@ def parse_category_html(category_html: str, verbose: bool = False) -> Dict[str,
             if text:
                 items.append({"name": text})
 
-    if verbose:
-        print(f"[parse] category title={title!r}, items_found={len(items)}")
+    return title, items
+
+
+# Elements html.parser closes immediately (they never contain text)
+_VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+])
+
+
+class _CategoryExtractor(HTMLParser):
+    """
+    Single-pass extractor for category fragments.
+    Instead of building a document tree it keeps a stack of open elements,
+    nesting and closing them the way BeautifulSoup's html.parser builder does,
+    and only collects text for the <h2>, <li> and <a> elements the menu needs.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.chunks = []
+        self.menu_title = None    # first <h2 class="menu_category_name">
+        self.first_title = None   # first <h2>
+        self.items = []           # li.lightbox-nutrition dishes, in document order
+        self.li_texts = []        # text of every <li>, for the no-lightbox fallback
+
+    def _flush(self):
+        # Adjacent text chunks form one string, as in BeautifulSoup
+        if not self.chunks:
+            return
+        text = "".join(self.chunks)
+        self.chunks = []
+        for frame in self.stack:
+            strings = frame.get("strings")
+            if strings is not None:
+                strings.append(text)
+
+    def handle_data(self, data):
+        self.chunks.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        attrs = {k: ("" if v is None else v) for k, v in attrs}
+
+        if tag in _VOID_TAGS:
+            if tag == "img":
+                icon = {"src": attrs.get("src"), "alt": attrs.get("alt", "")}
+                for frame in self.stack:
+                    if frame["tag"] == "li":
+                        frame["icons"].append(icon)
+            return
+
+        frame = {"tag": tag}
+        if tag == "li":
+            frame.update(strings=[], icons=[], a=None, text_slot=len(self.li_texts))
+            self.li_texts.append(None)
+            if "lightbox-nutrition" in attrs.get("class", "").split():
+                frame["item_slot"] = len(self.items)
+                self.items.append(None)
+        elif tag == "a":
+            frame.update(strings=[], attrs=attrs)
+            for open_frame in self.stack:
+                if open_frame["tag"] == "li" and open_frame["a"] is None:
+                    open_frame["a"] = frame
+        elif tag == "h2":
+            frame.update(strings=[], is_menu_title="menu_category_name" in attrs.get("class", "").split())
+        self.stack.append(frame)
+
+    def handle_endtag(self, tag):
+        self._flush()
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i]["tag"] == tag:
+                while len(self.stack) > i:
+                    self._finish(self.stack.pop())
+                return
+        # Stray end tag with nothing to close: ignored
+
+    def close(self):
+        super().close()
+        self._flush()
+        while self.stack:
+            self._finish(self.stack.pop())
+
+    def _finish(self, frame):
+        tag = frame["tag"]
+        if tag == "a":
+            frame["text"] = "".join(s.strip() for s in frame["strings"] if s.strip())
+        elif tag == "h2":
+            text = "".join(s.strip() for s in frame["strings"] if s.strip())
+            if self.first_title is None:
+                self.first_title = text
+            if frame["is_menu_title"] and self.menu_title is None:
+                self.menu_title = text
+        elif tag == "li":
+            text = " ".join(s.strip() for s in frame["strings"] if s.strip())
+            self.li_texts[frame["text_slot"]] = text
+            if "item_slot" in frame:
+                a = frame["a"]
+                if a is not None:
+                    attrs = {k: v for k, v in a["attrs"].items() if k.startswith("data-")}
+                    dish = dish_from_attrs(a["text"], attrs)
+                else:
+                    dish = {"name": text}
+                if frame["icons"]:
+                    dish["icons"] = frame["icons"]
+                self.items[frame["item_slot"]] = dish
+
+
+def _stream_parse_category_html(category_html: str):
+    extractor = _CategoryExtractor()
+    extractor.feed(category_html)
+    extractor.close()
+
+    title = extractor.menu_title if extractor.menu_title is not None else extractor.first_title
+    items = extractor.items
+    if not items:
+        items = [{"name": text} for text in extractor.li_texts if text]
+    return title, items
 
-    return {"title": title, "items": items}
 
+def looks_like_html(value: str) -> bool:
+    """True for strings recursively_parse_html_in_obj treats as category HTML."""
+    return "<li" in value or "<h2" in value or "<ul" in value
 
-def recursively_parse_html_in_obj(obj: Any, verbose: bool = False) -> Any:
+
+def parse_html_fragment(fragment: str, verbose: bool = False, engine: Optional[str] = None) -> Any:
+    """Parse one category fragment into the shape stored in the menu: {title: items} or a bare item list."""
+    parsed = parse_category_html(fragment, verbose=verbose, engine=engine)
+    # return list of items (preferred) keyed by title
+    if parsed["title"]:
+        return {parsed["title"]: parsed["items"]}
+    else:
+        return parsed["items"]
+
+
+def recursively_parse_html_in_obj(obj: Any, verbose: bool = False, engine: Optional[str] = None) -> Any:
     """
     Walk the object (dict/list/str/...) and wherever a string looks like HTML (contains '<li' or '<h2')
     parse it into structured JSON via parse_category_html.
@@ -219,24 +525,93 @@ def recursively_parse_html_in_obj(obj: Any, verbose: bool = False) -> Any:
     if isinstance(obj, dict):
         out = {}
         for k, v in obj.items():
-            out[k] = recursively_parse_html_in_obj(v, verbose=verbose)
+            out[k] = recursively_parse_html_in_obj(v, verbose=verbose, engine=engine)
         return out
     elif isinstance(obj, list):
-        return [recursively_parse_html_in_obj(v, verbose=verbose) for v in obj]
+        return [recursively_parse_html_in_obj(v, verbose=verbose, engine=engine) for v in obj]
     elif isinstance(obj, str):
-        if "<li" in obj or "<h2" in obj or "<ul" in obj:
-            parsed = parse_category_html(obj, verbose=verbose)
-            # return list of items (preferred) keyed by title
-            if parsed["title"]:
-                return {parsed["title"]: parsed["items"]}
-            else:
-                return parsed["items"]
+        if looks_like_html(obj):
+            return parse_html_fragment(obj, verbose=verbose, engine=engine)
         else:
             return obj
     else:
         return obj
 
 
+# ---------------- Parallel parsing -----------------------------------
+_parse_pool = None
+_parse_pool_workers = 0
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared process pool for fragment parsing, (re)created if the size changed."""
+    global _parse_pool, _parse_pool_workers
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_workers != workers:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False)
+            _parse_pool = ProcessPoolExecutor(max_workers=workers)
+            _parse_pool_workers = workers
+        return _parse_pool
+
+
+def collect_html_fragments(obj: Any, out: list) -> list:
+    """Append every HTML string in obj to out, in the order recursively_parse_html_in_obj visits them."""
+    if isinstance(obj, dict):
+        for v in obj.values():
+            collect_html_fragments(v, out)
+    elif isinstance(obj, list):
+        for v in obj:
+            collect_html_fragments(v, out)
+    elif isinstance(obj, str) and looks_like_html(obj):
+        out.append(obj)
+    return out
+
+
+def replace_html_fragments(obj: Any, parsed_fragments) -> Any:
+    """Rebuild obj, taking parsed fragments from an iterator in collect_html_fragments order."""
+    if isinstance(obj, dict):
+        return {k: replace_html_fragments(v, parsed_fragments) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [replace_html_fragments(v, parsed_fragments) for v in obj]
+    elif isinstance(obj, str) and looks_like_html(obj):
+        return next(parsed_fragments)
+    else:
+        return obj
+
+
+def parse_payloads_parallel(payloads: list, workers: int, verbose: bool = False,
+                            engine: Optional[str] = None) -> list:
+    """
+    Parse the HTML inside several raw payloads (e.g. every hall and meal period)
+    as one batch on a process pool. Returns the payloads in the same nested
+    structure recursively_parse_html_in_obj would produce, in input order.
+    """
+    fragments = []
+    counts = []
+    for payload in payloads:
+        before = len(fragments)
+        collect_html_fragments(payload, fragments)
+        counts.append(len(fragments) - before)
+
+    if workers > 1 and len(fragments) > 1:
+        pool = get_parse_pool(workers)
+        # a few chunks per worker balances load without per-fragment IPC overhead
+        chunksize = max(1, len(fragments) // (workers * 4))
+        parser = partial(parse_html_fragment, verbose=verbose, engine=engine)
+        parsed = list(pool.map(parser, fragments, chunksize=chunksize))
+    else:
+        parsed = [parse_html_fragment(f, verbose=verbose, engine=engine) for f in fragments]
+
+    out = []
+    position = 0
+    for payload, count in zip(payloads, counts):
+        out.append(replace_html_fragments(payload, iter(parsed[position:position + count])))
+        position += count
+    return out
+
+
 # ---------------- Filtering helpers -----------------------------------
 def should_include_category(category_name: str, hall_name: str) -> bool:
     """
@@ -328,38 +703,153 @@ def filter_menu_by_hall(menu_data: Any, hall_name: str, verbose: bool = False) -
 
 
 # ---------------- High-level flow -----------------------------------
-def scrape_multiple_tids(tids: Dict[str, int], date_mmddyyyy: str, verbose: bool = False) -> Dict[str, Any]:
-    """Fetch and parse menus for multiple named tids. Returns a dictionary keyed by hall name."""
-    out = {}
-    for name, tid in tids.items():
+def _parsed_key(name: str, engine: Optional[str]) -> tuple:
+    """Key of a hall's parsed menu in a response cache entry; engines may differ on odd markup."""
+    return name, engine or DEFAULT_PARSER_ENGINE
+
+
+def _fetch_for_hall(name: str, tid: int, date_mmddyyyy: str, verbose: bool, session, api_base: str,
+                    engine: Optional[str] = None):
+    """
+    Fetch a hall's payload. Returns (raw, digest, cached_menu) where cached_menu
+    is the menu already parsed with the same engine when the payload is unchanged, else None.
+    """
+    if verbose:
+        print(f"\n=== Fetching {name} (tid={tid}) for {date_mmddyyyy} ===")
+    raw, digest = fetch_menu_payload(tid, date_mmddyyyy, verbose=verbose, session=session, api_base=api_base)
+
+    # Skip parsing when the payload is byte-identical to one already parsed for this hall
+    cached = response_cache.get(menu_url(tid, date_mmddyyyy, api_base))
+    key = _parsed_key(name, engine)
+    if cached is not None and cached["digest"] == digest and key in cached["parsed"]:
+        response_cache.count("parse_skipped")
+        if verbose:
+            print(f"[ok] payload unchanged for {name}; reusing parsed menu")
+        return raw, digest, copy.deepcopy(cached["parsed"][key])
+    return raw, digest, None
+
+
+def _finish_hall(name: str, tid: int, date_mmddyyyy: str, parsed: Any, digest: str,
+                 verbose: bool, api_base: str, engine: Optional[str] = None) -> Dict[str, Any]:
+    """Filter a parsed payload to the hall, remember it for unchanged payloads, and build the entry."""
+    # Filter menu to only include categories that belong to this dining hall
+    if isinstance(parsed, dict) and "menu" in parsed:
+        parsed["menu"] = filter_menu_by_hall(parsed["menu"], name, verbose=verbose)
+    elif isinstance(parsed, dict):
+        # If parsed is the menu directly (not wrapped)
+        parsed = filter_menu_by_hall(parsed, name, verbose=verbose)
+    
+    cached = response_cache.get(menu_url(tid, date_mmddyyyy, api_base))
+    if cached is not None and cached["digest"] == digest:
+        cached["parsed"][_parsed_key(name, engine)] = copy.deepcopy(parsed)
+    
+    if verbose:
+        print(f"[ok] parsed and filtered menu for {name}")
+    return {"tid": tid, "date": date_mmddyyyy, "menu": parsed}
+
+
+def scrape_tid(name: str, tid: int, date_mmddyyyy: str, verbose: bool = False,
+               session: Optional[requests.Session] = None, api_base: str = API_BASE,
+               engine: Optional[str] = None) -> Dict[str, Any]:
+    """Fetch and parse the menu for a single named tid. Errors are returned in the entry, not raised."""
+    try:
+        raw, digest, cached_menu = _fetch_for_hall(name, tid, date_mmddyyyy, verbose, session, api_base, engine)
+        if cached_menu is not None:
+            return {"tid": tid, "date": date_mmddyyyy, "menu": cached_menu}
+
+        # raw may be dict, list, or a str containing HTML. Parse recursively any HTML fragments.
+        parsed = recursively_parse_html_in_obj(raw, verbose=verbose, engine=engine)
+        return _finish_hall(name, tid, date_mmddyyyy, parsed, digest, verbose, api_base, engine)
+    except Exception as e:
+        if verbose:
+            print(f"[error] {name}: {e}")
+        return {"tid": tid, "date": date_mmddyyyy, "error": str(e)}
+
+
+def scrape_multiple_tids(tids: Dict[str, int], date_mmddyyyy: str, verbose: bool = False,
+                         max_workers: Optional[int] = None, session: Optional[requests.Session] = None,
+                         api_base: str = API_BASE, engine: Optional[str] = None,
+                         parse_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Fetch and parse menus for multiple named tids. Returns a dictionary keyed by hall name.
+    Halls are fetched concurrently on a bounded thread pool sharing one pooled session;
+    pass max_workers=1 for the old one-after-another behaviour.
+    Each hall gets its own entry: a failure is recorded under that hall only.
+
+    With parse_workers > 1, all halls are fetched first and their HTML fragments
+    are parsed as one batch on a process pool (see parse_payloads_parallel).
+    """
+    if max_workers is None:
+        max_workers = min(len(tids), MAX_FETCH_WORKERS)
+    session = session or get_session()
+
+    if parse_workers and parse_workers > 1:
+        return _scrape_batched(tids, date_mmddyyyy, verbose, max_workers, session, api_base, engine, parse_workers)
+
+    def scrape_one(item):
+        name, tid = item
+        return name, scrape_tid(name, tid, date_mmddyyyy, verbose=verbose, session=session,
+                                api_base=api_base, engine=engine)
+
+    if max_workers <= 1 or len(tids) <= 1:
+        return dict(map(scrape_one, tids.items()))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape") as pool:
+        # map keeps the input order, so the output dict matches `tids`
+        return dict(pool.map(scrape_one, tids.items()))
+
+
+def _scrape_batched(tids: Dict[str, int], date_mmddyyyy: str, verbose: bool, max_workers: int,
+                    session, api_base: str, engine: Optional[str], parse_workers: int) -> Dict[str, Any]:
+    """scrape_multiple_tids with one process-pool parse over every hall's fragments."""
+    def fetch_one(item):
+        name, tid = item
         try:
+            return name, _fetch_for_hall(name, tid, date_mmddyyyy, verbose, session, api_base, engine), None
+        except Exception as e:
+            return name, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="scrape") as pool:
+        fetched = list(pool.map(fetch_one, tids.items()))
+
+    out = {}
+    to_parse = []
+    for name, result, error in fetched:
+        tid = tids[name]
+        if error is not None:
             if verbose:
-                print(f"\n=== Fetching {name} (tid={tid}) for {date_mmddyyyy} ===")
-            raw = fetch_raw_menu_for_tid(tid, date_mmddyyyy, verbose=verbose)
-            # raw may be dict, list, or a str containing HTML. Parse recursively any HTML fragments.
-            parsed = None
-            if isinstance(raw, (dict, list)):
-                parsed = recursively_parse_html_in_obj(raw, verbose=verbose)
-            elif isinstance(raw, str):
-                # try to parse string as HTML fragment
-                parsed = recursively_parse_html_in_obj(raw, verbose=verbose)
-            else:
-                parsed = raw
-            
-            # Filter menu to only include categories that belong to this dining hall
-            if isinstance(parsed, dict) and "menu" in parsed:
-                parsed["menu"] = filter_menu_by_hall(parsed["menu"], name, verbose=verbose)
-            elif isinstance(parsed, dict):
-                # If parsed is the menu directly (not wrapped)
-                parsed = filter_menu_by_hall(parsed, name, verbose=verbose)
-            
-            out[name] = {"tid": tid, "date": date_mmddyyyy, "menu": parsed}
-            if verbose:
-                print(f"[ok] parsed and filtered menu for {name}")
+                print(f"[error] {name}: {error}")
+            out[name] = {"tid": tid, "date": date_mmddyyyy, "error": str(error)}
+        elif result[2] is not None:
+            out[name] = {"tid": tid, "date": date_mmddyyyy, "menu": result[2]}
+        else:
+            out[name] = None  # placeholder keeps the input order
+            to_parse.append((name, result[0], result[1]))
+
+    try:
+        parsed_payloads = parse_payloads_parallel([raw for _, raw, _ in to_parse], parse_workers,
+                                                  verbose=verbose, engine=engine)
+    except Exception as e:
+        # Fall back to parsing each hall on its own so one bad payload only fails its hall.
+        # Always logged: a failing pool otherwise looks like a (slow) successful scrape.
+        print(f"[parse] batched parse failed ({type(e).__name__}: {e}); parsing halls one by one")
+        parsed_payloads = []
+        for name, raw, _ in to_parse:
+            try:
+                parsed_payloads.append(recursively_parse_html_in_obj(raw, verbose=verbose, engine=engine))
+            except Exception as hall_error:
+                parsed_payloads.append(hall_error)
+
+    for (name, _, digest), parsed in zip(to_parse, parsed_payloads):
+        tid = tids[name]
+        try:
+            if isinstance(parsed, Exception):
+                raise parsed
+            out[name] = _finish_hall(name, tid, date_mmddyyyy, parsed, digest, verbose, api_base, engine)
         except Exception as e:
-            out[name] = {"tid": tid, "date": date_mmddyyyy, "error": str(e)}
             if verbose:
                 print(f"[error] {name}: {e}")
+            out[name] = {"tid": tid, "date": date_mmddyyyy, "error": str(e)}
     return out
 
 
@@ -370,6 +860,9 @@ def main():
     p.add_argument("--names", help="Comma-separated hall names from mapping (e.g. Hampshire,Berkshire). Default: all.", default=None)
     p.add_argument("--tids", help="Comma-separated tid integers (e.g. 2,4). Overrides names mapping.", default=None)
     p.add_argument("--out", "-o", help=f"Output filename (default: {DEFAULT_OUTFILE})", default=DEFAULT_OUTFILE)
+    p.add_argument("--workers", "-w", type=int, default=None, help=f"Halls fetched concurrently (default: up to {MAX_FETCH_WORKERS}; 1 = sequential)")
+    p.add_argument("--parse-workers", type=int, default=None, help="Parse HTML fragments of all halls on this many processes")
+    p.add_argument("--parser", choices=PARSER_ENGINES, default=DEFAULT_PARSER_ENGINE, help=f"HTML parser engine (default: {DEFAULT_PARSER_ENGINE})")
     p.add_argument("--verbose", "-v", action="store_true", help="Verbose logging")
     args = p.parse_args()
 
@@ -401,7 +894,8 @@ def main():
     if args.verbose:
         print(f"[config] date={date_mmddyyyy}, targets={list(tids_map.keys())}, outfile={args.out}")
 
-    result = scrape_multiple_tids(tids_map, date_mmddyyyy, verbose=args.verbose)
+    result = scrape_multiple_tids(tids_map, date_mmddyyyy, verbose=args.verbose, max_workers=args.workers,
+                                  engine=args.parser, parse_workers=args.parse_workers)
 
     # Save JSON
     with open(args.out, "w", encoding="utf-8") as f:
@@ -1,10 +1,22 @@
 from flask import Flask, jsonify
-from learning import value_iteration, simulate_day, MENU
+from learning import get_policy, simulate_day, simulate_days, MENU
 from flask import request
 from flask_cors import CORS
-from scraping import scrape_multiple_tids, DEFAULT_HALLS, mmddyyyy_from_date, filter_menu_by_hall
-from rl_recommender import MealRecommenderBandit, calculate_reward, cold_start_recommendations
-import json
+from scraping import DEFAULT_HALLS, mmddyyyy_from_date, fetch_stats
+from rl_recommender import (MealRecommenderBandit, calculate_reward, cold_start_recommendations,
+                            DEFAULT_MODEL_TYPE, DEFAULT_RETRAIN_EVERY, DEFAULT_HISTORY_MODE,
+                            DEFAULT_HISTORY_SIZE, DEFAULT_HISTORY_DECAY)
+from menu_store import get_menu_store
+from menu_refresh import get_menu_refresher
+from menu_mdp import get_menu_mdp
+from meal_catalog import get_meal_catalog
+from training_queue import TrainingQueue, DEFAULT_TRAIN_WORKERS
+from model_cache import ModelCache, DEFAULT_CACHE_SIZE
+from model_store import open_model_store
+from population_model import get_population_model
+from feedback_journal import FeedbackJournal
+import atexit
+import math
 import os
 from datetime import datetime
 
@@ -15,10 +27,23 @@ CORS(app)  # Enable CORS for frontend integration
 USER_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'user_models')
 os.makedirs(USER_MODELS_DIR, exist_ok=True)
 
+# Append-only log of every feedback event (replaces the feedback_log.json array)
+feedback_journal = FeedbackJournal(os.path.join(USER_MODELS_DIR, 'feedback_journal'))
+feedback_journal.import_legacy(os.path.join(USER_MODELS_DIR, 'feedback_log.json'))
+atexit.register(feedback_journal.close)
+
+# Seconds a request waits for a hall's first menu scrape before giving up
+MENU_REFRESH_WAIT = 30
+
+# Upper bound on /simulate_day?n_days= rollouts per policy
+MAX_SIMULATED_DAYS = 1_000_000
+
+
 def check_and_update_menu(dining_hall: str, json_file: str = 'umass_menu_parsed.json') -> bool:
     """
     Check if the menu date for the specified dining hall matches today's date.
-    If not, scrape the menu for today and update the JSON file.
+    If not, schedule a background refresh for today. Requests keep getting the
+    last good menu while it runs; only a hall with no menu at all waits for it.
     
     Parameters:
         dining_hall (str): Name of the dining hall (e.g., 'Berkshire', 'Franklin', 'Worcester', 'Hampshire')
@@ -33,50 +58,33 @@ def check_and_update_menu(dining_hall: str, json_file: str = 'umass_menu_parsed.
     if dining_hall not in DEFAULT_HALLS:
         raise ValueError(f"Invalid dining hall: {dining_hall}. Must be one of: {list(DEFAULT_HALLS.keys())}")
     
-    # Ensure JSON file path is relative to the backend directory
-    if not os.path.isabs(json_file):
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        json_file = os.path.join(backend_dir, json_file)
-    
-    # Check if JSON file exists and read current data
-    current_data = {}
-    if os.path.exists(json_file):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                current_data = json.load(f)
-        except Exception as e:
-            print(f"Error reading {json_file}: {e}")
-            current_data = {}
+    # Read the current menu from the in-memory snapshot store (reloads only if the file changed)
+    store = get_menu_store(json_file)
+    refresher = get_menu_refresher(store)
+    refresher.start()
     
     # Check if the dining hall's date matches today
-    hall_data = current_data.get(dining_hall, {})
+    hall_data = store.get().data.get(dining_hall, {})
     hall_date = hall_data.get("date")
     
     if hall_date == today:
         # Menu is up to date
         return True
     
-    # Menu is not up to date, need to scrape
-    print(f"Menu for {dining_hall} is outdated (date: {hall_date}, today: {today}). Scraping...")
-    
-    try:
-        # Scrape menu for the specific dining hall for today
-        tids_map = {dining_hall: DEFAULT_HALLS[dining_hall]}
-        scraped_data = scrape_multiple_tids(tids_map, today, verbose=False)
-        
-        # Update the current data with the new scraped data
-        current_data.update(scraped_data)
-        
-        # Save updated data back to JSON file
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(current_data, f, indent=2, ensure_ascii=False)
-        
-        print(f"Successfully updated menu for {dining_hall}")
-        return True
-        
-    except Exception as e:
-        print(f"Error scraping menu for {dining_hall}: {e}")
+    if "menu" in hall_data:
+        # Serve the stale menu while a single background job refreshes it
+        refresher.refresh(dining_hall, today)
         return False
+    
+    # Nothing to serve yet: wait for the (shared) refresh job
+    print(f"No menu for {dining_hall} (date: {hall_date}, today: {today}). Waiting for refresh...")
+    return refresher.ensure_fresh(dining_hall, wait=MENU_REFRESH_WAIT)
+
+
+def cached_json_response(snapshot, key, build_payload):
+    """Build a JSON response whose encoded body is computed once per menu snapshot."""
+    body = snapshot.memo(('response',) + key, lambda: app.json.dumps(build_payload()) + "\n")
+    return app.response_class(body, mimetype=app.json.mimetype)
 
 
 @app.route('/')
@@ -87,7 +95,8 @@ def home():
             "/": "This welcome message",
             "/menu/<dining_hall>": "Get UMass Dining menu for a specific dining hall (e.g., /menu/Berkshire)",
             "/menu/all": "Get UMass Dining menu from all locations",
-            "/health": "Health check endpoint"
+            "/health": "Health check endpoint",
+            "/metrics": "Cache and background worker counters"
         },
         "available_dining_halls": list(DEFAULT_HALLS.keys())
     })
@@ -99,21 +108,13 @@ def get_menu(dining_hall: str):
         # Ensure menu is up to date before returning
         check_and_update_menu(dining_hall)
         
-        # Read and return the menu data
-        json_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'umass_menu_parsed.json')
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        hall_data = data.get(dining_hall, {})
-        
-        # Filter menu to ensure categories belong to the correct dining hall
-        # This fixes cases where categories from other halls appear in the wrong place
-        if isinstance(hall_data, dict) and "menu" in hall_data:
-            hall_data["menu"] = filter_menu_by_hall(hall_data["menu"], dining_hall, verbose=False)
-        
-        return jsonify({
+        # Serve the menu from the in-memory snapshot.
+        # The snapshot filters categories to the correct dining hall once and
+        # keeps the encoded response for reuse until the menu changes.
+        snapshot = get_menu_store().get()
+        return cached_json_response(snapshot, ('menu', dining_hall), lambda: {
             "success": True,
-            "data": hall_data
+            "data": snapshot.filtered_hall(dining_hall)
         })
     except ValueError as e:
         return jsonify({
@@ -135,19 +136,11 @@ def get_menu_all():
         for hall_name in DEFAULT_HALLS.keys():
             check_and_update_menu(hall_name)
         
-        # Read and return all menu data
-        json_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'umass_menu_parsed.json')
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Filter each dining hall's menu to ensure categories belong to the correct hall
-        for hall_name, hall_data in data.items():
-            if isinstance(hall_data, dict) and "menu" in hall_data:
-                hall_data["menu"] = filter_menu_by_hall(hall_data["menu"], hall_name, verbose=False)
-        
-        return jsonify({
+        # Serve all halls from the in-memory snapshot (each hall's menu filtered once)
+        snapshot = get_menu_store().get()
+        return cached_json_response(snapshot, ('menu_all',), lambda: {
             "success": True,
-            "data": data
+            "data": snapshot.filtered_all()
         })
     except Exception as e:
         return jsonify({
@@ -162,12 +155,20 @@ def recommend_meal(dining_hall: str):
     """
     Recommend an optimal meal item from the given dining hall
     based on calorie goals and the learned MDP policy.
+
+    ?engine=menu plans over the hall's actual menu items instead, using
+    remaining calories plus optional protein/carbs/fat grams and meal period
+    (daily targets are the fixed menu_mdp.DEFAULT_TARGETS):
+      /recommend/Worcester?engine=menu&remaining=1400&protein=60&meal=dinner
     """
     try:
         check_and_update_menu(dining_hall)
 
-        # Load MDP policy
-        _, policy = value_iteration()
+        if request.args.get('engine') == 'menu':
+            return recommend_from_menu(dining_hall)
+
+        # MDP policy (solved once, then served from the cache)
+        _, policy = get_policy()
 
         # Read remaining calories from query params (default = 2000)
         remaining = int(request.args.get('remaining', 2000))
@@ -195,17 +196,77 @@ def recommend_meal(dining_hall: str):
         }), 500
 
 
+def recommend_from_menu(dining_hall: str):
+    """
+    /recommend response from the real-menu MDP (solved once per menu snapshot).
+    The daily targets are fixed at menu_mdp.DEFAULT_TARGETS; only the remaining
+    amounts come from the request (a solved MDP is cached per set of targets).
+    """
+    remaining = {
+        'calories': request.args.get('remaining', type=float),
+        'protein': request.args.get('protein', type=float),
+        'carbs': request.args.get('carbs', type=float),
+        'fat': request.args.get('fat', type=float)
+    }
+    bad = [name for name, value in remaining.items() if value is not None and not math.isfinite(value)]
+    if bad:
+        return jsonify({
+            "success": False,
+            "error": f"Remaining {', '.join(bad)} must be a finite number"
+        }), 400
+
+    mdp = get_menu_mdp(get_menu_store().get(), dining_hall)
+    if not mdp.periods:
+        return jsonify({
+            "success": False,
+            "error": f"No menu items available for {dining_hall}"
+        }), 400
+
+    result = mdp.recommend(remaining, request.args.get('meal'))
+    first = result['plan'][0]
+
+    return jsonify({
+        "success": True,
+        "engine": "menu",
+        "recommendation": {
+            "item": first['name'],
+            "calories": first['calories'],
+            "protein": first['protein'],
+            "carbs": first['carbs'],
+            "fat": first['fat'],
+            "meal": first['meal'],
+            "remaining_input": {k: v for k, v in remaining.items() if v is not None},
+            "dining_hall": dining_hall
+        },
+        "plan": result['plan'],
+        "expected_value": result['expected_value'],
+        "remaining_after_plan": result['remaining_after_plan']
+    })
+
+
 # Daily Simulation Endpoint
 @app.route('/simulate_day', methods=['GET'])
 def simulate_day_endpoint():
     """
     Simulate a full day (breakfast, lunch, dinner) following the learned policy.
+
+    Query params (optional):
+      n_days: also roll out this many days per policy and return reward
+              statistics for the learned policy and a random baseline
+      portion_sd: portion size noise for the rollouts, as a fraction (e.g. 0.15)
+      seed: random seed for the rollouts
     """
     try:
-        _, policy = value_iteration()
-        total_reward, log = simulate_day(policy)
+        _, policy = get_policy()
+        n_days = request.args.get('n_days', type=int)
+        if n_days is not None and not 1 <= n_days <= MAX_SIMULATED_DAYS:
+            return jsonify({
+                "success": False,
+                "error": f"n_days must be between 1 and {MAX_SIMULATED_DAYS}"
+            }), 400
 
-        return jsonify({
+        total_reward, log = simulate_day(policy)
+        response = {
             "success": True,
             "total_reward": total_reward,
             "simulation_log": [
@@ -218,7 +279,15 @@ def simulate_day_endpoint():
                 }
                 for meal, item, cal, rem, r in log
             ]
-        })
+        }
+        if n_days is not None:
+            response["monte_carlo"] = simulate_days(
+                {"optimal": policy, "random": {}},
+                n_days=n_days,
+                portion_sd=request.args.get('portion_sd', 0.0, type=float),
+                seed=request.args.get('seed', type=int)
+            )
+        return jsonify(response)
 
     except Exception as e:
         return jsonify({
@@ -234,121 +303,66 @@ def health():
     return jsonify({"status": "healthy"})
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Cache and background worker counters"""
+    return jsonify({
+        "menu_cache": get_menu_store().stats(),
+        "menu_refresh": get_menu_refresher(get_menu_store()).stats(),
+        "scraper": fetch_stats(),
+        "rl_model": {
+            "type": DEFAULT_MODEL_TYPE,
+            "retrain_every": DEFAULT_RETRAIN_EVERY,
+            "history_mode": DEFAULT_HISTORY_MODE,
+            "history_size": DEFAULT_HISTORY_SIZE,
+            "history_decay": DEFAULT_HISTORY_DECAY
+        },
+        "rl_population": get_population_model().stats() if DEFAULT_MODEL_TYPE == 'hierarchical' else None,
+        "rl_model_cache": model_cache.stats(),
+        "rl_training": training_queue.stats(),
+        "feedback_journal": feedback_journal.stats()
+    })
+
+
 # ========== RL Recommendation Endpoints ==========
 
-def get_user_model_path(user_id: str) -> str:
-    """Get file path for user's RL model."""
-    return os.path.join(USER_MODELS_DIR, f"{user_id}_model.json")
+# Where user models are persisted: flat:<dir> (default), sharded:<dir> or sqlite:<file>
+model_store = open_model_store(os.environ.get('RL_MODEL_STORE', f"flat:{USER_MODELS_DIR}"))
+
+# Hierarchical mode: the shared population model is retrained from the store in the background
+if DEFAULT_MODEL_TYPE == 'hierarchical':
+    get_population_model().start(model_store)
+    atexit.register(get_population_model().close)
 
 
 def load_user_model(user_id: str) -> MealRecommenderBandit:
-    """Load user's RL model from disk, or create new one if doesn't exist."""
-    model_path = get_user_model_path(user_id)
-    if os.path.exists(model_path):
-        try:
-            return MealRecommenderBandit.load(model_path)
-        except Exception as e:
-            print(f"Error loading model for user {user_id}: {e}")
+    """Load user's RL model from the model store, or create new one if doesn't exist."""
+    try:
+        bandit = model_store.load(user_id)
+        if bandit is not None:
+            return bandit
+    except Exception as e:
+        print(f"Error loading model for user {user_id}: {e}")
     
     # Create new model
     return MealRecommenderBandit(user_id=user_id)
 
 
 def save_user_model(bandit: MealRecommenderBandit):
-    """Save user's RL model to disk."""
-    model_path = get_user_model_path(bandit.user_id)
-    bandit.save(model_path)
-
-
-def menu_item_to_meal_dict(food_item, dining_hall: str) -> dict:
-    """Convert menu item to meal dictionary for RL system."""
-    # Extract nutrition info
-    calories = food_item.get('calories', 0)
-    protein = food_item.get('protein', 0)
-    carbs = food_item.get('carbs', 0)
-    fat = food_item.get('fat', 0)
-    
-    # Try to get from raw_attrs if available
-    if 'raw_attrs' in food_item:
-        raw_attrs = food_item['raw_attrs']
-        calories = float(raw_attrs.get('data-calories', calories))
-        protein = float(raw_attrs.get('data-protein', protein).replace('g', '').strip() or 0)
-        carbs = float(raw_attrs.get('data-total-carb', carbs).replace('g', '').strip() or 0)
-        fat = float(raw_attrs.get('data-total-fat', fat).replace('g', '').strip() or 0)
-    
-    return {
-        'id': food_item.get('name', '').lower().replace(' ', '_'),
-        'name': food_item.get('name', ''),
-        'calories': calories,
-        'protein': protein,
-        'carbs': carbs,
-        'fat': fat,
-        'location': dining_hall,
-        'category': food_item.get('category', ''),
-        'station': food_item.get('category', ''),
-        'allergens': food_item.get('allergens', ''),
-        'clean_diet': food_item.get('clean_diet', ''),
-        'ingredients': food_item.get('ingredients', ''),
-        'cuisine_type': food_item.get('cuisine_type', ''),
-        'meal_period': food_item.get('mealPeriod', '')
-    }
+    """Save user's RL model to the model store."""
+    model_store.save(bandit)
 
 
-def get_available_meals_from_menu(menu_data: dict, dining_location: str = None, time_of_day: str = None) -> list:
-    """Extract available meals from menu data."""
-    meals = []
-    
-    if not menu_data or 'menu' not in menu_data:
-        return meals
-    
-    menu = menu_data['menu']
-    dining_hall = menu_data.get('dining_hall', dining_location or '')
-    
-    # Determine meal period
-    current_hour = datetime.now().hour
-    if time_of_day:
-        meal_period = time_of_day
-    elif current_hour < 11:
-        meal_period = 'breakfast'
-    elif current_hour < 15:
-        meal_period = 'lunch'
-    elif current_hour < 21:
-        meal_period = 'dinner'
-    else:
-        meal_period = 'midnight'
-    
-    # Extract meals from menu structure
-    if meal_period in menu:
-        period_data = menu[meal_period]
-        for category, items in period_data.items():
-            if isinstance(items, list):
-                for item in items:
-                    if isinstance(item, dict) and item.get('name'):
-                        meal_dict = menu_item_to_meal_dict(item, dining_hall)
-                        meal_dict['meal_period'] = meal_period
-                        meals.append(meal_dict)
-            elif isinstance(items, dict):
-                # Handle nested structure
-                if 'items' in items:
-                    for item in items['items']:
-                        if isinstance(item, dict) and item.get('name'):
-                            meal_dict = menu_item_to_meal_dict(item, dining_hall)
-                            meal_dict['meal_period'] = meal_period
-                            meals.append(meal_dict)
-    
-    # Also check other meal periods if needed
-    for period in ['breakfast', 'lunch', 'dinner', 'midnight']:
-        if period != meal_period and period in menu:
-            period_data = menu[period]
-            for category, items in period_data.items():
-                if isinstance(items, list):
-                    for item in items:
-                        if isinstance(item, dict) and item.get('name'):
-                            meal_dict = menu_item_to_meal_dict(item, dining_hall)
-                            meal_dict['meal_period'] = period
-                            meals.append(meal_dict)
-    
-    return meals
+# Hot user models stay in memory; changed models are saved in the background
+model_cache = ModelCache(load_user_model, save_user_model,
+                         max_models=int(os.environ.get('RL_MODEL_CACHE_SIZE', DEFAULT_CACHE_SIZE)))
+atexit.register(model_cache.close)
+
+# Feedback is applied to cached user models by background trainers, not in the request
+training_queue = TrainingQueue(model_cache.get, model_cache.mark_dirty,
+                               workers=int(os.environ.get('RL_TRAIN_WORKERS', DEFAULT_TRAIN_WORKERS)),
+                               user_lock=model_cache.lock_for)
+atexit.register(training_queue.close, 10)
 
 
 @app.route('/api/rl/recommend', methods=['POST'])
@@ -385,27 +399,19 @@ def get_rl_recommendations():
         dining_location = data.get('dining_location')
         
         # Load or create user model
-        bandit = load_user_model(user_id)
+        bandit = model_cache.get(user_id)
         
-        # Get available meals
+        # Get available meals from the snapshot's pre-built meal catalog
         if dining_location:
             # Get menu for specific location
             check_and_update_menu(dining_location)
-            json_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'umass_menu_parsed.json')
-            with open(json_file, 'r', encoding='utf-8') as f:
-                menu_data = json.load(f)
-            hall_data = menu_data.get(dining_location, {})
-            available_meals = get_available_meals_from_menu(hall_data, dining_location, user_state.get('time_of_day'))
+            catalog = get_meal_catalog(get_menu_store().get())
+            available_meals = catalog.view(dining_location, user_state.get('time_of_day'))
         else:
             # Get menus from all locations
             check_and_update_menu('Berkshire')  # Update at least one
-            json_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'umass_menu_parsed.json')
-            with open(json_file, 'r', encoding='utf-8') as f:
-                menu_data = json.load(f)
-            available_meals = []
-            for hall_name, hall_data in menu_data.items():
-                meals = get_available_meals_from_menu(hall_data, hall_name, user_state.get('time_of_day'))
-                available_meals.extend(meals)
+            catalog = get_meal_catalog(get_menu_store().get())
+            available_meals = catalog.view(None, user_state.get('time_of_day'))
         
         if not available_meals:
             return jsonify({
@@ -420,8 +426,7 @@ def get_rl_recommendations():
         else:
             recommendations = bandit.recommend_meals(user_state, available_meals, n_recommendations)
         
-        # Save model (in case preferences were updated)
-        save_user_model(bandit)
+        # Recommending does not change the model, so nothing is saved here
         
         return jsonify({
             "success": True,
@@ -471,7 +476,7 @@ def submit_rl_feedback():
             'rating': data.get('rating', 0)
         }
         
-        # Log feedback immediately to a fallback file so feedback isn't lost
+        # Log feedback immediately so it isn't lost even if training fails
         feedback_entry = {
             'timestamp': datetime.now().isoformat(),
             'user_id': user_id,
@@ -480,42 +485,20 @@ def submit_rl_feedback():
             'feedback': feedback
         }
         try:
-            feedback_log = os.path.join(USER_MODELS_DIR, 'feedback_log.json')
-            existing = []
-            if os.path.exists(feedback_log):
-                try:
-                    with open(feedback_log, 'r', encoding='utf-8') as f:
-                        existing = json.load(f)
-                except Exception:
-                    existing = []
-            existing.append(feedback_entry)
-            with open(feedback_log, 'w', encoding='utf-8') as f:
-                json.dump(existing, f, indent=2)
+            feedback_journal.append(feedback_entry)
         except Exception as e:
-            print(f"Warning: failed to write feedback_log.json: {e}")
+            print(f"Warning: failed to append to the feedback journal: {e}")
 
-        # Load user model and try to update it; if the model errors, record a warning
-        model_warning = None
+        # Queue the model update; a background trainer applies it and saves the model
         reward = calculate_reward(feedback, user_state, meal)
-        try:
-            bandit = load_user_model(user_id)
-            bandit.update(user_state, meal, reward)
-            bandit.decay_epsilon()
-            save_user_model(bandit)
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            model_warning = str(e)
+        queue_depth = training_queue.submit(user_id, user_state, meal, float(reward))
 
-        # Return success (feedback was logged). Include model_warning if training/save failed.
-        response = {
+        return jsonify({
             "success": True,
             "reward": float(reward),
-            "message": "Feedback recorded"
-        }
-        if model_warning:
-            response['model_warning'] = model_warning
-        return jsonify(response)
+            "message": "Feedback recorded",
+            "training_queue_depth": queue_depth
+        })
     
     except Exception as e:
         import traceback
@@ -530,7 +513,7 @@ def submit_rl_feedback():
 def get_user_insights(user_id: str):
     """Get insights about user's learned preferences."""
     try:
-        bandit = load_user_model(user_id)
+        bandit = model_cache.get(user_id)
         insights = bandit.get_insights()
         
         return jsonify({
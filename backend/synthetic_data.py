@@ -0,0 +1,74 @@
+"""
+Synthetic meals and user states
+-------------------------------
+Deterministic generators for meal dicts shaped like the ones built from the
+menu, and for user states as the server passes them to the bandit. Shared by
+the bench_*.py checks and the rl_replay.py harness.
+"""
+
+import random
+
+from meal_catalog import MealCatalog
+
+CATEGORIES = ["Grill Station", "Pasta Bar", "World Fare", "Comfort Kitchen", "Salad Bar", "Deli Bar", "Desserts"]
+HALLS = ["Berkshire", "Franklin", "Worcester", "Hampshire"]
+ALLERGENS = ["Milk", "Eggs", "Gluten", "Soy", "Corn", "Sesame", "Wheat", "Fish", "Shellfish", "Tree Nuts"]
+DIETS = ["Halal", "Local", "Sustainable", "Vegetarian", "Plant Based", "Whole Grain", "Antibiotic Free"]
+CUISINES = ["american", "italian", "asian", "latin", "mediterranean", ""]
+
+
+def synthetic_meals(n, seed=0):
+    """Generate n meal dicts shaped like the ones built from the menu."""
+    rng = random.Random(seed)
+    meals = []
+    for i in range(n):
+        calories = float(rng.randint(20, 1100))
+        category = rng.choice(CATEGORIES)
+        meals.append({
+            'id': f"meal_{i}",
+            'name': f"{rng.choice(['Grilled', 'Baked', 'Spicy', 'Fresh'])} {rng.choice(['Chicken', 'Tofu', 'Pasta', 'Salad', 'Burger'])} {i}",
+            'calories': calories,
+            'protein': round(rng.uniform(0, calories / 8), 1),
+            'carbs': round(rng.uniform(0, calories / 5), 1),
+            'fat': round(rng.uniform(0, calories / 12), 1),
+            'location': rng.choice(HALLS),
+            'category': category,
+            'station': category,
+            'allergens': ", ".join(rng.sample(ALLERGENS, rng.randint(0, 4))),
+            'clean_diet': ", ".join(rng.sample(DIETS, rng.randint(0, 3))),
+            'ingredients': '',
+            'cuisine_type': rng.choice(CUISINES),
+            'meal_period': rng.choice(['breakfast', 'lunch', 'dinner'])
+        })
+    return meals
+
+
+def synthetic_catalog_view(meals):
+    """Load meals into a one-hall MealCatalog and return a view over all of them."""
+    menu = {"Bench": {"menu": {"lunch": {"all": [
+        {'name': m['name'], 'calories': m['calories'], 'protein': m['protein'], 'carbs': m['carbs'],
+         'fat': m['fat'], 'category': m['category'], 'allergens': m['allergens'],
+         'clean_diet': m['clean_diet'], 'cuisine_type': m['cuisine_type']}
+        for m in meals
+    ]}}}}
+    return MealCatalog(menu).view("Bench", "lunch")
+
+
+def sample_state(seed=0):
+    rng = random.Random(seed)
+    return {
+        'time_of_day': rng.choice(['breakfast', 'lunch', 'dinner']),
+        'day_of_week': rng.randint(0, 6),
+        'calories_today': rng.randint(0, 1500),
+        'calorie_budget': 2200,
+        'macros_today': {'protein': rng.randint(0, 60), 'carbs': rng.randint(0, 150), 'fat': rng.randint(0, 50)},
+        'protein_goal': 100,
+        'carbs_goal': 200,
+        'fat_goal': 70,
+        'dietary_restrictions': [],
+        'allergens': ['Shellfish'],
+        'favorite_cuisines': ['italian'],
+        'favorite_dining_halls': ['Worcester'],
+        'recent_meals': ['Grilled Chicken 3'],
+        'high_protein_goal': rng.random() < 0.5
+    }
@@ -0,0 +1,239 @@
+"""
+RL Training Queue
+-----------------
+Moves bandit training off the /api/rl/feedback request path.
+
+- submit() only records the event and wakes a worker.
+- Each user with pending events is queued once; a worker takes all of that
+  user's pending events, applies them with a single train() and publishes
+  the model with one save.
+- A user is trained by at most one worker at a time, so saves for the same
+  user never interleave.
+- A failed batch never leaves the cached model silently ahead of the store:
+  events already applied are published, the rest are retried with backoff
+  up to MAX_TRAIN_RETRIES times, and the last error shows in stats().
+"""
+
+import collections
+import contextlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Background trainer threads
+DEFAULT_TRAIN_WORKERS = 2
+
+# Number of recent training batches kept for latency percentiles
+LATENCY_WINDOW = 500
+
+# Retries of a failed batch's unapplied events, and the first backoff (doubles per retry)
+MAX_TRAIN_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+
+class TrainingQueue:
+    """
+    Per-user coalescing queue in front of a pool of trainer threads.
+
+    load_model(user_id) -> bandit and save_model(bandit) are the same
+    callables the request handlers use, so the trainer publishes models
+    exactly where readers look for them. user_lock(user_id), if given, is
+    held while a user's model is loaded, updated and published.
+    """
+
+    def __init__(self, load_model: Callable[[str], Any], save_model: Callable[[Any], None],
+                 workers: int = DEFAULT_TRAIN_WORKERS, user_lock: Optional[Callable[[str], Any]] = None):
+        self.load_model = load_model
+        self.save_model = save_model
+        self.workers = max(1, workers)
+        self.user_lock = user_lock or (lambda user_id: contextlib.nullcontext())
+
+        self._cond = threading.Condition()
+        self._pending = {}                      # user_id -> [(enqueued_at, state, meal, reward, attempt)]
+        self._ready = collections.deque()       # user_ids with pending events, not being trained
+        self._active = set()                    # user_ids a worker is training right now
+        self._retrying = 0                      # failed batches waiting out their backoff
+        self._threads = []
+        self._closing = False
+
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)   # seconds per batch
+        self._lags = collections.deque(maxlen=LATENCY_WINDOW)        # enqueue -> published, oldest event
+        self.stats_counters = {
+            'events_submitted': 0,
+            'events_trained': 0,
+            'batches': 0,
+            'training_failures': 0,
+            'training_retries': 0,
+            'events_dropped': 0
+        }
+        self._last_error = None
+
+    # ---------------- Request-path API --------------------------------
+    def submit(self, user_id: str, state: Dict, meal: Dict, reward: float) -> int:
+        """Queue one feedback event; returns the number of events waiting."""
+        self.start()
+        with self._cond:
+            events = self._pending.setdefault(user_id, [])
+            events.append((time.monotonic(), state, meal, reward, 0))
+            self.stats_counters['events_submitted'] += 1
+            if len(events) == 1 and user_id not in self._active:
+                self._ready.append(user_id)
+                self._cond.notify()
+            return self._depth()
+
+    def _depth(self) -> int:
+        # Caller holds self._cond
+        return sum(len(events) for events in self._pending.values())
+
+    # ---------------- Workers ----------------------------------------
+    def start(self):
+        """Start the trainer threads (idempotent)."""
+        with self._cond:
+            if self._threads or self._closing:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'rl-trainer-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._closing:
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                user_id = self._ready.popleft()
+                events = self._pending.pop(user_id, [])
+                self._active.add(user_id)
+
+            try:
+                if events:
+                    self._train_user(user_id, events)
+            finally:
+                with self._cond:
+                    self._active.discard(user_id)
+                    # Events that arrived while we were training get their own batch
+                    if self._pending.get(user_id):
+                        self._ready.append(user_id)
+                    self._cond.notify_all()
+
+    def _train_user(self, user_id: str, events: List[tuple]):
+        started = time.monotonic()
+        applied = 0
+        updating = False
+        with self.user_lock(user_id):
+            bandit = None
+            try:
+                bandit = self.load_model(user_id)
+                updating = True
+                for _, state, meal, reward, _ in events:
+                    bandit.update(state, meal, reward, train=False)
+                    bandit.decay_epsilon()
+                    applied += 1
+                updating = False
+                bandit.train()
+                self.save_model(bandit)
+            except Exception as e:
+                self._failed(user_id, bandit, events, applied, updating, e)
+                return
+
+        finished = time.monotonic()
+        with self._cond:
+            self.stats_counters['events_trained'] += len(events)
+            self.stats_counters['batches'] += 1
+            self._latencies.append(finished - started)
+            self._lags.append(finished - events[0][0])
+
+    def _failed(self, user_id: str, bandit, events: List[tuple], applied: int, in_update: bool,
+                error: Exception):
+        """
+        Handle a batch that raised. Caller holds the user lock.
+        The cached model was changed in place for the first `applied` events
+        (their samples stay pending in its history if train() failed, and the
+        next train() folds them in), so it is published as-is rather than
+        left unsaved in the cache; the unapplied events are retried. When
+        update() raised, only that event uses up a retry, so one bad event
+        cannot exhaust the retries of the events queued behind it.
+        """
+        print(f"Error training model for user {user_id}: {error}")
+        if bandit is not None and applied:
+            try:
+                self.save_model(bandit)
+            except Exception as e:
+                print(f"Error publishing partially trained model for user {user_id}: {e}")
+
+        unapplied = events[applied:]
+        charged = 1 if in_update else len(unapplied)
+        retry = [event[:4] + (event[4] + 1,) for event in unapplied[:charged] if event[4] < MAX_TRAIN_RETRIES]
+        retry += unapplied[charged:]
+        with self._cond:
+            self.stats_counters['training_failures'] += 1
+            self.stats_counters['events_dropped'] += len(events) - applied - len(retry)
+            self._last_error = {'user_id': user_id, 'error': f"{type(error).__name__}: {error}",
+                                'time': time.time(), 'events_applied': applied,
+                                'events_retried': len(retry)}
+            if not retry:
+                return
+            self.stats_counters['training_retries'] += 1
+            self._retrying += 1
+        attempt = max(event[4] for event in retry)
+        timer = threading.Timer(RETRY_BACKOFF * 2 ** (attempt - 1), self._requeue, (user_id, retry))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, user_id: str, events: List[tuple]):
+        with self._cond:
+            self._retrying -= 1
+            pending = self._pending.setdefault(user_id, [])
+            # Retried events are older than anything submitted since
+            pending[:0] = events
+            if len(pending) == len(events) and user_id not in self._active:
+                self._ready.append(user_id)
+            self._cond.notify_all()
+
+    # ---------------- Lifecycle --------------------------------------
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued event is trained; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._active or self._retrying:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """Drain the queue, then stop the workers."""
+        self.flush(timeout)
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and training latency for monitoring."""
+        with self._cond:
+            latencies = sorted(self._latencies)
+            lags = sorted(self._lags)
+            return dict(self.stats_counters,
+                        queue_depth=self._depth(),
+                        users_waiting=len(self._pending),
+                        users_training=len(self._active),
+                        workers=len(self._threads),
+                        retries_waiting=self._retrying,
+                        last_error=dict(self._last_error) if self._last_error else None,
+                        train_ms=_percentiles(latencies),
+                        lag_ms=_percentiles(lags))
+
+
+def _percentiles(sorted_seconds: List[float]) -> Dict[str, Optional[float]]:
+    if not sorted_seconds:
+        return {'p50': None, 'p99': None, 'max': None}
+
+    def pick(q):
+        return round(sorted_seconds[min(len(sorted_seconds) - 1, int(q * len(sorted_seconds)))] * 1000, 2)
+
+    return {'p50': pick(0.50), 'p99': pick(0.99), 'max': round(sorted_seconds[-1] * 1000, 2)}